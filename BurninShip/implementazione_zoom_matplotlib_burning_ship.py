@@ -1,56 +1,52 @@
 from __future__ import print_function
-from numba import cuda
+import os
+import sys
 import numpy as np
 import matplotlib.pyplot as plt
 
-@cuda.jit
-def create_burningship(xres, yres, iterations, burningship, x_min, x_max, y_min, y_max):
-    x, y = cuda.grid(2)
-
-    if x < xres and y < yres:
-        cx = x_min + x * (x_max - x_min) / xres
-        cy = y_min + y * (y_max - y_min) / yres
-        zx, zy = 0.0, 0.0
-        for n in range(iterations):
-            zx, zy = abs(zx), abs(zy)
-            zx, zy = zx*zx - zy*zy + cx, 2*zx*zy + cy
-            if zx*zx + zy*zy >= 4.0:
-                break
-
-        burningship[y, x] = n
-
-def generate_burningship(xres, yres, iterations, x_min, x_max, y_min, y_max):
-    # Allocazione della memoria per l'insieme di Burning Ship
-    burningship = np.zeros((yres, xres), dtype=np.int32)
-
-    # Copia della memoria sul dispositivo
-    burningship_device = cuda.to_device(burningship)
-
-    # Definizione delle dimensioni dei blocchi e delle griglie
-    threadsperblock = (32, 32)
-    blockspergrid_x = int(np.ceil(xres / threadsperblock[0]))
-    blockspergrid_y = int(np.ceil(yres / threadsperblock[1]))
-    blockspergrid = (blockspergrid_x, blockspergrid_y)
-
-    # Esecuzione del kernel
-    create_burningship[blockspergrid, threadsperblock](xres, yres, iterations, burningship_device, x_min, x_max, y_min, y_max)
-
-    # Copia del risultato di nuovo all'host
-    burningship_device.copy_to_host(burningship)
-
-    # Utilizzo di una mappa di colori logaritmica per migliorare la visibilità
-    burningship_log = np.log(burningship + 1) / np.log(iterations + 1)
-
-    # Creazione della mappa di colori
-    colormap = plt.get_cmap("inferno")  # Puoi scegliere diverse mappe di colori da matplotlib
-
-    # Conversione dei valori normalizzati in colori usando la colormap
-    burningship_colored = (colormap(burningship_log)[:, :, :3] * 255).astype(np.uint8)
-
-    return burningship_colored
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from frattali.tilecache import TileCache
+from frattali.incremental import IncrementalView
+from frattali.perturbation import render_deep_burningship
+from frattali.colors import log_colorize
+from frattali.viewer import ProgressiveRenderer
+
+# Cache dei tile di iterazioni: tornando su una zona già vista non si ricalcola
+cache = TileCache()
+
+# Ultime viste calcolate: dopo uno spostamento o uno zoom 2x si ricalcolano solo i pixel nuovi
+incremental = IncrementalView()
+
+# Le passate ridotte (anteprime) vengono dalla cache, campioni al pixel più vicino;
+# la passata a piena risoluzione riusa solo pixel esatti
+FULL_XRES = 800
+
+# Sotto questo passo tra i pixel le coordinate float64 si rompono in blocchi
+DEEP_PIXEL = 1e-12
+
+# Vista effettivamente calcolata dall'ultima chiamata: la passata a piena
+# risoluzione è allineata alla griglia dei pixel riusati
+computed_view = None
+
+def generate_burningship(xres, yres, iterations, x_min, x_max, y_min, y_max, check=None):
+    global computed_view
+    computed_view = None
+    if abs(x_max - x_min) / xres < DEEP_PIXEL:
+        # Zoom profondo: orbita di riferimento in alta precisione e perturbazione in float64
+        burningship = render_deep_burningship(xres, yres, iterations, (x_min + x_max) / 2, (y_min + y_max) / 2, x_max - x_min, y_max - y_min)
+    else:
+        if xres < FULL_XRES:
+            # Anteprima dai tile della cache (quelli mancanti su CUDA se disponibile)
+            burningship = cache.viewport("burningship", (iterations,), xres, yres, x_min, x_max, y_min, y_max, check)
+        else:
+            # Pixel riusati dalle viste precedenti, gli altri calcolati
+            burningship = incremental.render("burningship", (iterations,), xres, yres, x_min, x_max, y_min, y_max, check)
+            computed_view = incremental.extent
+
+    return log_colorize(burningship, iterations, "inferno")  # Puoi scegliere diverse mappe di colori da matplotlib
 
 # Parametri di risoluzione e iterazioni
-xres, yres = 800, 600  # Ridotto per una visualizzazione più veloce
+xres, yres = FULL_XRES, 600  # Ridotto per una visualizzazione più veloce
 iterations = 1000
 
 # Coordinate iniziali del piano complesso
@@ -68,6 +64,12 @@ burningship_colored = generate_burningship(xres, yres, iterations, x_min, x_max,
 fig, ax = plt.subplots()
 img = ax.imshow(burningship_colored, extent=(x_min, x_max, y_min, y_max))
 
+# Le nuove viste vengono calcolate in un thread separato, a passate sempre più fini
+renderer = ProgressiveRenderer(generate_burningship, xres, yres, iterations,
+                               report=lambda: f"{incremental.report()}, {cache.report()}",
+                               computed_view=lambda: computed_view)
+renderer.attach(fig, img)
+
 def update_fractal(event):
     global x_min, x_max, y_min, y_max
     if event.inaxes:
@@ -75,13 +77,8 @@ def update_fractal(event):
         x_min, x_max = ax.get_xlim()
         y_min, y_max = ax.get_ylim()
 
-        # Rigenera il frattale con i nuovi limiti
-        new_burningship_colored = generate_burningship(xres, yres, iterations, x_min, x_max, -y_max, -y_min)
-
-        # Aggiorna l'immagine visualizzata
-        img.set_data(new_burningship_colored)
-        img.set_extent((x_min, x_max, y_min, y_max))
-        plt.draw()
+        # Rigenera il frattale con i nuovi limiti (in background, a passate)
+        renderer.submit((x_min, x_max, -y_max, -y_min), (x_min, x_max, y_min, y_max))
 
 def on_draw(event):
     global x_min, x_max, y_min, y_max
@@ -94,12 +91,10 @@ def reset_fractal(event):
     x_min, x_max = initial_x_min, initial_x_max
     y_min, y_max = initial_y_min, initial_y_max
 
-    # Rigenera il frattale con le coordinate iniziali
-    new_burningship_colored = generate_burningship(xres, yres, iterations, x_min, x_max, y_min, y_max)
+    # Rigenera il frattale con le coordinate iniziali (in background, a passate)
+    renderer.submit((x_min, x_max, y_min, y_max), (x_min, x_max, y_min, y_max))
 
     # Aggiorna l'immagine visualizzata
-    img.set_data(new_burningship_colored)
-    img.set_extent((x_min, x_max, y_min, y_max))
     ax.set_xlim(x_min, x_max)
     ax.set_ylim(y_min, y_max)
     plt.draw()
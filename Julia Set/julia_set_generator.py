@@ -1,24 +1,13 @@
 from __future__ import print_function
-from numba import cuda
-import numpy as np
-from PIL import Image as im
-import matplotlib.pyplot as plt
+import os
+import sys
 
-@cuda.jit
-def create_julia(xres, yres, iterations, mandelbrot, c):
-    x, y = cuda.grid(2)
-
-    if x < xres and y < yres:
-        zx = -2.0 + x * 3.0 / xres
-        zy = -1.0 + y * 2.0 / yres
-        z = complex(zx, zy)
-
-        for n in range(iterations):
-            z = z * z + c
-            if (z.real * z.real + z.imag * z.imag) >= 4:
-                break
-
-        mandelbrot[y, x] = n
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from frattali.escape import render_julia
+from frattali.subdivide import render_julia_subdivided
+from frattali.colors import log_colorize
+from frattali.tiled import render_png
+from frattali.farm import render_farm
 
 # Parametri di risoluzione e iterazioni
 xres, yres = 12800, 9600  # Aumento della risoluzione
@@ -27,35 +16,30 @@ iterations = 10000
 # Parametro c per il set di Julia (puoi cambiarlo per ottenere diverse forme)
 c = complex(0.285,0.013)
 
-# Allocazione della memoria per l'insieme di Julia
-mandelbrot = np.zeros((yres, xres), dtype=np.int32)
-
-# Copia della memoria sul dispositivo
-mandelbrot_device = cuda.to_device(mandelbrot)
-
-# Definizione delle dimensioni dei blocchi e delle griglie
-threadsperblock = (32, 32)
-blockspergrid_x = int(np.ceil(xres / threadsperblock[0]))
-blockspergrid_y = int(np.ceil(yres / threadsperblock[1]))
-blockspergrid = (blockspergrid_x, blockspergrid_y)
-
-# Esecuzione del kernel
-create_julia[blockspergrid, threadsperblock](xres, yres, iterations, mandelbrot_device, c)
-
-# Copia del risultato di nuovo all'host
-mandelbrot_device.copy_to_host(mandelbrot)
-
-# Utilizzo di una mappa di colori logaritmica per migliorare la visibilità
-mandelbrot_log = np.log(mandelbrot + 1) / np.log(iterations + 1)
+# L'immagine viene calcolata e salvata a bande di circa tile_pixels pixel,
+# così la memoria usata non dipende dalla risoluzione
+tile_pixels = 1 << 20
 
-# Creazione della mappa di colori
-colormap = plt.get_cmap("inferno")  # Puoi scegliere diverse mappe di colori da matplotlib
+# Con subdivide = True si usa il rendering per suddivisione (Mariani-Silver):
+# si iterano solo i bordi delle regioni uniformi, molto più veloce ad alte
+# iterazioni (può differire dal calcolo completo in pochi pixel isolati)
+subdivide = False
+render = render_julia_subdivided if subdivide else render_julia
 
-# Conversione dei valori normalizzati in colori usando la colormap
-mandelbrot_colored = (colormap(mandelbrot_log)[:, :, :3] * 255).astype(np.uint8)
+# Con farm_workers > 0 le bande vengono distribuite a quel numero di processi
+# locali, le più lente per prime (frattali/farm.py); per usare altri nodi si
+# lancia python -m frattali.farm render con --listen e su ogni nodo
+# python -m frattali.farm worker HOST:PORTA
+farm_workers = 0
 
-# Salvataggio dell'immagine
+# Calcolo dell'insieme di Julia (CUDA se disponibile, altrimenti CPU) e
+# salvataggio dell'immagine con la mappa di colori logaritmica
 filename = 'julia_colored.png'
 print("saving image to", filename)
-img = im.fromarray(mandelbrot_colored)
-img.save(filename)
+if farm_workers:
+    render_farm(filename, "julia", xres, yres, (iterations, c.real, c.imag, -2.0, 1.0, -1.0, 1.0),
+                lambda band: log_colorize(band, iterations, "inferno"),
+                workers=farm_workers, tile_pixels=tile_pixels, subdivide=subdivide)
+else:
+    render_png(filename, render, xres, yres, (iterations, c.real, c.imag, -2.0, 1.0, -1.0, 1.0),
+               lambda band: log_colorize(band, iterations, "inferno"), tile_pixels)  # Puoi scegliere diverse mappe di colori da matplotlib
@@ -1,26 +1,14 @@
 from __future__ import print_function
-from numba import cuda
+import os
+import sys
 import numpy as np
 from PIL import Image as im
-import matplotlib.pyplot as plt
 
-@cuda.jit
-def create_julia(xres, yres, iterations, mandelbrot, c):
-    x, y = cuda.grid(2)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from frattali.escape import render_julia
+from frattali.colors import grey_shade
+from frattali.boundary import render_julia_distance, distance_shade, render_julia_miim, hits_shade
 
-    if x < xres and y < yres:
-        zx = -2.0 + x * 3.0 / xres
-        zy = -1.0 + y * 2.0 / yres
-        z = complex(zx, zy)
-
-        for n in range(iterations):
-            z = z * z + c
-            if (z.real * z.real + z.imag * z.imag) >= 4:
-                mandelbrot[y, x] = 255 - int(n * 255 / iterations)  # Sfumatura per l'esterno
-                return
-
-        mandelbrot[y, x] = 255 # Grigio uniforme per l'interno
-                
 # Parametri di risoluzione e iterazioni
 xres, yres = 12800, 9600  # Risoluzione ridotta per test più veloce
 iterations = 10000
@@ -28,26 +16,31 @@ iterations = 10000
 # Parametro c per il set di Julia (puoi cambiarlo per ottenere diverse forme)
 c = complex((-1)*0.7269, 0.1889) # complex(0.285, 0.013)
 
-# Allocazione della memoria per l'insieme di Julia
-mandelbrot = np.zeros((yres, xres), dtype=np.uint8)  # Cambiato a uint8 per immagine in scala di grigi
-
-# Copia della memoria sul dispositivo
-mandelbrot_device = cuda.to_device(mandelbrot)
-
-# Definizione delle dimensioni dei blocchi e delle griglie
-threadsperblock = (32, 32)
-blockspergrid_x = int(np.ceil(xres / threadsperblock[0]))
-blockspergrid_y = int(np.ceil(yres / threadsperblock[1]))
-blockspergrid = (blockspergrid_x, blockspergrid_y)
-
-# Esecuzione del kernel
-create_julia[blockspergrid, threadsperblock](xres, yres, iterations, mandelbrot_device, c)
-
-# Copia del risultato di nuovo all'host
-mandelbrot_device.copy_to_host(mandelbrot)
+# Modo di calcolo (frattali/boundary.py): "escape" è il tempo di fuga con
+# iterations iterazioni; "distance" (stima della distanza) disegna il bordo
+# con distance_iterations iterazioni; "miim" (iterazione inversa modificata)
+# disegna solo i pixel del bordo, con un costo proporzionale al bordo
+mode = "escape"
+distance_iterations = 100
+max_hits = 4
 
-# Salvataggio dell'immagine
 filename = 'julia_colored.png'
-print("Saving image to", filename)
-img = im.fromarray(mandelbrot, mode='F')
-img.save(filename)
+if mode == "distance":
+    distance = render_julia_distance(xres, yres, distance_iterations, c.real, c.imag, -2.0, 1.0, -1.0, 1.0)
+    print("Saving image to", filename)
+    im.fromarray(distance_shade(distance, 3.0 / xres)).save(filename)
+elif mode == "miim":
+    hits = render_julia_miim(xres, yres, c.real, c.imag, -2.0, 1.0, -1.0, 1.0, max_hits=max_hits)
+    print("Saving image to", filename)
+    im.fromarray(hits_shade(hits)).save(filename)
+else:
+    # Calcolo dell'insieme di Julia (CUDA se disponibile, altrimenti CPU)
+    counts = render_julia(xres, yres, iterations, c.real, c.imag, -2.0, 1.0, -1.0, 1.0)
+
+    # Sfumatura per l'esterno, grigio uniforme per l'interno
+    mandelbrot = grey_shade(counts, iterations, 255)  # uint8 per immagine in scala di grigi
+
+    # Salvataggio dell'immagine
+    print("Saving image to", filename)
+    img = im.fromarray(mandelbrot, mode='F')
+    img.save(filename)
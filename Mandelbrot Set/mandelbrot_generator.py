@@ -1,59 +1,30 @@
 from __future__ import print_function
-from numba import cuda
-import numpy as np
-from PIL import Image as im
-import matplotlib.pyplot as plt
+import os
+import sys
 
-@cuda.jit
-def create_fractal(xres, yres, iterations, mandelbrot):
-    x, y = cuda.grid(2)
-
-    if x < xres and y < yres:
-        cx = -2.0 + x * 3.0 / xres
-        cy = -1.0 + y * 2.0 / yres
-        c = complex(cx, cy)
-
-        z = 0.0j
-        for n in range(iterations):
-            z = z * z + c
-            if (z.real * z.real + z.imag * z.imag) >= 4:
-                break
-
-        mandelbrot[y, x] = n
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from frattali.escape import render_mandelbrot
+from frattali.subdivide import render_mandelbrot_subdivided
+from frattali.colors import log_colorize
+from frattali.tiled import render_png
 
 # Parametri di risoluzione e iterazioni
 xres, yres = 12800, 9600
 iterations = 1000
 
-# Allocazione della memoria per l'insieme di Mandelbrot
-mandelbrot = np.zeros((yres, xres), dtype=np.int32)
-
-# Copia della memoria sul dispositivo
-mandelbrot_device = cuda.to_device(mandelbrot)
-
-# Definizione delle dimensioni dei blocchi e delle griglie
-threadsperblock = (32, 32)
-blockspergrid_x = int(np.ceil(xres / threadsperblock[0]))
-blockspergrid_y = int(np.ceil(yres / threadsperblock[1]))
-blockspergrid = (blockspergrid_x, blockspergrid_y)
-
-# Esecuzione del kernel
-create_fractal[blockspergrid, threadsperblock](xres, yres, iterations, mandelbrot_device)
-
-# Copia del risultato di nuovo all'host
-mandelbrot_device.copy_to_host(mandelbrot)
-
-# Utilizzo di una mappa di colori logaritmica per migliorare la visibilità
-mandelbrot_log = np.log(mandelbrot + 1) / np.log(iterations + 1)
-
-# Creazione della mappa di colori
-colormap = plt.get_cmap("grey")
+# L'immagine viene calcolata e salvata a bande di circa tile_pixels pixel,
+# così la memoria usata non dipende dalla risoluzione
+tile_pixels = 1 << 20
 
-# Conversione dei valori normalizzati in colori usando la colormap
-mandelbrot_colored = (colormap(mandelbrot_log)[:, :, :3] * 255).astype(np.uint8)
+# Con subdivide = True si usa il rendering per suddivisione (Mariani-Silver):
+# si iterano solo i bordi delle regioni uniformi, molto più veloce ad alte
+# iterazioni (può differire dal calcolo completo in pochi pixel isolati)
+subdivide = False
+render = render_mandelbrot_subdivided if subdivide else render_mandelbrot
 
-# Salvataggio dell'immagine
+# Calcolo dell'insieme di Mandelbrot (CUDA se disponibile, altrimenti CPU) e
+# salvataggio dell'immagine con la mappa di colori logaritmica
 filename = 'mandelbrot_colored.png'
 print("saving image to", filename)
-img = im.fromarray(mandelbrot_colored)
-img.save(filename)
\ No newline at end of file
+render_png(filename, render, xres, yres, (iterations, -2.0, 1.0, -1.0, 1.0),
+           lambda band: log_colorize(band, iterations, "grey"), tile_pixels)
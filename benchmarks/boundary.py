@@ -0,0 +1,101 @@
+"""
+Bordo di Julia: tempo di fuga contro stima della distanza e MIIM.
+
+Calcola la stessa vista di julia_white_black.py con il tempo di fuga
+(--iterations, 10000 come nello script), con la stima della distanza a poche
+iterazioni (--distance-iterations) e con l'iterazione inversa modificata
+(--max-hits). Riporta i tempi e lo speedup rispetto al tempo di fuga. Come
+riferimento del bordo si usano i pixel a meno di un pixel dall'insieme secondo
+la stima della distanza a 3000 iterazioni: per il tempo di fuga si prendono
+altrettanti pixel con più iterazioni, per la stima della distanza i pixel
+neri; per MIIM, che segna solo punti dell'insieme, la quota dei suoi pixel sul
+bordo di riferimento e la quota del bordo entro 2 pixel da un suo pixel.
+
+    python benchmarks/boundary.py --xres 3200 --yres 2400 --save /tmp/bordo
+"""
+from __future__ import print_function
+import os
+import sys
+import time
+import argparse
+import numpy as np
+from PIL import Image as im
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from frattali.escape import render_julia, select_backend
+from frattali.colors import grey_shade
+from frattali.boundary import render_julia_distance, distance_shade, render_julia_miim, hits_shade
+
+VIEW = (-2.0, 1.0, -1.0, 1.0)
+
+
+def timed(render, *args, **kwargs):
+    start = time.perf_counter()
+    result = render(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def dilate(mask, radius):
+    # Dilatazione quadrata di lato 2 * radius + 1 (senza scipy)
+    out = mask.copy()
+    for dy in range(-radius, radius + 1):
+        for dx in range(-radius, radius + 1):
+            out[max(dy, 0):mask.shape[0] + min(dy, 0), max(dx, 0):mask.shape[1] + min(dx, 0)] |= \
+                mask[max(-dy, 0):mask.shape[0] + min(-dy, 0), max(-dx, 0):mask.shape[1] + min(-dx, 0)]
+    return out
+
+
+def iou(a, b):
+    return np.count_nonzero(a & b) / max(np.count_nonzero(a | b), 1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--xres", type=int, default=3200)
+    parser.add_argument("--yres", type=int, default=2400)
+    parser.add_argument("--c", type=complex, default=complex(-0.7269, 0.1889))
+    parser.add_argument("--iterations", type=int, default=10000)
+    parser.add_argument("--distance-iterations", type=int, default=100)
+    parser.add_argument("--max-hits", type=int, default=4)
+    parser.add_argument("--backend", default=None)
+    parser.add_argument("--save", default=None, help="cartella in cui salvare le tre immagini")
+    opts = parser.parse_args()
+    xres, yres, c = opts.xres, opts.yres, opts.c
+    backend = select_backend(opts.backend)
+    spacing = (VIEW[1] - VIEW[0]) / xres
+
+    # Compilazione JIT fuori dalla misura
+    render_julia(16, 12, 10, c.real, c.imag, *VIEW, backend=backend, precision="float64")
+    render_julia_distance(16, 12, 10, c.real, c.imag, *VIEW, backend=backend)
+    render_julia_miim(16, 12, c.real, c.imag, *VIEW)
+
+    counts, t_escape = timed(render_julia, xres, yres, opts.iterations, c.real, c.imag, *VIEW, backend=backend,
+                             precision="float64")
+    distance, t_distance = timed(render_julia_distance, xres, yres, opts.distance_iterations, c.real, c.imag,
+                                 *VIEW, backend=backend)
+    stats = {}
+    hits, t_miim = timed(render_julia_miim, xres, yres, c.real, c.imag, *VIEW, max_hits=opts.max_hits, stats=stats)
+
+    reference = render_julia_distance(xres, yres, 3000, c.real, c.imag, *VIEW, backend=backend)
+    border = reference < spacing
+    del reference
+    rank = counts.size - np.count_nonzero(border)
+    slowest = counts >= np.partition(counts.ravel(), rank)[rank]
+    black = distance < spacing
+    marked = hits > 0
+
+    print(f"Julia c = {c}, {xres}x{yres}, backend {backend}; bordo di riferimento {border.mean():.1%} dei pixel")
+    on_border = np.count_nonzero(marked & border) / max(np.count_nonzero(marked), 1)
+    covered = np.count_nonzero(dilate(marked, 2) & border) / max(np.count_nonzero(border), 1)
+    print(f"  {'tempo di fuga, ' + str(opts.iterations) + ' it.':<34} {t_escape:8.2f} s           "
+          f"IoU {iou(slowest, border):.3f}")
+    print(f"  {'stima della distanza, ' + str(opts.distance_iterations) + ' it.':<34} {t_distance:8.2f} s  "
+          f"{t_escape / t_distance:6.1f}x  IoU {iou(black, border):.3f}")
+    print(f"  {'MIIM, max_hits ' + str(opts.max_hits):<34} {t_miim:8.2f} s  {t_escape / t_miim:6.1f}x  "
+          f"{stats['points'] / 1e6:.1f} M punti, sul bordo {on_border:.1%}, bordo entro 2 pixel {covered:.1%}")
+
+    if opts.save:
+        os.makedirs(opts.save, exist_ok=True)
+        im.fromarray(grey_shade(counts, opts.iterations, 255)).save(os.path.join(opts.save, "escape.png"))
+        im.fromarray(distance_shade(distance, spacing)).save(os.path.join(opts.save, "distance.png"))
+        im.fromarray(hits_shade(hits)).save(os.path.join(opts.save, "miim.png"))
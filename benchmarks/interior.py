@@ -0,0 +1,93 @@
+"""
+Benchmark del taglio dei punti interni (cardioide/bulbo e periodicità).
+
+Confronta i kernel di frattali.escape con l'iterazione completa originale
+sulla vista di default -2..1 x -1..1 e controlla che il risultato sia identico.
+
+    python benchmarks/interior.py --xres 1600 --yres 1200 --iterations 10000
+"""
+from __future__ import print_function
+import os
+import sys
+import time
+import argparse
+import numpy as np
+from numba import njit, prange
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from frattali.escape import render_mandelbrot, render_julia
+
+
+@njit(parallel=True)
+def full_mandelbrot(xres, yres, iterations, out, x_min, x_max, y_min, y_max):
+    for y in prange(yres):
+        cy = y_min + y * (y_max - y_min) / yres
+        for x in range(xres):
+            cx = x_min + x * (x_max - x_min) / xres
+            zx, zy = 0.0, 0.0
+            n = 0
+            while n < iterations:
+                zx, zy = zx * zx - zy * zy + cx, 2.0 * zx * zy + cy
+                if zx * zx + zy * zy >= 4.0:
+                    break
+                n += 1
+            out[y, x] = n
+
+
+@njit(parallel=True)
+def full_julia(xres, yres, iterations, out, cx, cy, x_min, x_max, y_min, y_max):
+    for y in prange(yres):
+        for x in range(xres):
+            zx = x_min + x * (x_max - x_min) / xres
+            zy = y_min + y * (y_max - y_min) / yres
+            n = 0
+            while n < iterations:
+                zx, zy = zx * zx - zy * zy + cx, 2.0 * zx * zy + cy
+                if zx * zx + zy * zy >= 4.0:
+                    break
+                n += 1
+            out[y, x] = n
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--xres", type=int, default=800)
+    parser.add_argument("--yres", type=int, default=600)
+    parser.add_argument("--iterations", type=int, default=10000)
+    opts = parser.parse_args()
+    xres, yres, iterations = opts.xres, opts.yres, opts.iterations
+
+    mandel_view = (-2.0, 1.0, -1.0, 1.0)
+    julia_view = (0.285, 0.013, -2.0, 1.0, -1.0, 1.0)
+    # Coniglio di Douady: Julia con un interno esteso
+    rabbit_view = (-0.123, 0.745, -1.5, 1.5, -1.0, 1.0)
+
+    # Compilazione JIT fuori dalla misura
+    reference = np.zeros((8, 8), dtype=np.int32)
+    full_mandelbrot(8, 8, 10, reference, *mandel_view)
+    full_julia(8, 8, 10, reference, *julia_view)
+    render_mandelbrot(8, 8, 10, *mandel_view, backend="cpu")
+    render_julia(8, 8, 10, *julia_view, backend="cpu")
+
+    reference = np.zeros((yres, xres), dtype=np.int32)
+    cases = [
+        ("mandelbrot", full_mandelbrot, mandel_view,
+         lambda: render_mandelbrot(xres, yres, iterations, *mandel_view, backend="cpu", precision="float64")),
+        ("julia", full_julia, julia_view,
+         lambda: render_julia(xres, yres, iterations, *julia_view, backend="cpu", precision="float64")),
+        ("julia rabbit", full_julia, rabbit_view,
+         lambda: render_julia(xres, yres, iterations, *rabbit_view, backend="cpu", precision="float64")),
+    ]
+    print(f"{xres}x{yres}, {iterations} iterazioni, backend cpu")
+    for name, full, view, fast in cases:
+        _, t_full = timed(full, xres, yres, iterations, reference, *view)
+        counts, t_fast = timed(fast)
+        same = np.array_equal(counts, reference)
+        print(f"{name:12s} completo {t_full:7.2f} s   con taglio {t_fast:7.2f} s   "
+              f"speedup {t_full / t_fast:6.1f}x   identico: {same}")
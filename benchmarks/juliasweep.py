@@ -0,0 +1,62 @@
+"""
+Insiemi di Julia per molti c: un lancio per c contro un solo lancio a lotti.
+
+Calcola gli stessi --frames fotogrammi (c sulla circonferenza |c| = 0.7885)
+con una chiamata render_julia per c (float64, come l'animazione senza lotti) e
+con sweep_batches, che riempie un cubo riusato di --batch fotogrammi per
+lancio. Riporta i fotogrammi al secondo e controlla che i fotogrammi siano
+identici. Il guadagno è grande soprattutto su CUDA (un lancio, una copia e
+nessuna allocazione per lotto) e con immagini piccole, dove il costo fisso di
+un lancio pesa di più.
+
+    python benchmarks/juliasweep.py --xres 160 --yres 120 --frames 256
+"""
+from __future__ import print_function
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from frattali.escape import render_julia, select_backend
+from frattali.juliasweep import sweep_batches, circle
+
+VIEW = (-1.6, 1.6, -1.2, 1.2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--xres", type=int, default=160)
+    parser.add_argument("--yres", type=int, default=120)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--frames", type=int, default=256)
+    parser.add_argument("--batch", type=int, default=32)
+    parser.add_argument("--backend", default=None)
+    opts = parser.parse_args()
+    backend = select_backend(opts.backend)
+    cs = circle(0.7885, opts.frames)
+
+    # Compilazione JIT fuori dalla misura
+    render_julia(8, 6, 10, 0.0, 0.0, *VIEW, backend=backend, precision="float64")
+    for _ in sweep_batches(8, 6, 10, cs[:2], *VIEW, backend=backend):
+        pass
+
+    start = time.perf_counter()
+    single = [render_julia(opts.xres, opts.yres, opts.iterations, c.real, c.imag, *VIEW, backend=backend,
+                           precision="float64") for c in cs]
+    t_single = time.perf_counter() - start
+
+    # Il confronto con i fotogrammi singoli è escluso dal tempo dei lotti
+    same, t_batch = True, 0.0
+    start = time.perf_counter()
+    for first, cube in sweep_batches(opts.xres, opts.yres, opts.iterations, cs, *VIEW, batch=opts.batch,
+                                     backend=backend):
+        t_batch += time.perf_counter() - start
+        same &= all(np.array_equal(frame, single[first + k]) for k, frame in enumerate(cube))
+        start = time.perf_counter()
+
+    print(f"{opts.frames} fotogrammi {opts.xres}x{opts.yres}, {opts.iterations} iterazioni, backend {backend}")
+    print(f"  un lancio per c:     {opts.frames / t_single:8.1f} fotogrammi/s")
+    print(f"  lotti di {opts.batch:<4d}       {opts.frames / t_batch:8.1f} fotogrammi/s  "
+          f"speedup {t_single / t_batch:.2f}x, identici: {same}")
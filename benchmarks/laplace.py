@@ -0,0 +1,130 @@
+"""
+Risolutori del potenziale dei frattali di Lichtenberg a confronto.
+
+Su una scarica sintetica (rami di cammini casuali dal centro) misura, per il
+vecchio kernel di Jacobi del notebook e per i risolutori di frattali.laplace:
+  - la soluzione iniziale (il notebook faceva 10000 passate in __init__);
+  - un passo di crescita: una cella in più e nuova soluzione a partire dalla
+    precedente (il notebook faceva 20 passate).
+Per ognuno riporta tempo, passate (o V-cicli), residuo ed errore massimo
+rispetto a una soluzione di riferimento a 1e-12.
+
+    python benchmarks/laplace.py --n 500 2000
+"""
+from __future__ import print_function
+import os
+import sys
+import time
+import argparse
+import numpy as np
+from numba import njit, prange
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from frattali import laplace
+
+
+# Kernel originale del notebook, per confronto
+@njit(parallel=True)
+def evolve_potential_kernel(potential, bonded_x, bonded_y, n_bonded, phi0, phi1, n_iter):
+    n = potential.shape[0]
+    for _ in range(n_iter):
+        new_potential = potential.copy()
+        for i in prange(1, n-1):
+            for j in range(1, n-1):
+                new_potential[i, j] = 0.25 * (
+                    potential[i-1, j] + potential[i+1, j] +
+                    potential[i, j-1] + potential[i, j+1]
+                )
+        for i in prange(n):
+            new_potential[0, i] = phi1
+            new_potential[-1, i] = phi1
+            new_potential[i, 0] = phi1
+            new_potential[i, -1] = phi1
+        for k in range(n_bonded):
+            new_potential[bonded_x[k], bonded_y[k]] = phi0
+        potential[:, :] = new_potential
+
+
+def discharge(n, branches=8, seed=0):
+    # Rami di cammini casuali con deriva verso l'esterno, lunghi n / 3
+    rng = np.random.default_rng(seed)
+    cells = {(n // 2, n // 2)}
+    for angle in np.linspace(0, 2 * np.pi, branches, endpoint=False):
+        x, y = float(n // 2), float(n // 2)
+        while len(cells) < 2 * n * branches and abs(x - n // 2) < n / 3 and abs(y - n // 2) < n / 3:
+            a = angle + rng.normal(0, 1.2)
+            x, y = x + np.cos(a), y + np.sin(a)
+            cells.add((int(round(x)), int(round(y))))
+    bonded = np.array(sorted(cells), dtype=np.int16)
+    return bonded[:, 0].copy(), bonded[:, 1].copy()
+
+
+def initial(n, bx, by):
+    potential = np.zeros((n, n))
+    fixed = np.zeros((n, n), dtype=np.uint8)
+    for a in (potential, fixed):
+        a[0, :] = a[-1, :] = a[:, 0] = a[:, -1] = 1
+    fixed[bx, by] = 1
+    potential[bx, by] = 0.0
+    return potential, fixed
+
+
+def run(label, solve, potential, fixed, reference):
+    start = time.perf_counter()
+    count = solve(potential)
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<22} {elapsed * 1000:10.1f} ms  {count:>7} passate  residuo "
+          f"{laplace.residual(potential, fixed):8.1e}  errore {np.abs(potential - reference).max():8.1e}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--n", type=int, nargs="+", default=[500, 2000])
+    parser.add_argument("--sweeps", type=int, default=10000, help="passate iniziali del vecchio kernel")
+    parser.add_argument("--step-sweeps", type=int, default=20, help="passate per passo del vecchio kernel")
+    parser.add_argument("--tol", type=float, default=laplace.TOL)
+    opts = parser.parse_args()
+
+    # Compilazione fuori dalle misure
+    bx, by = discharge(16)
+    for name in laplace.SOLVERS:
+        potential, fixed = initial(16, bx, by)
+        laplace.make_solver(name, potential.shape).solve(potential, fixed)
+    evolve_potential_kernel(potential, bx, by, len(bx), 0.0, 1.0, 1)
+
+    for n in opts.n:
+        bx, by = discharge(n)
+        start, fixed = initial(n, bx, by)
+        solvers = {name: laplace.make_solver(name, start.shape) for name in laplace.SOLVERS}
+        reference = start.copy()
+        solvers["multigrid"].solve(reference, fixed, 1e-12)
+        print(f"n = {n}, {len(bx)} celle legate")
+
+        print(" soluzione iniziale")
+        cold = start.copy()
+        run(f"notebook ({opts.sweeps} passate)",
+            lambda u: evolve_potential_kernel(u, bx, by, len(bx), 0.0, 1.0, opts.sweeps) or opts.sweeps,
+            cold, fixed, reference)
+        for name in ("sor", "multigrid"):
+            run(f"{name} (tol {opts.tol:g})", lambda u: solvers[name].solve(u, fixed, opts.tol),
+                start.copy(), fixed, reference)
+
+        # Una cella in più accanto alla punta di un ramo, partendo dalla soluzione precedente
+        tip = np.argmax(np.hypot(bx - n // 2, by - n // 2))
+        x, y = bx[tip] + (1 if bx[tip] >= n // 2 else -1), by[tip]
+        grown_x, grown_y = np.append(bx, np.int16(x)), np.append(by, np.int16(y))
+        grown = fixed.copy()
+        grown[x, y] = 1
+        after = reference.copy()
+        after[x, y] = 0.0
+        step_reference = after.copy()
+        solvers["multigrid"].solve(step_reference, grown, 1e-12)
+
+        print(" passo di crescita (partenza a caldo)")
+        run(f"notebook ({opts.step_sweeps} passate)",
+            lambda u: evolve_potential_kernel(u, grown_x, grown_y, len(grown_x), 0.0, 1.0,
+                                              opts.step_sweeps) or opts.step_sweeps,
+            after.copy(), grown, step_reference)
+        for name in ("sor", "multigrid"):
+            run(f"{name} (tol {opts.tol:g})", lambda u: solvers[name].solve(u, grown, opts.tol),
+                after.copy(), grown, step_reference)
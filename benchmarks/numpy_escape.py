@@ -0,0 +1,39 @@
+"""
+Benchmark del motore NumPy (frattali.numpy_escape) rispetto al kernel numba per la CPU.
+
+Per ogni vista stampa i pixel/s dei due motori, il rapporto e quanti pixel
+differiscono.
+
+    python benchmarks/numpy_escape.py --xres 1280 --yres 960 --iterations 10000
+"""
+from __future__ import print_function
+import os
+import sys
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from frattali.escape import render_mandelbrot, throughput
+from frattali import numpy_escape
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--xres", type=int, default=640)
+    parser.add_argument("--yres", type=int, default=480)
+    parser.add_argument("--iterations", type=int, default=3000)
+    opts = parser.parse_args()
+    xres, yres, iterations = opts.xres, opts.yres, opts.iterations
+
+    views = {
+        "intero": (-2.0, 1.0, -1.125, 1.125),
+        "bordo": (-0.75, -0.74, 0.1, 0.11),
+    }
+    print(f"{xres}x{yres}, {iterations} iterazioni")
+    for name, view in views.items():
+        numba_rate = throughput(render_mandelbrot, xres, yres, iterations, *view, backend="cpu", precision="float64")
+        numpy_rate = throughput(numpy_escape.render_mandelbrot, xres, yres, iterations, *view, repeat=1)
+        diff = np.count_nonzero(numpy_escape.render_mandelbrot(xres, yres, iterations, *view)
+                                != render_mandelbrot(xres, yres, iterations, *view, backend="cpu", precision="float64"))
+        print(f"{name:8s} numba {numba_rate / 1e6:7.2f} Mpixel/s   numpy {numpy_rate / 1e6:7.2f} Mpixel/s   "
+              f"rapporto {numba_rate / numpy_rate:5.1f}x   pixel diversi {diff}")
@@ -0,0 +1,51 @@
+"""
+Costo fisso per fotogramma del frattale del doppio pendolo.
+
+Misura il primo fotogramma (compilazione JIT, o lettura dalla cache su disco, e
+creazione del contesto), il costo per fotogramma su una griglia minuscola (dove
+il calcolo è trascurabile, quindi resta solo il costo fisso) e, per confronto,
+quanto costava ricompilare il kernel a ogni fotogramma come faceva lo script.
+
+    python benchmarks/pendulum.py --frames 1000 --backend cpu
+"""
+from __future__ import print_function
+import os
+import sys
+import time
+import argparse
+import numpy as np
+from numba import njit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from frattali import pendulum
+from frattali.escape import select_backend
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--frames", type=int, default=1000)
+    parser.add_argument("--size", type=int, default=8)
+    parser.add_argument("--samples", type=int, default=3)
+    parser.add_argument("--backend", default=None)
+    opts = parser.parse_args()
+    backend = select_backend(opts.backend)
+    theta = np.linspace(-np.pi, np.pi, opts.size)
+
+    start = time.perf_counter()
+    grid = pendulum.PendulumGrid(theta, theta, backend=backend)
+    grid.render(1.0, opts.samples)
+    cold = time.perf_counter() - start
+    cached = "" if backend != "cpu" else f" (dalla cache: {sum(pendulum._advance_kernel_cpu.stats.cache_hits.values())} kernel)"
+    print(f"backend {backend}, primo fotogramma {cold * 1000:.1f} ms{cached}")
+
+    start = time.perf_counter()
+    for t in np.linspace(0.0, 10.0, opts.frames):
+        grid.render(t, opts.samples)
+    per_frame = (time.perf_counter() - start) / opts.frames
+    print(f"costo fisso per fotogramma ({opts.size}x{opts.size}, {opts.samples} campioni): {per_frame * 1e6:.0f} us")
+
+    # Vecchio script: le funzioni erano definite dentro generate_fractal, quindi
+    # ogni fotogramma ricompilava da capo
+    start = time.perf_counter()
+    njit(pendulum._advance)(0.1, 0.2, 0.1, 0.2, opts.samples, 0.01, *pendulum.pendulum_params(), pendulum.VERLET)
+    print(f"ricompilazione per fotogramma evitata: {(time.perf_counter() - start) * 1000:.0f} ms")
@@ -0,0 +1,77 @@
+"""
+Costo e accuratezza dei livelli di precisione dei kernel a tempo di fuga.
+
+Per alcune viste, dalle immagini intere a uno zoom di 1e-14, calcola la stessa
+immagine in float32, float64 e double-double: tempo, Mpixel/s, pixel con un
+conteggio diverso da quello double-double e il livello che verrebbe scelto in
+automatico. Le differenze sulle viste larghe sono il rumore caotico vicino al
+bordo (cambia anche fra float64 e double-double); quelle nelle viste profonde
+sono i blocchi di pixel che il livello non distingue più.
+
+    python benchmarks/precision.py --xres 400 --yres 300
+"""
+from __future__ import print_function
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from frattali.escape import RENDERERS, select_backend
+from frattali.precision import PRECISIONS, select_precision
+
+SEAHORSE = (-0.743643887037158704752191506114774, 0.131825904205311970493132056385139)
+
+
+def zoom(formula, iterations, center, width, aspect):
+    cx, cy = center
+    height = width * aspect
+    view = (cx - width / 2, cx + width / 2, cy - height / 2, cy + height / 2)
+    return formula, (iterations,) + ((0.285, 0.013) if formula == "julia" else ()) + view
+
+
+def timed(render, *args, **kwargs):
+    start = time.perf_counter()
+    result = render(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--xres", type=int, default=400)
+    parser.add_argument("--yres", type=int, default=300)
+    parser.add_argument("--backend", default=None)
+    opts = parser.parse_args()
+    xres, yres = opts.xres, opts.yres
+    backend = select_backend(opts.backend)
+    aspect = yres / xres
+
+    cases = [
+        ("mandelbrot intera", zoom("mandelbrot", 1000, (-0.5, 0.0), 3.0, aspect)),
+        ("julia intera", zoom("julia", 1000, (-0.5, 0.0), 3.0, aspect)),
+        ("burningship", zoom("burningship", 1000, (-1.75, -0.0275), 0.1, aspect)),
+        ("mandelbrot 1e-5", zoom("mandelbrot", 1000, SEAHORSE, 1e-5, aspect)),
+        ("mandelbrot 1e-11", zoom("mandelbrot", 3000, SEAHORSE, 1e-11, aspect)),
+        ("mandelbrot 1e-14", zoom("mandelbrot", 5000, SEAHORSE, 1e-14, aspect)),
+    ]
+
+    # Compilazione JIT fuori dalla misura
+    for formula, args in {formula: args for _, (formula, args) in cases}.items():
+        for precision in PRECISIONS:
+            RENDERERS[formula](16, 12, *args, backend=backend, precision=precision)
+
+    print(f"{xres}x{yres}, backend {backend}")
+    for label, (formula, args) in cases:
+        render = RENDERERS[formula]
+        auto = select_precision(xres, yres, *args[-4:])
+        results = {}
+        for precision in reversed(PRECISIONS):
+            results[precision] = timed(render, xres, yres, *args, backend=backend, precision=precision)
+        reference = results["double-double"][0]
+        print(f"{label} ({args[0]} iterazioni), automatico: {auto}")
+        for precision in PRECISIONS:
+            counts, elapsed = results[precision]
+            print(f"  {precision:<14} {elapsed:8.3f} s {xres * yres / elapsed / 1e6:8.2f} Mpixel/s   "
+                  f"diversi {np.count_nonzero(counts != reference) / counts.size:6.1%}   "
+                  f"valori distinti {len(np.unique(counts))}")
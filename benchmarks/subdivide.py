@@ -0,0 +1,55 @@
+"""
+Benchmark del rendering per suddivisione (Mariani-Silver) rispetto a quello completo.
+
+Per ogni formula stampa i tempi, la frazione di pixel effettivamente iterati e
+quanti pixel differiscono dal rendering completo.
+
+    python benchmarks/subdivide.py --xres 3200 --yres 2400 --iterations 10000
+"""
+from __future__ import print_function
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from frattali.escape import RENDERERS, select_backend
+from frattali.subdivide import SUBDIVIDED_RENDERERS
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--xres", type=int, default=1600)
+    parser.add_argument("--yres", type=int, default=1200)
+    parser.add_argument("--iterations", type=int, default=10000)
+    parser.add_argument("--backend", default=None)
+    opts = parser.parse_args()
+    xres, yres, iterations = opts.xres, opts.yres, opts.iterations
+    backend = select_backend(opts.backend)
+
+    views = {
+        "mandelbrot": (iterations, -2.0, 1.0, -1.0, 1.0),
+        "julia": (iterations, 0.285, 0.013, -2.0, 1.0, -1.0, 1.0),
+        "burningship": (iterations, -1.8, -1.7, -0.08, 0.025),
+    }
+    print(f"{xres}x{yres}, {iterations} iterazioni, backend {backend}")
+    for name, args in views.items():
+        full, sub = RENDERERS[name], SUBDIVIDED_RENDERERS[name]
+        # Compilazione JIT fuori dalla misura
+        full(64, 48, *args, backend=backend)
+        sub(64, 48, *args, backend=backend)
+
+        reference, t_full = timed(full, xres, yres, *args, backend=backend, precision="float64")
+        stats = {}
+        counts, t_sub = timed(sub, xres, yres, *args, backend=backend, stats=stats)
+        diff = int(np.count_nonzero(counts != reference))
+        print(f"{name:12s} completo {t_full:7.2f} s   suddivisione {t_sub:7.2f} s   "
+              f"speedup {t_full / t_sub:5.1f}x   iterati {stats['iterated'] / stats['pixels']:6.1%}   "
+              f"pixel diversi {diff}")
@@ -0,0 +1,311 @@
+"""
+Suite di benchmark di tutti i kernel, con confronto con una baseline salvata.
+
+Ogni caso gira in un processo nuovo, così il tempo della prima chiamata
+(compilazione JIT o lettura dalla cache di numba) e il picco di memoria (RSS
+massimo del processo, interprete e compilazione compresi) sono quelli di un
+avvio vero. Per ogni caso si riportano il migliore di --repeat tempi, pixel al
+secondo e iterazioni al secondo (per i frattali, in float64 e con gli altri
+livelli di precisione di frattali.precision, la somma dei conteggi di fuga,
+in cui i punti interni riconosciuti in forma chiusa valgono iterations anche se
+non vengono iterati; passi per pixel per il doppio pendolo, passate per cella
+per i risolutori di Laplace, passi di crescita per DielectricBreakdown). Tutto gira sulla CPU; con --check i kernel CUDA vengono eseguiti
+nel simulatore (NUMBA_ENABLE_CUDASIM=1) su griglie minuscole e confrontati con
+quelli CPU, e il motore di perturbazione (con e senza serie) viene confrontato
+con il kernel float64 su una vista poco profonda.
+
+    python benchmarks/suite.py --output risultati.json
+    python benchmarks/suite.py --baseline benchmarks/baseline.json --tolerance 0.25
+
+Con --baseline l'uscita è 1, con l'elenco dei casi, se un tempo supera quello
+della baseline di più di --tolerance (frazione). La baseline va generata sulla
+stessa macchina (--output) per essere significativa.
+"""
+from __future__ import print_function
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import resource
+import subprocess
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+CASES = {}
+
+
+def case(name):
+    def register(setup):
+        CASES[name] = setup
+        return setup
+    return register
+
+
+# Ogni caso prepara gli ingressi e restituisce (run, work): run() esegue il
+# kernel, work(risultato) restituisce (pixel, iterazioni) di una chiamata
+
+def _escape(formula, view, xres, yres, precision="float64"):
+    def setup(scale):
+        from frattali.escape import RENDERERS
+        w, h = int(xres * scale), int(yres * scale)
+        return (lambda: RENDERERS[formula](w, h, *view, backend="cpu", precision=precision),
+                lambda counts: (w * h, int(counts.sum(dtype=np.int64))))
+    return setup
+
+
+VIEWS = {
+    "mandelbrot": (1000, -2.0, 1.0, -1.5, 1.5),
+    "julia": (1000, 0.285, 0.013, -2.0, 1.0, -1.0, 1.0),
+    "burningship": (1000, -1.8, -1.7, -0.08, 0.025),
+}
+for _formula, _view in VIEWS.items():
+    case(_formula)(_escape(_formula, _view, 800, 600))
+    case(f"{_formula}_float32")(_escape(_formula, _view, 800, 600, "float32"))
+# Zoom di 1e-11 sul cavalluccio marino, dove il float64 sbaglia già un pixel su cinque
+case("mandelbrot_double_double")(_escape("mandelbrot", (3000, -0.7436438870421587, -0.7436438870321587,
+                                                        0.13182590420156198, 0.13182590420906198),
+                                         200, 150, "double-double"))
+
+
+@case("mandelbrot_numpy")
+def _(scale):
+    from frattali import numpy_escape
+    w, h = int(400 * scale), int(300 * scale)
+    return (lambda: numpy_escape.render_mandelbrot(w, h, 500, -2.0, 1.0, -1.5, 1.5),
+            lambda counts: (w * h, int(counts.sum(dtype=np.int64))))
+
+
+@case("log_colorize")
+def _(scale):
+    from frattali.colors import log_colorize
+    counts = np.random.default_rng(0).integers(0, 1001, (int(1200 * scale), int(1600 * scale)), dtype=np.int32)
+    out = np.empty(counts.shape + (3,), dtype=np.uint8)
+    return lambda: log_colorize(counts, 1000, "inferno", out), lambda _: (counts.size, 0)
+
+
+def _pendulum(scheme):
+    def setup(scale):
+        from frattali.pendulum import PendulumGrid
+        n, samples = int(200 * scale), 300
+        theta = np.linspace(-np.pi, np.pi, n)
+        grid = PendulumGrid(theta, theta, scheme=scheme, backend="cpu")
+        return lambda: grid.render(5.0, samples), lambda _: (n * n, n * n * samples)
+    return setup
+
+
+case("pendulum_verlet")(_pendulum("verlet"))
+case("pendulum_rk4")(_pendulum("rk4"))
+
+
+def _discharge(n):
+    from benchmarks.laplace import discharge, initial
+    bx, by = discharge(n)
+    potential, fixed = initial(n, bx, by)
+    return bx, by, potential, fixed
+
+
+@case("evolve_potential_kernel")
+def _(scale):
+    # Kernel originale del notebook: 200 passate di Jacobi con copia
+    from benchmarks.laplace import evolve_potential_kernel
+    n, sweeps = int(500 * scale), 200
+    bx, by, start, _ = _discharge(n)
+    potential = start.copy()
+
+    def run():
+        potential[...] = start
+        evolve_potential_kernel(potential, bx, by, len(bx), 0.0, 1.0, sweeps)
+    return run, lambda _: (n * n, n * n * sweeps)
+
+
+def _solver(name):
+    def setup(scale):
+        from frattali import laplace
+        n = int(500 * scale)
+        _, _, start, fixed = _discharge(n)
+        solver = laplace.make_solver(name, start.shape)
+        potential = start.copy()
+
+        def run():
+            potential[...] = start
+            return solver.solve(potential, fixed, 1e-6, 200 if name == "jacobi" else laplace.MAX_SWEEPS)
+        # Per il multigrid le "iterazioni" sono V-cicli
+        return run, lambda sweeps: (n * n, n * n * sweeps)
+    return setup
+
+
+case("laplace_jacobi")(_solver("jacobi"))
+case("laplace_sor")(_solver("sor"))
+case("laplace_multigrid")(_solver("multigrid"))
+
+
+@case("dielectric_step")
+def _(scale):
+    # 20 passi di crescita (soluzione del potenziale a caldo più estrazione)
+    from frattali.lichtenberg import DielectricBreakdown
+    n, steps = int(300 * scale), 20
+    model = DielectricBreakdown(n=n, eta=1.4, random_state=0)
+    model.simulate(50)
+
+    def run():
+        for _ in range(steps):
+            model.step()
+    return run, lambda _: (n * n * steps, steps)
+
+
+def measure(name, scale, repeat):
+    rss_start = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    run, work = CASES[name](scale)
+    result = run()
+    warmup = time.perf_counter() - start
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = run()
+        best = min(best, time.perf_counter() - start)
+    pixels, iterations = work(result)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {"case": name, "seconds": best, "warmup_seconds": warmup,
+            "pixels_per_second": pixels / best, "iterations_per_second": iterations / best,
+            "peak_rss_mb": peak / 1024, "case_rss_mb": (peak - rss_start) / 1024}
+
+
+def check_cuda_simulator():
+    """
+    Kernel CUDA nel simulatore contro i kernel CPU, su griglie minuscole.
+    Restituisce {nome: True/False}.
+    """
+    from frattali.escape import RENDERERS
+    from frattali.precision import PRECISIONS
+    from frattali.pendulum import render_pendulum
+    checks = {}
+    for name, view in VIEWS.items():
+        view = (50,) + view[1:]
+        for precision in PRECISIONS:
+            label = name if precision == "float64" else f"{name}_{precision}"
+            checks[label] = bool(np.array_equal(RENDERERS[name](12, 8, *view, backend="cuda", precision=precision),
+                                                RENDERERS[name](12, 8, *view, backend="cpu", precision=precision)))
+    theta = np.linspace(-np.pi, np.pi, 6)
+    for scheme in ("verlet", "rk4", "leapfrog"):
+        gpu = render_pendulum(theta, theta, 1.0, 20, scheme=scheme, backend="cuda")
+        cpu = render_pendulum(theta, theta, 1.0, 20, scheme=scheme, backend="cpu")
+        checks[f"pendulum_{scheme}"] = bool(np.allclose(gpu, cpu, rtol=0, atol=1e-12))
+    return checks
+
+
+def check_perturbation():
+    """
+    Motore di perturbazione (con e senza serie) contro il kernel float64 su
+    una vista poco profonda: al più lo 0.1% dei pixel può differire (rumore
+    di arrotondamento vicino al bordo). Restituisce {nome: True/False}.
+    """
+    from frattali.escape import render_mandelbrot, render_burningship
+    from frattali.perturbation import render_deep_mandelbrot, render_deep_burningship
+    checks = {}
+    direct = render_mandelbrot(200, 150, 500, -0.775, -0.725, 0.08125, 0.11875, precision="float64")
+    for series in (False, True):
+        deep = render_deep_mandelbrot(200, 150, 500, -0.75, 0.1, 0.05, series=series)
+        checks[f"mandelbrot_series_{series}"] = bool(np.mean(deep != direct) <= 1e-3)
+    # Il Burning Ship non ha controllo di periodicità: con molte iterazioni le
+    # orbite caotiche si separano, quindi si confronta a 50
+    direct = render_burningship(200, 150, 50, -1.775, -1.725, -0.04875, -0.01125, precision="float64")
+    deep = render_deep_burningship(200, 150, 50, -1.75, -0.03, 0.05)
+    checks["burningship"] = bool(np.mean(deep != direct) <= 1e-3)
+    return checks
+
+
+def worker(*args, cudasim=False):
+    # Esegue questo file con --worker in un processo nuovo, che stampa una riga JSON
+    env = dict(os.environ)
+    if cudasim:
+        env["NUMBA_ENABLE_CUDASIM"] = "1"
+    command = [sys.executable, os.path.abspath(__file__), "--worker"] + list(args)
+    done = subprocess.run(command, env=env, capture_output=True, text=True, cwd=ROOT)
+    if done.returncode != 0:
+        raise RuntimeError(f"{' '.join(args)} fallito:\n{done.stderr}")
+    return json.loads(done.stdout.strip().splitlines()[-1])
+
+
+def compare(results, baseline, tolerance):
+    old = {entry["case"]: entry for entry in baseline["results"]}
+    regressions = []
+    for entry in results:
+        if entry["case"] not in old:
+            continue
+        ratio = entry["seconds"] / old[entry["case"]]["seconds"]
+        flag = "REGRESSIONE" if ratio > 1 + tolerance else ""
+        print(f"  {entry['case']:<24} {ratio:6.2f}x rispetto alla baseline {flag}")
+        if flag:
+            regressions.append(entry["case"])
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("cases", nargs="*", help=f"casi da eseguire (default tutti: {', '.join(CASES)})")
+    parser.add_argument("--scale", type=float, default=1.0, help="fattore sul lato delle griglie")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="file JSON dei risultati")
+    parser.add_argument("--baseline", help="file JSON di una corsa precedente da confrontare")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--check", action="store_true",
+                        help="confronto dei kernel CUDA nel simulatore e della perturbazione con float64")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    opts = parser.parse_args()
+
+    if opts.worker == "check":
+        print(json.dumps(check_cuda_simulator()))
+        sys.exit(0)
+    if opts.worker == "perturbation":
+        print(json.dumps(check_perturbation()))
+        sys.exit(0)
+    if opts.worker:
+        print(json.dumps(measure(opts.worker, opts.scale, opts.repeat)))
+        sys.exit(0)
+
+    unknown = [name for name in opts.cases if name not in CASES]
+    if unknown:
+        parser.error(f"casi sconosciuti: {', '.join(unknown)}")
+    import numba
+
+    results = []
+    print(f"{'caso':<24} {'tempo':>10} {'prima':>9} {'Mpixel/s':>10} {'Miter/s':>10} {'picco MB':>9}")
+    for name in opts.cases or CASES:
+        entry = worker(name, "--scale", str(opts.scale), "--repeat", str(opts.repeat))
+        results.append(entry)
+        print(f"{name:<24} {entry['seconds'] * 1000:8.1f}ms {entry['warmup_seconds']:8.2f}s "
+              f"{entry['pixels_per_second'] / 1e6:10.2f} {entry['iterations_per_second'] / 1e6:10.1f} "
+              f"{entry['peak_rss_mb']:9.0f}", flush=True)
+
+    report = {"machine": {"platform": platform.platform(), "processor": platform.processor(),
+                          "cpus": os.cpu_count(), "python": platform.python_version(),
+                          "numpy": np.__version__, "numba": numba.__version__},
+              "scale": opts.scale, "results": results}
+    failed = []
+    if opts.check:
+        report["cuda_simulator"] = worker("check", cudasim=True)
+        failed += [f"cudasim:{name}" for name, ok in report["cuda_simulator"].items() if not ok]
+        print("simulatore CUDA:", ", ".join(f"{name} {'ok' if ok else 'DIVERSO'}"
+                                           for name, ok in report["cuda_simulator"].items()))
+        report["perturbation"] = worker("perturbation")
+        failed += [f"perturbation:{name}" for name, ok in report["perturbation"].items() if not ok]
+        print("perturbazione:", ", ".join(f"{name} {'ok' if ok else 'DIVERSO'}"
+                                         for name, ok in report["perturbation"].items()))
+    if opts.output:
+        with open(opts.output, "w") as f:
+            json.dump(report, f, indent=1)
+    if opts.baseline:
+        with open(opts.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("scale") != opts.scale:
+            print(f"attenzione: baseline con scala {baseline.get('scale')}, questa corsa {opts.scale}")
+        print(f"confronto con {opts.baseline} (tolleranza {opts.tolerance:.0%})")
+        failed += compare(results, baseline, opts.tolerance)
+    if failed:
+        print(f"FALLITO: {', '.join(failed)}")
+        sys.exit(1)
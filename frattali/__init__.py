@@ -0,0 +1 @@
+# Codice condiviso dagli script dei frattali (kernel, colorazione, ...)
@@ -0,0 +1,115 @@
+"""
+Colorazione degli array di iterazioni prodotti da frattali.escape.
+
+La scala logaritmica dipende solo dal numero di iterazioni, quindi i colori
+possibili sono iterations + 1: si calcolano una volta in una tabella uint8
+(per colormap e numero di iterazioni) e colorare un'immagine diventa una sola
+lettura indicizzata, senza i temporanei float64 grandi quanto l'immagine. Per i
+campi reali (doppio pendolo, potenziale di Lichtenberg) scalar_colorize fa lo
+stesso con la tabella della colormap.
+"""
+from functools import lru_cache
+import numpy as np
+import matplotlib.pyplot as plt
+from numba import cuda
+
+
+@lru_cache(maxsize=32)
+def color_lut(iterations, cmap):
+    """
+    Tabella (iterations + 1, 3) uint8: la riga n è il colore di log_colorize
+    per n iterazioni. È in sola lettura perché condivisa dalla cache.
+    """
+    # I kernel originali scrivevano iterations - 1 per i punti interni
+    counts = np.minimum(np.arange(iterations + 1), iterations - 1)
+
+    # Utilizzo di una mappa di colori logaritmica per migliorare la visibilità
+    counts_log = np.log(counts + 1) / np.log(iterations + 1)
+
+    # Conversione dei valori normalizzati in colori usando la colormap
+    lut = (plt.get_cmap(cmap)(counts_log)[:, :3] * 255).astype(np.uint8)
+    lut.flags.writeable = False
+    return lut
+
+
+def log_colorize(counts, iterations, cmap, out=None):
+    """
+    Immagine RGB uint8 delle iterazioni counts. Con out (forma counts.shape + (3,),
+    uint8) il risultato viene scritto lì senza allocare nulla.
+    """
+    return np.take(color_lut(iterations, cmap), counts, axis=0, out=out, mode="clip")
+
+
+_device_luts = {}
+
+
+@cuda.jit
+def _gather_gpu(counts, lut, out):
+    x, y = cuda.grid(2)
+    if x < counts.shape[1] and y < counts.shape[0]:
+        n = min(max(counts[y, x], 0), lut.shape[0] - 1)
+        for k in range(3):
+            out[y, x, k] = lut[n, k]
+
+
+def log_colorize_device(counts, iterations, cmap, out=None):
+    """
+    Come log_colorize ma per un array di iterazioni già sul dispositivo: la
+    tabella viene copiata una volta sola e il risultato resta sul dispositivo.
+    """
+    key = (iterations, cmap)
+    if key not in _device_luts:
+        _device_luts[key] = cuda.to_device(color_lut(iterations, cmap))
+    if out is None:
+        out = cuda.device_array(counts.shape + (3,), dtype=np.uint8)
+
+    threadsperblock = (32, 32)
+    blockspergrid = (int(np.ceil(counts.shape[1] / threadsperblock[0])),
+                     int(np.ceil(counts.shape[0] / threadsperblock[1])))
+    _gather_gpu[blockspergrid, threadsperblock](counts, _device_luts[key], out)
+    return out
+
+
+_cmap_luts = {}
+
+
+def cmap_lut(cmap):
+    """
+    Tabella (N, 3) uint8 della colormap (nome o oggetto Colormap, ad esempio una
+    LinearSegmentedColormap fatta a mano), con N = cmap.N come in matplotlib.
+    """
+    # Le Colormap non sono hashabili: si indicizzano per id, tenendole in vita
+    key = cmap if isinstance(cmap, str) else id(cmap)
+    if key not in _cmap_luts:
+        colormap = plt.get_cmap(cmap)
+        lut = (colormap(np.arange(colormap.N))[:, :3] * 255).astype(np.uint8)
+        lut.flags.writeable = False
+        _cmap_luts[key] = (cmap, lut)
+    return _cmap_luts[key][1]
+
+
+def scalar_colorize(values, cmap, vmin=None, vmax=None, log=False, out=None):
+    """
+    Immagine RGB uint8 di un campo reale qualsiasi (vmin/vmax di default dai
+    dati, log=True per la scala logaritmica): stesso indice nella colormap che
+    userebbe matplotlib, ma con una sola lettura dalla tabella.
+    """
+    lut = cmap_lut(cmap)
+    # Valori non positivi in scala log (o fuori scala) finiscono sugli estremi
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if log:
+            values = np.log10(values)
+            vmin = None if vmin is None else np.log10(vmin)
+            vmax = None if vmax is None else np.log10(vmax)
+        vmin = values.min() if vmin is None else vmin
+        vmax = values.max() if vmax is None else vmax
+        scale = len(lut) / (vmax - vmin) if vmax > vmin else 0.0
+        index = ((values - vmin) * scale).astype(np.int64)
+    return np.take(lut, index, axis=0, out=out, mode="clip")
+
+
+def grey_shade(counts, iterations, interior):
+    # Sfumatura per l'esterno, grigio uniforme (interior) per l'interno
+    shade = (255 - counts.astype(np.int64) * 255 // iterations).astype(np.uint8)
+    shade[counts >= iterations] = interior
+    return shade
@@ -0,0 +1,294 @@
+"""
+Kernel condivisi per i frattali a tempo di fuga (Mandelbrot, Julia, Burning Ship).
+
+Ogni formula è scritta una sola volta come funzione scalare e poi compilata due
+volte: come device function CUDA e come funzione njit per la CPU. Il kernel CPU
+è parallelo sulle righe (prange), quello CUDA usa la stessa griglia 2D degli
+script originali. Le coordinate dei pixel sono calcolate con la stessa
+espressione in entrambi i casi, per cui i due backend danno lo stesso risultato.
+
+Il valore scritto nell'array è l'iterazione di fuga n in [0, iterations), oppure
+iterations per i punti che non sono mai usciti dal disco di raggio 2.
+
+Mandelbrot e Julia evitano di iterare fino in fondo i punti interni: per
+Mandelbrot la cardioide principale e il bulbo di periodo 2 si riconoscono in
+forma chiusa, e in entrambi un controllo di periodicità alla Brent interrompe
+le orbite che tornano esattamente su un punto già visto (un'orbita che si
+ripete bit per bit non può più fuggire, quindi il risultato non cambia).
+
+Le funzioni render_* scelgono il livello di precisione (float64 o
+double-double) dal passo dei pixel, il float32 va chiesto, vedi
+frattali.precision; i kernel qui sotto sono quelli float64.
+"""
+from __future__ import print_function
+import os
+import time
+import numpy as np
+from numba import cuda, njit, prange
+
+from frattali.precision import select_precision, kernel_args, kernel as precision_kernel
+
+BACKENDS = ("cuda", "cpu")
+
+
+# Formule scalari (compilate sia per la CPU sia per CUDA)
+
+def _mandelbrot(cx, cy, iterations):
+    # Cardioide principale e bulbo di periodo 2: punti interni in forma chiusa
+    xq = cx - 0.25
+    q = xq * xq + cy * cy
+    if q * (q + xq) <= 0.25 * cy * cy:
+        return iterations
+    if (cx + 1.0) * (cx + 1.0) + cy * cy <= 0.0625:
+        return iterations
+
+    zx, zy = 0.0, 0.0
+    # Controllo di periodicità (Brent): il punto salvato si aggiorna a ogni
+    # potenza di due, quindi si trova qualsiasi periodo senza salvare l'orbita
+    ox, oy = 0.0, 0.0
+    steps, window = 0, 8
+    for n in range(iterations):
+        zx, zy = zx * zx - zy * zy + cx, 2.0 * zx * zy + cy
+        if zx * zx + zy * zy >= 4.0:
+            return n
+        if zx == ox and zy == oy:
+            return iterations
+        steps += 1
+        if steps == window:
+            steps = 0
+            window *= 2
+            ox, oy = zx, zy
+    return iterations
+
+
+def _julia(zx, zy, cx, cy, iterations):
+    ox, oy = zx, zy
+    steps, window = 0, 8
+    for n in range(iterations):
+        zx, zy = zx * zx - zy * zy + cx, 2.0 * zx * zy + cy
+        if zx * zx + zy * zy >= 4.0:
+            return n
+        if zx == ox and zy == oy:
+            return iterations
+        steps += 1
+        if steps == window:
+            steps = 0
+            window *= 2
+            ox, oy = zx, zy
+    return iterations
+
+
+def _burningship(cx, cy, iterations):
+    zx, zy = 0.0, 0.0
+    for n in range(iterations):
+        zx, zy = abs(zx), abs(zy)
+        zx, zy = zx * zx - zy * zy + cx, 2.0 * zx * zy + cy
+        if zx * zx + zy * zy >= 4.0:
+            return n
+    return iterations
+
+
+mandelbrot_cpu = njit(cache=True)(_mandelbrot)
+julia_cpu = njit(cache=True)(_julia)
+burningship_cpu = njit(cache=True)(_burningship)
+
+mandelbrot_gpu = cuda.jit(device=True)(_mandelbrot)
+julia_gpu = cuda.jit(device=True)(_julia)
+burningship_gpu = cuda.jit(device=True)(_burningship)
+
+
+# Kernel CPU: una riga per iterazione di prange
+
+@njit(parallel=True, nogil=True, cache=True)
+def create_mandelbrot_cpu(xres, yres, iterations, out, x_min, x_max, y_min, y_max, y_start):
+    for row in prange(out.shape[0]):
+        y = y_start + row
+        cy = y_min + y * (y_max - y_min) / yres
+        for x in range(xres):
+            cx = x_min + x * (x_max - x_min) / xres
+            out[row, x] = mandelbrot_cpu(cx, cy, iterations)
+
+
+@njit(parallel=True, nogil=True, cache=True)
+def create_julia_cpu(xres, yres, iterations, out, cx, cy, x_min, x_max, y_min, y_max, y_start):
+    for row in prange(out.shape[0]):
+        y = y_start + row
+        zy = y_min + y * (y_max - y_min) / yres
+        for x in range(xres):
+            zx = x_min + x * (x_max - x_min) / xres
+            out[row, x] = julia_cpu(zx, zy, cx, cy, iterations)
+
+
+@njit(parallel=True, nogil=True, cache=True)
+def create_burningship_cpu(xres, yres, iterations, out, x_min, x_max, y_min, y_max, y_start):
+    for row in prange(out.shape[0]):
+        y = y_start + row
+        cy = y_min + y * (y_max - y_min) / yres
+        for x in range(xres):
+            cx = x_min + x * (x_max - x_min) / xres
+            out[row, x] = burningship_cpu(cx, cy, iterations)
+
+
+# Kernel CUDA: un thread per pixel
+
+@cuda.jit
+def create_mandelbrot_gpu(xres, yres, iterations, out, x_min, x_max, y_min, y_max, y_start):
+    x, row = cuda.grid(2)
+    if x < xres and row < out.shape[0]:
+        y = y_start + row
+        cx = x_min + x * (x_max - x_min) / xres
+        cy = y_min + y * (y_max - y_min) / yres
+        out[row, x] = mandelbrot_gpu(cx, cy, iterations)
+
+
+@cuda.jit
+def create_julia_gpu(xres, yres, iterations, out, cx, cy, x_min, x_max, y_min, y_max, y_start):
+    x, row = cuda.grid(2)
+    if x < xres and row < out.shape[0]:
+        y = y_start + row
+        zx = x_min + x * (x_max - x_min) / xres
+        zy = y_min + y * (y_max - y_min) / yres
+        out[row, x] = julia_gpu(zx, zy, cx, cy, iterations)
+
+
+@cuda.jit
+def create_burningship_gpu(xres, yres, iterations, out, x_min, x_max, y_min, y_max, y_start):
+    x, row = cuda.grid(2)
+    if x < xres and row < out.shape[0]:
+        y = y_start + row
+        cx = x_min + x * (x_max - x_min) / xres
+        cy = y_min + y * (y_max - y_min) / yres
+        out[row, x] = burningship_gpu(cx, cy, iterations)
+
+
+def select_backend(backend=None):
+    """
+    Sceglie il backend: "cuda" se c'è un dispositivo, altrimenti "cpu".
+    Si può forzare con l'argomento o con la variabile FRATTALI_BACKEND.
+    """
+    if backend is None:
+        backend = os.environ.get("FRATTALI_BACKEND", "auto")
+    if backend == "auto":
+        return "cuda" if cuda.is_available() else "cpu"
+    if backend not in BACKENDS:
+        raise ValueError(f"backend sconosciuto: {backend!r} (validi: auto, {', '.join(BACKENDS)})")
+    if backend == "cuda" and not cuda.is_available():
+        raise RuntimeError("backend 'cuda' richiesto ma nessun dispositivo CUDA disponibile")
+    return backend
+
+
+def _launch(kernel_gpu, kernel_cpu, xres, yres, args, backend, out, rows):
+    # rows = (y0, y1) calcola solo le righe [y0, y1) dell'immagine xres x yres
+    y0, y1 = (0, yres) if rows is None else rows
+    if out is None:
+        out = np.zeros((y1 - y0, xres), dtype=np.int32)
+    elif out.shape != (y1 - y0, xres):
+        raise ValueError(f"out ha forma {out.shape}, attesa {(y1 - y0, xres)}")
+
+    if select_backend(backend) == "cpu":
+        kernel_cpu(xres, yres, args[0], out, *args[1:], y0)
+        return out
+
+    # Copia della memoria sul dispositivo
+    out_device = cuda.to_device(out)
+
+    # Definizione delle dimensioni dei blocchi e delle griglie
+    threadsperblock = (32, 32)
+    blockspergrid_x = int(np.ceil(xres / threadsperblock[0]))
+    blockspergrid_y = int(np.ceil((y1 - y0) / threadsperblock[1]))
+    blockspergrid = (blockspergrid_x, blockspergrid_y)
+
+    # Esecuzione del kernel
+    kernel_gpu[blockspergrid, threadsperblock](xres, yres, args[0], out_device, *args[1:], y0)
+
+    # Copia del risultato di nuovo all'host
+    out_device.copy_to_host(out)
+    return out
+
+
+def _render(formula, kernel_gpu, kernel_cpu, xres, yres, iterations, a, b, view, backend, out, rows,
+            precision, stats):
+    precision = select_precision(xres, yres, *view, precision)
+    if stats is not None:
+        stats["precision"] = precision
+    args = kernel_args(precision, xres, yres, iterations, a, b, *view)
+    if precision == "float64":
+        # Kernel originali: Julia ha c dopo iterations, gli altri non lo hanno
+        if formula != "julia":
+            args = args[:1] + args[3:]
+        return _launch(kernel_gpu, kernel_cpu, xres, yres, args, backend, out, rows)
+    backend = select_backend(backend)
+    tier = precision_kernel(formula, precision, backend)
+    return _launch(tier, tier, xres, yres, args, backend, out, rows)
+
+
+def render_mandelbrot(xres, yres, iterations, x_min, x_max, y_min, y_max, backend=None, out=None, rows=None,
+                      precision=None, stats=None):
+    """
+    Iterazioni di fuga di Mandelbrot nella vista. precision è "auto" (default,
+    float64 o double-double, vedi frattali.precision), "float32", "float64" o
+    "double-double"; se stats
+    è un dizionario vi si scrive il livello usato in "precision".
+    """
+    return _render("mandelbrot", create_mandelbrot_gpu, create_mandelbrot_cpu, xres, yres, iterations,
+                   0.0, 0.0, (x_min, x_max, y_min, y_max), backend, out, rows, precision, stats)
+
+
+def render_julia(xres, yres, iterations, cx, cy, x_min, x_max, y_min, y_max, backend=None, out=None, rows=None,
+                 precision=None, stats=None):
+    """Come render_mandelbrot, per l'insieme di Julia del parametro (cx, cy)."""
+    return _render("julia", create_julia_gpu, create_julia_cpu, xres, yres, iterations,
+                   cx, cy, (x_min, x_max, y_min, y_max), backend, out, rows, precision, stats)
+
+
+def render_burningship(xres, yres, iterations, x_min, x_max, y_min, y_max, backend=None, out=None, rows=None,
+                       precision=None, stats=None):
+    """Come render_mandelbrot, per il Burning Ship."""
+    return _render("burningship", create_burningship_gpu, create_burningship_cpu, xres, yres, iterations,
+                   0.0, 0.0, (x_min, x_max, y_min, y_max), backend, out, rows, precision, stats)
+
+
+RENDERERS = {
+    "mandelbrot": render_mandelbrot,
+    "julia": render_julia,
+    "burningship": render_burningship,
+}
+
+
+def throughput(render, xres, yres, *args, repeat=3, **kwargs):
+    """
+    Pixel al secondo di una funzione render_*. La prima chiamata (compilazione
+    JIT) è esclusa dalla misura; si tiene il migliore di `repeat` tempi.
+    """
+    render(xres, yres, *args, **kwargs)
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        render(xres, yres, *args, **kwargs)
+        best = min(best, time.perf_counter() - start)
+    return xres * yres / best
+
+
+if __name__ == "__main__":
+    # Pixel/s di ogni formula sul backend scelto (utile per dimensionare i nodi CPU)
+    import argparse
+    parser = argparse.ArgumentParser(description="Throughput dei kernel a tempo di fuga")
+    parser.add_argument("--backend", default=None)
+    parser.add_argument("--xres", type=int, default=800)
+    parser.add_argument("--yres", type=int, default=600)
+    parser.add_argument("--iterations", type=int, default=1000)
+    parser.add_argument("--precision", default=None, help="auto, float32, float64 o double-double")
+    opts = parser.parse_args()
+
+    backend = select_backend(opts.backend)
+    views = {
+        "mandelbrot": (opts.iterations, -2.0, 1.0, -1.5, 1.5),
+        "julia": (opts.iterations, 0.285, 0.013, -2.0, 1.0, -1.0, 1.0),
+        "burningship": (opts.iterations, -1.8, -1.7, -0.08, 0.025),
+    }
+    print(f"backend: {backend}")
+    for name, args in views.items():
+        stats = {}
+        pps = throughput(RENDERERS[name], opts.xres, opts.yres, *args, backend=backend, precision=opts.precision,
+                         stats=stats)
+        print(f"{name:12s} {pps / 1e6:8.2f} Mpixel/s  {stats['precision']}")
@@ -0,0 +1,450 @@
+"""
+Rendering distribuito a tile: un coordinatore e un gruppo di worker.
+
+Il coordinatore divide ogni fotogramma in bande di righe (tile_pixels pixel,
+come frattali.tiled) e le distribuisce su socket ai worker che si collegano
+(multiprocessing.connection, con autenticazione per authkey): processi locali
+lanciati da render_farm oppure processi su altri nodi avviati con
+
+    python -m frattali.farm worker HOST:PORTA --authkey CHIAVE
+
+I messaggi sono oggetti pickle, quindi chi conosce la chiave può eseguire
+codice sul coordinatore e sui worker: non c'è una chiave predefinita. Se il
+coordinatore ascolta oltre l'host locale la chiave va data (authkey o
+FRATTALI_FARM_KEY), altrimenti se ne genera una casuale per i worker locali.
+
+Ogni worker chiede una banda, la calcola con le funzioni render_* (rows=...) e
+rimanda i conteggi compressi con zlib; il coordinatore risponde con la banda
+successiva. Le bande sono quindi assegnate a chi si libera (bilanciamento
+dinamico) e in ordine di costo stimato decrescente: un'anteprima a 1/PREVIEW
+della risoluzione dice quante iterazioni costa ogni banda, così le bande
+interne, le più lente, partono per prime e non restano in coda alla fine.
+Quando la coda è vuota un worker libero ruba la banda in corso da più tempo e
+ne calcola una copia (al massimo MAX_COPIES esecuzioni contemporanee): vale il
+primo risultato che arriva, per cui un nodo lento o bloccato non ritarda la
+fine. Se la connessione di un worker cade, le sue bande tornano in testa alla
+coda (al massimo MAX_ATTEMPTS volte ciascuna); se invece il calcolo di una
+banda solleva un'eccezione, il worker rimanda il traceback e il coordinatore
+si ferma con quell'errore.
+
+Le bande arrivano in ordine sparso e vengono scritte in una tela int32 su un
+file temporaneo (np.memmap); quando tutte le bande di un fotogramma sono
+arrivate, il fotogramma viene colorato e scritto in PNG a bande. Per
+un'animazione si passano più fotogrammi (nome del file e argomenti di
+ognuno); le bande del fotogramma k partono prima di quelle del k + 1.
+"""
+from __future__ import print_function
+import os
+import sys
+import secrets
+import time
+import zlib
+import socket
+import tempfile
+import threading
+import traceback
+import subprocess
+from collections import deque
+from multiprocessing.connection import Listener, Client
+import numpy as np
+
+from frattali.tiled import TILE_PIXELS, band_rows_for
+from frattali.pngstream import PNGWriter
+
+LOCAL_HOSTS = ("127.0.0.1", "localhost", "::1")
+# Lato dell'anteprima per la stima dei costi, in frazioni della risoluzione
+PREVIEW = 8
+MAX_COPIES = 2
+MAX_ATTEMPTS = 5
+# Attesa di un worker quando non c'è nulla da fare ma le bande non sono finite
+WAIT = 0.2
+CONNECT_TIMEOUT = 30.0
+
+
+def _renderer(formula, subdivide):
+    from frattali.escape import RENDERERS
+    from frattali.subdivide import SUBDIVIDED_RENDERERS
+    return (SUBDIVIDED_RENDERERS if subdivide else RENDERERS)[formula]
+
+
+def estimate_costs(formula, xres, yres, args, bands, preview=PREVIEW, backend=None, **options):
+    """
+    Costo stimato di ogni banda (y0, y1): le iterazioni dei pixel di
+    un'anteprima a 1/preview della risoluzione, più uno per pixel.
+    """
+    from frattali.escape import RENDERERS
+    width, height = max(1, xres // preview), max(1, yres // preview)
+    counts = RENDERERS[formula](width, height, *args, backend=backend, **options)
+    per_row = counts.sum(axis=1, dtype=np.float64) + width
+    costs = []
+    for y0, y1 in bands:
+        r0 = y0 * height // yres
+        r1 = max(r0 + 1, -(-y1 * height // yres))
+        costs.append(per_row[r0:r1].mean() * (y1 - y0))
+    return costs
+
+
+class Farm():
+    """
+    Coordinatore. frames è una lista di (filename, args): args sono gli
+    argomenti della funzione render_* dopo xres, yres. Le opzioni (per esempio
+    precision) sono passate ai worker.
+    """
+    def __init__(self, formula, xres, yres, frames, colorize, address=("127.0.0.1", 0), authkey=None,
+                 tile_pixels=TILE_PIXELS, subdivide=False, estimate=True, channels=3, compress_level=6,
+                 max_copies=MAX_COPIES, max_attempts=MAX_ATTEMPTS, **options):
+        self.formula = formula
+        self.xres, self.yres = xres, yres
+        self.frames = list(frames)
+        self.colorize = colorize
+        self.subdivide = subdivide
+        self.options = options
+        self.channels = channels
+        self.compress_level = compress_level
+        self.max_copies = max_copies
+        self.max_attempts = max_attempts
+
+        rows = band_rows_for(xres, yres, tile_pixels)
+        self.bands = [(y0, min(y0 + rows, yres)) for y0 in range(0, yres, rows)]
+        order = []
+        for frame, (_, args) in enumerate(self.frames):
+            costs = (estimate_costs(formula, xres, yres, args, self.bands, **options) if estimate
+                     else [0.0] * len(self.bands))
+            order += [(frame, band) for band in sorted(range(len(self.bands)), key=lambda b: -costs[b])]
+        self.pending = deque(order)
+
+        self.lock = threading.Lock()
+        self.changed = threading.Condition(self.lock)
+        self.running = {}     # tile -> {worker: inizio}
+        self.attempts = {}
+        self.done = set()
+        self.remaining = [len(self.bands)] * len(self.frames)
+        self.canvases = {}
+        self.complete = deque()
+        self.error = None
+        self.stats = {"tiles": 0, "stolen": 0, "wasted": 0, "retried": 0, "workers": {}}
+
+        self.listener = Listener(address, authkey=farm_key(authkey, address[0]))
+        self.address = self.listener.address
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    # Lato rete: un thread per worker
+
+    def _accept(self):
+        while True:
+            try:
+                conn = self.listener.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _serve(self, conn):
+        name, held = None, set()
+        try:
+            while True:
+                message = conn.recv()
+                if message[0] == "ready":
+                    name = message[1]
+                elif message[0] == "result":
+                    _, tile, payload = message
+                    held.discard(tile)
+                    self._finish(tile, payload, name)
+                elif message[0] == "error":
+                    # Errore del calcolo (per esempio un'opzione non valida): ripetere
+                    # la banda darebbe lo stesso errore, quindi il rendering si ferma
+                    _, tile, trace = message
+                    held.discard(tile)
+                    self._failed(tile, trace, name)
+                assignment = self._next(name)
+                if assignment is None:
+                    conn.send(("done",))
+                    return
+                if assignment == "wait":
+                    conn.send(("wait", WAIT))
+                    continue
+                held.add(assignment)
+                frame, band = assignment
+                y0, y1 = self.bands[band]
+                conn.send(("tile", assignment, (self.formula, self.xres, self.yres, self.frames[frame][1],
+                                                (y0, y1), self.subdivide, self.options)))
+        except (EOFError, OSError):
+            self._lost(name, held)
+        finally:
+            conn.close()
+
+    def _next(self, name):
+        with self.lock:
+            if self.error is not None or len(self.done) == len(self.bands) * len(self.frames):
+                return None
+            if self.pending:
+                tile = self.pending.popleft()
+            else:
+                # Furto: copia della banda in corso da più tempo, non già di questo worker
+                candidates = [(min(holders.values()), tile) for tile, holders in self.running.items()
+                              if name not in holders and len(holders) < self.max_copies]
+                if not candidates:
+                    return "wait"
+                tile = min(candidates)[1]
+                self.stats["stolen"] += 1
+            self.running.setdefault(tile, {})[name] = time.perf_counter()
+            return tile
+
+    def _finish(self, tile, payload, name):
+        frame, band = tile
+        y0, y1 = self.bands[band]
+        with self.lock:
+            self.running.get(tile, {}).pop(name, None)
+            if tile in self.done:
+                self.stats["wasted"] += 1
+                return
+            if frame not in self.canvases:
+                self.canvases[frame] = np.memmap(tempfile.TemporaryFile(), dtype=np.int32, mode="w+",
+                                                 shape=(self.yres, self.xres))
+            canvas = self.canvases[frame]
+        canvas[y0:y1] = np.frombuffer(zlib.decompress(payload), dtype=np.int32).reshape(y1 - y0, self.xres)
+        with self.lock:
+            if tile in self.done:
+                return
+            self.done.add(tile)
+            self.running.pop(tile, None)
+            self.stats["tiles"] += 1
+            self.stats["workers"][name] = self.stats["workers"].get(name, 0) + 1
+            self.remaining[frame] -= 1
+            if self.remaining[frame] == 0:
+                self.complete.append(frame)
+            self.changed.notify_all()
+
+    def _failed(self, tile, trace, name):
+        with self.lock:
+            self.running.get(tile, {}).pop(name, None)
+            if self.error is None:
+                self.error = RuntimeError(f"banda {tile} fallita sul worker {name}:\n{trace}")
+            self.changed.notify_all()
+
+    def _lost(self, name, held):
+        # Le bande del worker perso tornano in testa alla coda se nessun altro le sta calcolando
+        with self.lock:
+            for tile in held:
+                holders = self.running.get(tile, {})
+                holders.pop(name, None)
+                if tile in self.done or holders:
+                    continue
+                self.running.pop(tile, None)
+                self.attempts[tile] = self.attempts.get(tile, 1) + 1
+                if self.attempts[tile] > self.max_attempts:
+                    self.error = RuntimeError(f"banda {tile} persa {self.max_attempts} volte")
+                self.pending.appendleft(tile)
+                self.stats["retried"] += 1
+            self.changed.notify_all()
+
+    # Lato locale: attesa e scrittura dei fotogrammi
+
+    def _write(self, frame):
+        filename = self.frames[frame][0]
+        canvas = self.canvases.pop(frame)
+        with PNGWriter(filename, self.xres, self.yres, channels=self.channels,
+                       compress_level=self.compress_level) as png:
+            for y0, y1 in self.bands:
+                png.write_rows(self.colorize(np.asarray(canvas[y0:y1])))
+
+    def wait(self, alive=None, poll=1.0):
+        """
+        Scrive i fotogrammi man mano che sono completi, fino all'ultimo.
+        alive() dice se restano worker che possono finire il lavoro (per i
+        processi locali); senza, si aspetta che se ne colleghino di nuovi.
+        """
+        start = time.perf_counter()
+        written = 0
+        while written < len(self.frames):
+            with self.lock:
+                while not self.complete and self.error is None:
+                    if not self.changed.wait(poll) and alive is not None and not alive():
+                        self.error = RuntimeError("tutti i worker sono terminati prima della fine")
+                if self.error is not None:
+                    self.close()
+                    raise self.error
+                frame = self.complete.popleft()
+            self._write(frame)
+            written += 1
+        self.stats["seconds"] = time.perf_counter() - start
+        return self.stats
+
+    def close(self):
+        self.listener.close()
+
+
+def farm_key(authkey=None, host="127.0.0.1"):
+    """
+    Chiave della connessione (bytes): authkey, altrimenti FRATTALI_FARM_KEY.
+    Senza nessuna delle due, per un host locale se ne genera una casuale,
+    per un host raggiungibile da altri nodi è un errore.
+    """
+    if authkey is None:
+        authkey = os.environ.get("FRATTALI_FARM_KEY")
+    if authkey is None:
+        if host not in LOCAL_HOSTS:
+            raise ValueError(f"il coordinatore ascolta su {host!r}: serve una chiave (authkey o FRATTALI_FARM_KEY)")
+        # In esadecimale per poterla passare ai worker nell'ambiente
+        authkey = secrets.token_bytes(32).hex()
+    return authkey.encode() if isinstance(authkey, str) else authkey
+
+
+def start_workers(address, n, authkey=None, backend=None, threads=None, die_after=None):
+    """
+    n processi worker locali collegati ad address. I thread di numba sono
+    divisi fra i processi (threads per processo, default cpu / n).
+    """
+    env = dict(os.environ)
+    env["NUMBA_NUM_THREADS"] = str(threads or max(1, (os.cpu_count() or 1) // n))
+    env["FRATTALI_FARM_KEY"] = farm_key(authkey, address[0]).decode()
+    root = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+    host, port = address
+    processes = []
+    for k in range(n):
+        command = [sys.executable, "-m", "frattali.farm", "worker", f"{host}:{port}", "--name", f"locale-{k}"]
+        if backend:
+            command += ["--backend", backend]
+        if die_after is not None and k == 0:
+            command += ["--die-after", str(die_after)]
+        processes.append(subprocess.Popen(command, env=env, cwd=root))
+    return processes
+
+
+def render_frames(formula, xres, yres, frames, colorize, workers=None, address=("127.0.0.1", 0),
+                  authkey=None, backend=None, die_after=None, **options):
+    """
+    Calcola i fotogrammi [(filename, args), ...] con workers processi locali
+    (default uno per core) e con i worker remoti che si collegano ad address.
+    Con workers=0 lavorano solo quelli remoti. Senza authkey (né
+    FRATTALI_FARM_KEY) un address locale riceve una chiave casuale, che viene
+    stampata; uno non locale è un errore. Restituisce le statistiche.
+    """
+    generated = authkey is None and "FRATTALI_FARM_KEY" not in os.environ
+    authkey = farm_key(authkey, address[0])
+    if generated:
+        print(f"chiave generata per i worker: {authkey.decode()}", flush=True)
+    farm = Farm(formula, xres, yres, frames, colorize, address=address, authkey=authkey, **options)
+    print(f"coordinatore in ascolto su {farm.address[0]}:{farm.address[1]}, "
+          f"{len(farm.bands) * len(farm.frames)} bande", flush=True)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    processes = start_workers(("127.0.0.1", farm.address[1]), workers, authkey, backend,
+                              die_after=die_after) if workers else []
+    alive = (lambda: any(p.poll() is None for p in processes)) if processes and address[1] == 0 else None
+    try:
+        return farm.wait(alive)
+    finally:
+        farm.close()
+        for p in processes:
+            p.wait()
+
+
+def render_farm(filename, formula, xres, yres, args, colorize, workers=None, **options):
+    """Come frattali.tiled.render_png, con le bande calcolate dal gruppo di worker."""
+    return render_frames(formula, xres, yres, [(filename, args)], colorize, workers=workers, **options)
+
+
+def run_worker(address, authkey=None, name=None, backend=None, die_after=None):
+    """
+    Ciclo di un worker: chiede bande al coordinatore finché non ce ne sono più.
+    Con die_after=k il processo muore dopo aver calcolato k bande senza
+    mandare l'ultima (prova dei tentativi ripetuti).
+    """
+    name = name or f"{socket.gethostname()}-{os.getpid()}"
+    key = authkey if authkey is not None else os.environ.get("FRATTALI_FARM_KEY")
+    if key is None:
+        raise ValueError("serve la chiave del coordinatore (authkey o FRATTALI_FARM_KEY)")
+    key = key.encode() if isinstance(key, str) else key
+    deadline = time.monotonic() + CONNECT_TIMEOUT
+    while True:
+        try:
+            conn = Client(address, authkey=key)
+            break
+        except ConnectionRefusedError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(WAIT)
+
+    computed = 0
+    buffer = None
+    conn.send(("ready", name))
+    while True:
+        message = conn.recv()
+        if message[0] == "done":
+            break
+        if message[0] == "wait":
+            time.sleep(message[1])
+            conn.send(("ready", name))
+            continue
+        _, tile, (formula, xres, yres, args, rows, subdivide, options) = message
+        shape = (rows[1] - rows[0], xres)
+        if buffer is None or buffer.shape != shape:
+            buffer = np.empty(shape, dtype=np.int32)
+        try:
+            _renderer(formula, subdivide)(xres, yres, *args, backend=backend, out=buffer, rows=rows, **options)
+        except Exception:
+            conn.send(("error", tile, traceback.format_exc()))
+            continue
+        computed += 1
+        if die_after is not None and computed >= die_after:
+            os._exit(1)
+        conn.send(("result", tile, zlib.compress(buffer.tobytes(), 1)))
+    conn.close()
+
+
+def _address(text):
+    host, port = text.rsplit(":", 1)
+    return host, int(port)
+
+
+if __name__ == "__main__":
+    import argparse
+    from frattali.colors import log_colorize
+
+    parser = argparse.ArgumentParser(description="Rendering distribuito a tile")
+    commands = parser.add_subparsers(dest="command", required=True)
+    work = commands.add_parser("worker", help="worker che si collega a un coordinatore")
+    work.add_argument("address", help="HOST:PORTA del coordinatore")
+    work.add_argument("--name")
+    work.add_argument("--backend", default=None)
+    work.add_argument("--authkey", default=None, help="chiave condivisa (default FRATTALI_FARM_KEY)")
+    work.add_argument("--die-after", type=int, default=None, help=argparse.SUPPRESS)
+    render = commands.add_parser("render", help="coordinatore (e worker locali)")
+    render.add_argument("formula", choices=["mandelbrot", "julia", "burningship"])
+    render.add_argument("filename")
+    render.add_argument("--xres", type=int, default=12800)
+    render.add_argument("--yres", type=int, default=9600)
+    render.add_argument("--iterations", type=int, default=10000)
+    render.add_argument("--workers", type=int, default=None, help="processi locali (default uno per core)")
+    render.add_argument("--listen", default="127.0.0.1:0", help="HOST:PORTA per i worker remoti")
+    render.add_argument("--authkey", default=None,
+                        help="chiave condivisa (default FRATTALI_FARM_KEY), obbligatoria con --listen non locale")
+    render.add_argument("--tile-pixels", type=int, default=TILE_PIXELS)
+    render.add_argument("--subdivide", action="store_true")
+    render.add_argument("--cmap", default="inferno")
+    render.add_argument("--die-after", type=int, default=None,
+                        help="il primo worker locale muore dopo tante bande (prova dei tentativi)")
+    opts = parser.parse_args()
+    authkey = opts.authkey or os.environ.get("FRATTALI_FARM_KEY")
+
+    if opts.command == "worker":
+        if authkey is None:
+            parser.error("serve --authkey o FRATTALI_FARM_KEY")
+        run_worker(_address(opts.address), authkey, opts.name, opts.backend, opts.die_after)
+        sys.exit(0)
+
+    views = {
+        "mandelbrot": (opts.iterations, -2.0, 1.0, -1.0, 1.0),
+        "julia": (opts.iterations, 0.285, 0.013, -2.0, 1.0, -1.0, 1.0),
+        "burningship": (opts.iterations, -1.8, -1.7, -0.08, 0.025),
+    }
+    if authkey is None and _address(opts.listen)[0] not in LOCAL_HOSTS:
+        parser.error(f"--listen {opts.listen} accetta worker da altri nodi: serve --authkey o FRATTALI_FARM_KEY")
+    stats = render_farm(opts.filename, opts.formula, opts.xres, opts.yres, views[opts.formula],
+                        lambda band: log_colorize(band, opts.iterations, opts.cmap), workers=opts.workers,
+                        address=_address(opts.listen), authkey=authkey, tile_pixels=opts.tile_pixels,
+                        subdivide=opts.subdivide, die_after=opts.die_after)
+    print(f"{opts.filename}: {stats['seconds']:.1f} s, {stats['tiles']} bande, {stats['stolen']} copie rubate "
+          f"({stats['wasted']} inutili), {stats['retried']} ripetute")
+    for name, tiles in sorted(stats["workers"].items()):
+        print(f"  {name:<24} {tiles} bande")
@@ -0,0 +1,140 @@
+"""
+Scrittura diretta di fotogrammi da array, senza passare da matplotlib.
+
+Per le animazioni (doppio pendolo, frattali di Lichtenberg) creare una figura
+matplotlib per ogni fotogramma e salvarla con savefig costa molto più del
+calcolo. FrameSink colora l'array con la tabella della colormap
+(frattali.colors.scalar_colorize, vanno bene anche colormap fatte a mano come
+violet_cmap) e poi:
+  - codifica i PNG in un pool di thread (Pillow rilascia il GIL durante la
+    compressione zlib, e a differenza di un pool di processi non c'è nessun
+    fork dopo l'avvio dei thread di numba), oppure
+  - se è richiesto un video e ffmpeg è installato, gli passa i fotogrammi
+    grezzi (rgb24) su una pipe.
+I fotogrammi in attesa di codifica sono al più max_pending: oltre quel numero
+write() aspetta (contropressione), così la memoria resta limitata anche se il
+calcolo è più veloce della codifica. report() riporta separatamente i
+fotogrammi al secondo del calcolo (tempo del chiamante dalla creazione alla
+prima write e fra una write e l'altra) e della codifica.
+"""
+from __future__ import print_function
+import os
+import shutil
+import subprocess
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from PIL import Image as im
+
+from frattali.colors import scalar_colorize
+
+
+def _encode_png(path, rgb, compress_level):
+    start = time.perf_counter()
+    im.fromarray(rgb).save(path, compress_level=compress_level)
+    return time.perf_counter() - start
+
+
+class FrameSink():
+    """
+    out_dir riceve i PNG (write(name, values) scrive out_dir/name). Con video
+    (percorso di un file, ad esempio "animazione.mp4") e ffmpeg disponibile i
+    fotogrammi vanno invece nel video, in ordine. cmap, vmin, vmax e log sono
+    quelli di scalar_colorize; un array già RGB uint8 viene scritto così com'è.
+    """
+    def __init__(self, out_dir, cmap="viridis", vmin=None, vmax=None, log=False, workers=None,
+                 max_pending=None, video=None, fps=30, compress_level=6):
+        self.out_dir = out_dir
+        self.cmap = cmap
+        self.vmin = vmin
+        self.vmax = vmax
+        self.log = log
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending or 2 * self.workers
+        self.compress_level = compress_level
+        self.fps = fps
+        self.frames = 0
+        self.compute_seconds = 0.0
+        self.colorize_seconds = 0.0
+        self.encode_seconds = 0.0
+        self.wait_seconds = 0.0
+        self._pending = deque()
+        self._ffmpeg = None
+        self._pool = None
+
+        if video is not None and shutil.which("ffmpeg") is None:
+            print(f"ffmpeg non trovato: i fotogrammi di {video} vengono salvati come PNG in {out_dir}")
+            video = None
+        self.video = video
+        if video is None:
+            os.makedirs(out_dir, exist_ok=True)
+            self._pool = ThreadPoolExecutor(self.workers)
+        self._last = time.perf_counter()
+
+    def colorize(self, values):
+        return scalar_colorize(values, self.cmap, self.vmin, self.vmax, self.log)
+
+    def write(self, name, values):
+        now = time.perf_counter()
+        self.compute_seconds += now - self._last
+
+        rgb = values if values.ndim == 3 and values.dtype == np.uint8 else self.colorize(values)
+        rgb = np.ascontiguousarray(rgb)
+        start = time.perf_counter()
+        self.colorize_seconds += start - now
+
+        if self.video is not None:
+            if self._ffmpeg is None:
+                self._open_video(rgb.shape[1], rgb.shape[0])
+            # La pipe ha un buffer limitato: se ffmpeg è indietro la scrittura aspetta
+            self._ffmpeg.stdin.write(rgb.tobytes())
+            self.encode_seconds += time.perf_counter() - start
+        else:
+            while len(self._pending) >= self.max_pending:
+                self._collect()
+            self.wait_seconds += time.perf_counter() - start
+            self._pending.append(self._pool.submit(_encode_png, os.path.join(self.out_dir, name), rgb,
+                                                   self.compress_level))
+        self.frames += 1
+        self._last = time.perf_counter()
+
+    def _open_video(self, width, height):
+        self._ffmpeg = subprocess.Popen(
+            ["ffmpeg", "-y", "-loglevel", "error", "-f", "rawvideo", "-pix_fmt", "rgb24",
+             "-s", f"{width}x{height}", "-r", str(self.fps), "-i", "-",
+             "-pix_fmt", "yuv420p", "-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2", self.video],
+            stdin=subprocess.PIPE)
+
+    def _collect(self):
+        self.encode_seconds += self._pending.popleft().result()
+
+    def close(self):
+        start = time.perf_counter()
+        while self._pending:
+            self._collect()
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+        if self._ffmpeg is not None:
+            self._ffmpeg.stdin.close()
+            self._ffmpeg.wait()
+            self._ffmpeg = None
+        self.wait_seconds += time.perf_counter() - start
+
+    def report(self):
+        compute_fps = self.frames / self.compute_seconds if self.compute_seconds else float("inf")
+        encode_fps = self.frames / self.encode_seconds if self.encode_seconds else float("inf")
+        if self.video is not None:
+            where = f"ffmpeg -> {self.video}"
+        else:
+            where = f"per thread, PNG con {self.workers} thread"
+        return (f"{self.frames} fotogrammi: calcolo {compute_fps:.2f} fps, codifica {encode_fps:.2f} fps "
+                f"({where}), colorazione {self.colorize_seconds / max(self.frames, 1) * 1000:.0f} ms "
+                f"a fotogramma, attesa della codifica {self.wait_seconds:.1f} s")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,111 @@
+"""
+Storia compatta di una crescita (frattali di Lichtenberg).
+
+Salvare il potenziale float64 dopo ogni passo costa n * n * 8 byte a passo:
+a n = 500 e 6000 passi sono 12 GB in memoria. Qui per ogni passo si ricorda
+solo quante celle erano legate (l'ordine di aggiunta, già tenuto dal modello,
+basta a ricostruire il reticolo a qualunque passo) e il potenziale solo ogni
+stride passi, come fotogramma chiave float32 accodato a un file su disco. I
+fotogrammi chiave si rileggono con np.memmap quando servono, per cui la memoria
+occupata non cresce con il numero di passi. Per riprendere da un checkpoint si
+passano counts e keyframes salvati: il file viene riaperto e accorciato a quei
+fotogrammi. Senza file (storia temporanea) i fotogrammi precedenti sono persi,
+ma il potenziale del checkpoint (anchor) diventa un fotogramma in più al passo
+del checkpoint, così ogni passo da lì in poi resta leggibile.
+"""
+import os
+import tempfile
+from array import array
+import numpy as np
+
+STRIDE = 10
+
+
+class GrowthHistory():
+    """
+    history[i] è il potenziale (n, m) al passo i: per i multiplo di stride il
+    fotogramma chiave in sola lettura dal file, altrimenti quello ricalcolato
+    da rebuild(i) se è stato dato. path è il file dei fotogrammi chiave (None:
+    un file temporaneo cancellato alla chiusura). anchor è il potenziale
+    all'ultimo passo di counts, usato solo se path è None.
+    """
+    def __init__(self, shape, stride=STRIDE, path=None, rebuild=None, counts=(), keyframes=0, anchor=None):
+        self.shape = tuple(shape)
+        self.stride = stride
+        self.path = path
+        self.rebuild = rebuild
+        self.counts = array("q", counts)
+        self.keyframes = keyframes
+        self._frame_bytes = int(np.prod(self.shape)) * np.dtype(np.float32).itemsize
+        # Passo del fotogramma anchor (in testa al file), None se non c'è
+        self.anchor_step = None
+        if path is None:
+            # Un file temporaneo non sopravvive alla ripresa: i fotogrammi
+            # precedenti sono persi, resta il potenziale del checkpoint
+            self.missing = keyframes
+            self._file = tempfile.TemporaryFile()
+            if anchor is not None and len(self.counts):
+                self._file.write(np.asarray(anchor, dtype=np.float32).tobytes())
+                self.anchor_step = len(self.counts) - 1
+        else:
+            self.missing = 0
+            self._file = open(path, "r+b" if keyframes else "w+b")
+            self._file.truncate(keyframes * self._frame_bytes)
+
+    def record(self, potential, n_bonded):
+        if len(self.counts) % self.stride == 0:
+            self._file.seek(0, 2)
+            self._file.write(potential.astype(np.float32).tobytes())
+            self.keyframes += 1
+        self.counts.append(n_bonded)
+
+    def __len__(self):
+        return len(self.counts)
+
+    def bonded(self, step):
+        # Celle legate al passo step (le prime nell'ordine di aggiunta)
+        return self.counts[step]
+
+    def keyframe(self, k):
+        if not 0 <= k < self.keyframes:
+            raise IndexError(f"fotogramma chiave {k} inesistente ({self.keyframes} salvati)")
+        if k < self.missing:
+            if self.anchor_step == k * self.stride:
+                return self._frame(0)
+            raise IndexError(f"fotogramma chiave {k} perso: storia temporanea ripresa da un checkpoint")
+        return self._frame(k - self.missing + (self.anchor_step is not None))
+
+    def _frame(self, index):
+        self._file.flush()
+        return np.memmap(self._file, dtype=np.float32, mode="r", offset=index * self._frame_bytes, shape=self.shape)
+
+    def nearest(self, step):
+        """
+        (passo, potenziale) del fotogramma salvato più recente non oltre step:
+        il fotogramma chiave, oppure anchor se quello è perso.
+        """
+        k = step // self.stride
+        if k < self.missing and self.anchor_step is not None and self.anchor_step <= step:
+            return self.anchor_step, self._frame(0)
+        return k * self.stride, self.keyframe(k)
+
+    def __getitem__(self, step):
+        if step < 0:
+            step += len(self)
+        if not 0 <= step < len(self):
+            raise IndexError(f"passo {step} fuori dalla storia ({len(self)} passi)")
+        if step == self.anchor_step:
+            return self._frame(0)
+        if step % self.stride == 0:
+            return self.keyframe(step // self.stride)
+        if self.rebuild is None:
+            raise KeyError(f"il passo {step} non è un fotogramma chiave (stride {self.stride})")
+        return self.rebuild(step)
+
+    def sync(self):
+        # Fotogrammi su disco prima di scrivere un checkpoint che li conta
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
@@ -0,0 +1,151 @@
+"""
+Ricalcolo incrementale delle viste dei visualizzatori con zoom.
+
+Dopo un piccolo spostamento la maggior parte della nuova vista è già stata
+calcolata, e dopo uno zoom 2x un quarto dei nuovi campioni coincide con campioni
+vecchi, purché le due griglie di pixel siano allineate. Qui si tengono gli
+ultimi array grezzi di iterazioni con la loro vista; per una vista nuova si
+cerca una griglia precedente con passo uguale, o in rapporto intero k, e se
+basta spostare/scalare la vista di meno di mezzo pixel per allinearla le si
+aggancia. A quel punto i pixel comuni si copiano così come sono e si calcolano
+solo quelli mancanti: le strisce scoperte dallo spostamento, oppure le righe e
+colonne intercalate dello zoom. Ogni gruppo di pixel mancanti è una
+progressione aritmetica per riga e per colonna, quindi è a sua volta una
+griglia regolare e si calcola con una sola chiamata a render_*.
+"""
+import numpy as np
+
+from frattali.escape import RENDERERS
+
+KEEP = 4
+
+
+def _align(o_old, d_old, n_old, o_new, d_new, n_new):
+    """
+    Aggancia un asse della vista nuova (origine o_new, passo d_new, n_new pixel)
+    a quello vecchio. Restituisce (origine, passo, pixel nuovi, pixel vecchi),
+    dove gli ultimi due sono range corrispondenti elemento per elemento, oppure
+    None se l'aggancio sposterebbe la vista di mezzo pixel o più.
+    """
+    if d_old * d_new <= 0:
+        return None
+    q = d_old / d_new
+    if q >= 1:
+        # Zoom avanti di k (k = 1 è uno spostamento): i pixel vecchi cadono
+        # ogni k pixel nuovi
+        k = int(round(q))
+        if abs(q / k - 1) * n_new >= 0.5:
+            return None
+        d = d_old / k
+        shift = int(round((o_new - o_old) / d))
+        first = max(0, -shift)
+        first += (-(shift + first)) % k
+        count = min(-(-(n_new - first) // k), n_old - (shift + first) // k)
+        if count <= 0:
+            return None
+        j = (shift + first) // k
+        return o_old + shift * d, d, range(first, first + (count - 1) * k + 1, k), range(j, j + count)
+
+    # Zoom indietro di k: ogni pixel nuovo cade su un pixel vecchio ogni k
+    k = int(round(1 / q))
+    if abs(q * k - 1) * n_new >= 0.5:
+        return None
+    d = d_old * k
+    shift = int(round((o_new - o_old) / d_old))
+    first = max(0, -(shift // k))
+    stop = min(n_new, -(-(n_old - shift) // k))
+    if stop <= first:
+        return None
+    return (o_old + shift * d_old, d, range(first, stop),
+            range(shift + first * k, shift + (stop - 1) * k + 1, k))
+
+
+def _complement(taken, n):
+    # Indici in [0, n) non coperti dalla progressione taken, come progressioni
+    pieces = [range(0, taken.start), range(taken[-1] + 1, n)]
+    pieces += [range(taken.start + r, taken[-1], taken.step) for r in range(1, taken.step)]
+    return [piece for piece in pieces if len(piece) > 0]
+
+
+def _slice(r):
+    return slice(r.start, r.start + (len(r) - 1) * r.step + 1, r.step)
+
+
+class IncrementalView():
+    """
+    Ultimi KEEP array di iterazioni calcolati, con formula, parametri e vista.
+    render(...) ha la stessa firma di TileCache.viewport; se nessun array
+    precedente è riutilizzabile la vista viene calcolata da fallback (ad esempio
+    la cache dei tile) o, se manca, da render_*. reused e pixels si riferiscono
+    all'ultima vista, extent è la vista effettivamente calcolata (agganciata).
+    Si ricordano solo gli array calcolati da render_* sulla griglia esatta
+    della vista (anche in parte copiati da un array ricordato): le viste date
+    da fallback, con la cache dei tile campioni al pixel più vicino di tile
+    con un altro passo, non si riusano.
+    """
+    def __init__(self, keep=KEEP, renderers=RENDERERS, fallback=None, backend=None):
+        self.keep = keep
+        self.renderers = renderers
+        self.fallback = fallback
+        self.backend = backend
+        self.history = []
+        self.reused = 0
+        self.pixels = 0
+        self.extent = None
+
+    def report(self):
+        share = self.reused / self.pixels if self.pixels else 0.0
+        return f"riusati {self.reused}/{self.pixels} pixel ({share:.0%})"
+
+    def _best_match(self, key, xres, yres, x_min, x_max, y_min, y_max):
+        best = None
+        for old_key, old, view in self.history:
+            if old_key != key:
+                continue
+            ax = _align(view[0], view[1], old.shape[1], x_min, (x_max - x_min) / xres, xres)
+            ay = _align(view[2], view[3], old.shape[0], y_min, (y_max - y_min) / yres, yres)
+            if ax is None or ay is None:
+                continue
+            if best is None or len(ax[2]) * len(ay[2]) > len(best[1][2]) * len(best[2][2]):
+                best = (old, ax, ay)
+        return best
+
+    def _remember(self, key, counts, view):
+        self.history.append((key, counts, view))
+        del self.history[:-self.keep]
+
+    def render(self, formula, params, xres, yres, x_min, x_max, y_min, y_max, check=None):
+        key = (formula, tuple(params))
+        self.pixels = xres * yres
+        best = self._best_match(key, xres, yres, x_min, x_max, y_min, y_max)
+        if best is None:
+            self.reused = 0
+            self.extent = (x_min, x_max, y_min, y_max)
+            if self.fallback is not None:
+                return self.fallback(formula, key[1], xres, yres, x_min, x_max, y_min, y_max, check)
+            counts = self.renderers[formula](xres, yres, *key[1], x_min, x_max, y_min, y_max,
+                                             backend=self.backend)
+            self._remember(key, counts, (x_min, (x_max - x_min) / xres, y_min, (y_max - y_min) / yres))
+            return counts
+
+        old, (ox, dx, new_cols, old_cols), (oy, dy, new_rows, old_rows) = best
+        counts = np.empty((yres, xres), dtype=old.dtype)
+        counts[_slice(new_rows), _slice(new_cols)] = old[_slice(old_rows), _slice(old_cols)]
+
+        # Blocchi mancanti: righe non riusate per intero, poi le colonne
+        # mancanti delle righe riusate
+        blocks = [(rows, range(xres)) for rows in _complement(new_rows, yres)]
+        blocks += [(new_rows, cols) for cols in _complement(new_cols, xres)]
+        for rows, cols in blocks:
+            if check is not None:
+                check()
+            bx = ox + cols.start * dx
+            by = oy + rows.start * dy
+            counts[_slice(rows), _slice(cols)] = self.renderers[formula](
+                len(cols), len(rows), *key[1], bx, bx + len(cols) * cols.step * dx,
+                by, by + len(rows) * rows.step * dy, backend=self.backend)
+
+        self.reused = len(new_rows) * len(new_cols)
+        self.extent = (ox, ox + xres * dx, oy, oy + yres * dy)
+        self._remember(key, counts, (ox, dx, oy, dy))
+        return counts
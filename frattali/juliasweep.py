@@ -0,0 +1,150 @@
+"""
+Insiemi di Julia per molti valori del parametro c in un solo lancio.
+
+Per un'animazione o un atlante dei parametri render_julia andrebbe chiamato
+una volta per ogni c: un lancio, un'allocazione e (su CUDA) una copia verso
+l'host per ogni immagine. render_julia_sweep riempie invece un cubo
+(n_c, yres, xres) di iterazioni con un solo kernel: sulla CPU prange scorre
+tutte le n_c * yres righe insieme (il carico resta bilanciato anche se alcuni
+c hanno molti più punti interni di altri), su CUDA la griglia ha una terza
+dimensione per c. Le coordinate dei pixel e la formula sono quelle di
+frattali.escape (float64), quindi ogni fotogramma è identico a render_julia con
+precision="float64".
+
+sweep_batches divide una lunga lista di c in lotti e riusa per tutti lo stesso
+cubo sull'host (e sul dispositivo), render_sweep scrive i fotogrammi di ogni
+lotto in un FrameSink appena il lotto è finito: la codifica dei PNG (in altri
+thread) procede mentre si calcola il lotto successivo.
+"""
+from __future__ import print_function
+import time
+import numpy as np
+from numba import cuda, njit, prange
+
+from frattali.escape import julia_cpu, julia_gpu, select_backend
+from frattali.colors import log_colorize
+
+
+@njit(parallel=True, nogil=True, cache=True)
+def create_julia_sweep_cpu(xres, yres, iterations, out, cs_x, cs_y, x_min, x_max, y_min, y_max):
+    # Una iterazione di prange per riga di ogni fotogramma del cubo
+    for index in prange(out.shape[0] * yres):
+        k, y = index // yres, index % yres
+        zy = y_min + y * (y_max - y_min) / yres
+        for x in range(xres):
+            zx = x_min + x * (x_max - x_min) / xres
+            out[k, y, x] = julia_cpu(zx, zy, cs_x[k], cs_y[k], iterations)
+
+
+@cuda.jit
+def create_julia_sweep_gpu(xres, yres, iterations, out, cs_x, cs_y, x_min, x_max, y_min, y_max):
+    x, y, k = cuda.grid(3)
+    if x < xres and y < yres and k < out.shape[0]:
+        zx = x_min + x * (x_max - x_min) / xres
+        zy = y_min + y * (y_max - y_min) / yres
+        out[k, y, x] = julia_gpu(zx, zy, cs_x[k], cs_y[k], iterations)
+
+
+def _launch_sweep(xres, yres, iterations, cs, view, backend, out, device):
+    # device: cubo sul dispositivo da riusare (almeno len(cs) fotogrammi)
+    cs_x = np.ascontiguousarray(np.real(cs), dtype=np.float64)
+    cs_y = np.ascontiguousarray(np.imag(cs), dtype=np.float64)
+    if backend == "cpu":
+        create_julia_sweep_cpu(xres, yres, iterations, out, cs_x, cs_y, *view)
+        return out
+    out_device = device[:len(cs)] if device is not None else cuda.device_array(out.shape, dtype=out.dtype)
+    threadsperblock = (32, 8, 1)
+    blockspergrid = (int(np.ceil(xres / threadsperblock[0])), int(np.ceil(yres / threadsperblock[1])), len(cs))
+    create_julia_sweep_gpu[blockspergrid, threadsperblock](xres, yres, iterations, out_device,
+                                                           cuda.to_device(cs_x), cuda.to_device(cs_y), *view)
+    out_device.copy_to_host(out)
+    return out
+
+
+def render_julia_sweep(xres, yres, iterations, cs, x_min, x_max, y_min, y_max, backend=None, out=None):
+    """
+    Cubo (len(cs), yres, xres) di iterazioni di fuga: il fotogramma k è
+    l'insieme di Julia del parametro cs[k] (complesso) nella vista. out, se
+    dato, è riempito al posto di un nuovo array.
+    """
+    cs = np.atleast_1d(np.asarray(cs, dtype=np.complex128))
+    shape = (len(cs), yres, xres)
+    if out is None:
+        out = np.zeros(shape, dtype=np.int32)
+    elif out.shape != shape:
+        raise ValueError(f"out ha forma {out.shape}, attesa {shape}")
+    return _launch_sweep(xres, yres, iterations, cs, (x_min, x_max, y_min, y_max), select_backend(backend),
+                         out, None)
+
+
+def sweep_batches(xres, yres, iterations, cs, x_min, x_max, y_min, y_max, batch=16, backend=None):
+    """
+    Genera (indice del primo c, cubo) per lotti di al più batch valori di cs.
+    Il cubo (e quello sul dispositivo) è lo stesso per tutti i lotti: va
+    consumato o copiato prima di chiedere il lotto successivo.
+    """
+    cs = np.atleast_1d(np.asarray(cs, dtype=np.complex128))
+    backend = select_backend(backend)
+    batch = max(1, min(batch, len(cs)))
+    cube = np.zeros((batch, yres, xres), dtype=np.int32)
+    device = cuda.device_array(cube.shape, dtype=cube.dtype) if backend == "cuda" else None
+    view = (x_min, x_max, y_min, y_max)
+    for start in range(0, len(cs), batch):
+        chunk = cs[start:start + batch]
+        yield start, _launch_sweep(xres, yres, iterations, chunk, view, backend, cube[:len(chunk)], device)
+
+
+def render_sweep(sink, xres, yres, iterations, cs, x_min, x_max, y_min, y_max, batch=16, cmap="inferno",
+                 backend=None):
+    """
+    Scrive in sink (un FrameSink) un fotogramma per ogni c, julia_00000.png
+    ..., colorato con la mappa logaritmica. Restituisce i secondi di calcolo.
+    """
+    compute = 0.0
+    start = time.perf_counter()
+    for first, cube in sweep_batches(xres, yres, iterations, cs, x_min, x_max, y_min, y_max, batch, backend):
+        compute += time.perf_counter() - start
+        for k, counts in enumerate(cube):
+            # log_colorize crea un array nuovo: il cubo si può riusare subito
+            sink.write(f"julia_{first + k:05d}.png", log_colorize(counts, iterations, cmap))
+        start = time.perf_counter()
+    return compute
+
+
+def circle(radius, frames, phase=0.0):
+    """frames valori di c sulla circonferenza |c| = radius (giro completo)."""
+    return radius * np.exp(1j * (phase + 2 * np.pi * np.arange(frames) / frames))
+
+
+if __name__ == "__main__":
+    import argparse
+    from frattali.framesink import FrameSink
+
+    parser = argparse.ArgumentParser(description="Animazione di insiemi di Julia al variare di c")
+    parser.add_argument("out_dir")
+    parser.add_argument("--frames", type=int, default=240)
+    parser.add_argument("--radius", type=float, default=0.7885, help="c percorre la circonferenza |c| = radius")
+    parser.add_argument("--c-start", type=complex, default=None, help="con --c-end, c percorre il segmento")
+    parser.add_argument("--c-end", type=complex, default=None)
+    parser.add_argument("--xres", type=int, default=640)
+    parser.add_argument("--yres", type=int, default=480)
+    parser.add_argument("--iterations", type=int, default=500)
+    parser.add_argument("--view", type=float, nargs=4, default=(-1.6, 1.6, -1.2, 1.2),
+                        metavar=("X_MIN", "X_MAX", "Y_MIN", "Y_MAX"))
+    parser.add_argument("--batch", type=int, default=16)
+    parser.add_argument("--cmap", default="inferno")
+    parser.add_argument("--backend", default=None)
+    parser.add_argument("--video", default=None, help="file video (con ffmpeg), altrimenti PNG in out_dir")
+    parser.add_argument("--fps", type=int, default=30)
+    opts = parser.parse_args()
+
+    if opts.c_start is not None and opts.c_end is not None:
+        cs = np.linspace(opts.c_start, opts.c_end, opts.frames)
+    else:
+        cs = circle(opts.radius, opts.frames)
+    start = time.perf_counter()
+    with FrameSink(opts.out_dir, video=opts.video, fps=opts.fps) as sink:
+        compute = render_sweep(sink, opts.xres, opts.yres, opts.iterations, cs, *opts.view, batch=opts.batch,
+                               cmap=opts.cmap, backend=opts.backend)
+    print(f"{opts.frames} fotogrammi in {time.perf_counter() - start:.1f} s, calcolo {compute:.1f} s")
+    print(sink.report())
@@ -0,0 +1,279 @@
+"""
+Risolutori per il potenziale dei frattali di Lichtenberg (equazione di Laplace
+con condizioni di Dirichlet).
+
+Il potenziale è un array (n, m) float64 e fixed (uint8, stessa forma) segna le
+celle a valore imposto: il bordo e le celle già legate alla scarica, che devono
+già contenere il loro valore. Nelle celle libere u deve essere la media dei
+quattro vicini. I risolutori lavorano sul posto partendo dal potenziale che
+ricevono (partenza a caldo: dopo l'aggiunta di una cella bastano poche
+iterazioni), si fermano quando il residuo max |media dei vicini - u| sulle celle
+libere scende sotto tol e non allocano nulla durante le iterazioni (i buffer si
+creano una volta per forma dell'array):
+  - "jacobi": le passate del kernel originale del notebook, con due buffer
+    alternati invece di potential.copy() a ogni passata; con tol=0 e
+    max_sweeps=k il risultato coincide bit per bit con k passate del vecchio
+    kernel;
+  - "sor": sovrarilassamento rosso-nero sul posto, con l'omega ottimale del
+    rettangolo;
+  - "multigrid": V-cicli geometrici con Gauss-Seidel rosso-nero come smoothing,
+    restrizione full weighting e prolungamento bilineare. Sulle griglie
+    grossolane una cella è fissa se lo è la cella fine corrispondente o una
+    delle sue quattro vicine: la correzione grossolana si annulla vicino alla
+    scarica, dove i rami larghi una cella non sarebbero rappresentabili (con la
+    sola iniezione i cicli divergono), e lì lavora lo smoothing fine.
+"""
+import math
+import numpy as np
+from numba import njit, prange
+
+TOL = 1e-6
+MAX_SWEEPS = 1000000
+MAX_CYCLES = 200
+# Passate di Gauss-Seidel prima e dopo la correzione grossolana, e sulla griglia più piccola
+PRE_SWEEPS, POST_SWEEPS, COARSE_SWEEPS = 2, 2, 50
+COARSEST = 5
+
+
+@njit(parallel=True, nogil=True, cache=True)
+def _jacobi_sweep(u, fixed, new, rowmax):
+    n, m = u.shape
+    for i in prange(n):
+        rowmax[i] = 0.0
+        if i == 0 or i == n - 1:
+            for j in range(m):
+                new[i, j] = u[i, j]
+            continue
+        new[i, 0] = u[i, 0]
+        new[i, m - 1] = u[i, m - 1]
+        for j in range(1, m - 1):
+            if fixed[i, j]:
+                new[i, j] = u[i, j]
+            else:
+                new[i, j] = 0.25 * (u[i - 1, j] + u[i + 1, j] + u[i, j - 1] + u[i, j + 1])
+                rowmax[i] = max(rowmax[i], abs(new[i, j] - u[i, j]))
+
+
+@njit(parallel=True, nogil=True, cache=True)
+def _rb_sweep(u, b, fixed, omega, color, rowmax):
+    # Metà scacchiera: (i + j) % 2 == color. b è il termine noto (None per
+    # Laplace): u = (somma dei vicini - b) / 4
+    n, m = u.shape
+    for i in prange(1, n - 1):
+        for j in range(1 + (i + 1 + color) % 2, m - 1, 2):
+            if fixed[i, j]:
+                continue
+            s = u[i - 1, j] + u[i + 1, j] + u[i, j - 1] + u[i, j + 1]
+            if b is not None:
+                s -= b[i, j]
+            r = 0.25 * s - u[i, j]
+            u[i, j] += omega * r
+            rowmax[i] = max(rowmax[i], abs(r))
+
+
+@njit(parallel=True, nogil=True, cache=True)
+def _residual(u, b, fixed, res):
+    # res = b - (somma dei vicini - 4 u) nelle celle libere, 0 in quelle fisse
+    n, m = u.shape
+    for i in prange(n):
+        for j in range(m):
+            if i == 0 or j == 0 or i == n - 1 or j == m - 1 or fixed[i, j]:
+                res[i, j] = 0.0
+            else:
+                s = u[i - 1, j] + u[i + 1, j] + u[i, j - 1] + u[i, j + 1] - 4.0 * u[i, j]
+                res[i, j] = -s if b is None else b[i, j] - s
+
+
+@njit(parallel=True, nogil=True, cache=True)
+def _coarsen(fixed, coarse):
+    # Cella grossolana (I, J) sopra la cella fine (2I, 2J); oltre il bordo fine è fissa
+    n, m = fixed.shape
+    nc, mc = coarse.shape
+    for I in prange(nc):
+        for J in range(mc):
+            i, j = 2 * I, 2 * J
+            edge = I == 0 or J == 0 or I == nc - 1 or J == mc - 1 or i >= n - 1 or j >= m - 1
+            near = False
+            if not edge:
+                near = (fixed[i, j] or fixed[i - 1, j] or fixed[i + 1, j]
+                        or fixed[i, j - 1] or fixed[i, j + 1]) != 0
+            coarse[I, J] = 1 if edge or near else 0
+
+
+@njit(parallel=True, nogil=True, cache=True)
+def _restrict(res, fixed, b):
+    # Full weighting del residuo fine, per 4 perché il passo raddoppia
+    n, m = res.shape
+    nc, mc = b.shape
+    for I in prange(nc):
+        for J in range(mc):
+            if fixed[I, J]:
+                b[I, J] = 0.0
+                continue
+            s = 0.0
+            for di in range(-1, 2):
+                for dj in range(-1, 2):
+                    i, j = 2 * I + di, 2 * J + dj
+                    if 0 <= i < n and 0 <= j < m:
+                        s += (2 - abs(di)) * (2 - abs(dj)) * res[i, j]
+            b[I, J] = 0.25 * s
+
+
+@njit(parallel=True, nogil=True, cache=True)
+def _prolong_add(e, u, fixed):
+    n, m = u.shape
+    for i in prange(1, n - 1):
+        I, fi = i // 2, i % 2
+        for j in range(1, m - 1):
+            if fixed[i, j]:
+                continue
+            J, fj = j // 2, j % 2
+            if fi and fj:
+                u[i, j] += 0.25 * (e[I, J] + e[I + 1, J] + e[I, J + 1] + e[I + 1, J + 1])
+            elif fi:
+                u[i, j] += 0.5 * (e[I, J] + e[I + 1, J])
+            elif fj:
+                u[i, j] += 0.5 * (e[I, J] + e[I, J + 1])
+            else:
+                u[i, j] += e[I, J]
+
+
+def residual(potential, fixed):
+    """
+    max |media dei vicini - u| sulle celle libere (alloca un array temporaneo).
+    """
+    res = np.empty_like(potential)
+    _residual(potential, None, fixed, res)
+    return 0.25 * np.abs(res).max()
+
+
+def _red_black(u, b, fixed, omega, rowmax):
+    rowmax[:] = 0.0
+    _rb_sweep(u, b, fixed, omega, 0, rowmax)
+    _rb_sweep(u, b, fixed, omega, 1, rowmax)
+    return rowmax.max()
+
+
+class JacobiSolver():
+    """
+    Iterazioni di Jacobi come nel notebook, con un buffer di appoggio riusato.
+    """
+    def __init__(self, shape):
+        self.shape = tuple(shape)
+        self.scratch = np.empty(self.shape)
+        self.rowmax = np.zeros(self.shape[0])
+        self.residual = np.inf
+
+    def solve(self, potential, fixed, tol=TOL, max_sweeps=MAX_SWEEPS):
+        u, new = potential, self.scratch
+        sweeps = 0
+        while sweeps < max_sweeps:
+            _jacobi_sweep(u, fixed, new, self.rowmax)
+            u, new = new, u
+            sweeps += 1
+            self.residual = self.rowmax.max()
+            if self.residual < tol:
+                break
+        if u is not potential:
+            potential[...] = u
+        return sweeps
+
+
+class SORSolver():
+    """
+    SOR rosso-nero sul posto; omega di default quello ottimale del rettangolo.
+    """
+    def __init__(self, shape, omega=None):
+        self.shape = tuple(shape)
+        if omega is None:
+            rho = 0.5 * (math.cos(math.pi / (self.shape[0] - 1)) + math.cos(math.pi / (self.shape[1] - 1)))
+            omega = 2.0 / (1.0 + math.sqrt(1.0 - rho * rho))
+        self.omega = omega
+        self.rowmax = np.zeros(self.shape[0])
+        self.residual = np.inf
+
+    def solve(self, potential, fixed, tol=TOL, max_sweeps=MAX_SWEEPS):
+        sweeps = 0
+        while sweeps < max_sweeps:
+            self.residual = _red_black(potential, None, fixed, self.omega, self.rowmax)
+            sweeps += 1
+            if self.residual < tol:
+                break
+        return sweeps
+
+
+class _Level():
+    def __init__(self, shape):
+        self.u = np.zeros(shape)
+        self.b = np.zeros(shape)
+        self.res = np.zeros(shape)
+        self.fixed = np.zeros(shape, dtype=np.uint8)
+        self.rowmax = np.zeros(shape[0])
+
+
+class MultigridSolver():
+    """
+    V-cicli multigrid. La griglia fine è il potenziale stesso (termine noto
+    nullo); le griglie grossolane, con (n // 2 + 1) celle per lato, portano la
+    correzione e sono allocate una volta sola. solve restituisce il numero di
+    V-cicli.
+    """
+    def __init__(self, shape):
+        self.shape = tuple(shape)
+        self.levels = []
+        n, m = self.shape
+        while min(n, m) > COARSEST:
+            n, m = n // 2 + 1, m // 2 + 1
+            self.levels.append(_Level((n, m)))
+        self.res = np.zeros(self.shape)
+        self.rowmax = np.zeros(self.shape[0])
+        self.residual = np.inf
+
+    def _smooth(self, u, b, fixed, rowmax, sweeps):
+        # Residuo della prima passata, cioè dello stato in ingresso
+        first = _red_black(u, b, fixed, 1.0, rowmax)
+        for _ in range(sweeps - 1):
+            _red_black(u, b, fixed, 1.0, rowmax)
+        return first
+
+    def _cycle(self, depth, res, u, fixed):
+        # Correzione dalla griglia depth per il residuo res della griglia più fine
+        level = self.levels[depth]
+        _restrict(res, level.fixed, level.b)
+        level.u[...] = 0.0
+        if depth == len(self.levels) - 1:
+            self._smooth(level.u, level.b, level.fixed, level.rowmax, COARSE_SWEEPS)
+        else:
+            self._smooth(level.u, level.b, level.fixed, level.rowmax, PRE_SWEEPS)
+            _residual(level.u, level.b, level.fixed, level.res)
+            self._cycle(depth + 1, level.res, level.u, level.fixed)
+            self._smooth(level.u, level.b, level.fixed, level.rowmax, POST_SWEEPS)
+        _prolong_add(level.u, u, fixed)
+
+    def solve(self, potential, fixed, tol=TOL, max_sweeps=MAX_CYCLES):
+        if not self.levels:
+            return SORSolver(self.shape).solve(potential, fixed, tol)
+        previous = fixed
+        for level in self.levels:
+            _coarsen(previous, level.fixed)
+            previous = level.fixed
+
+        cycles = 0
+        while cycles < max_sweeps:
+            self.residual = self._smooth(potential, None, fixed, self.rowmax, PRE_SWEEPS)
+            if self.residual < tol:
+                break
+            _residual(potential, None, fixed, self.res)
+            self._cycle(0, self.res, potential, fixed)
+            self._smooth(potential, None, fixed, self.rowmax, POST_SWEEPS)
+            cycles += 1
+        return cycles
+
+
+SOLVERS = {"jacobi": JacobiSolver, "sor": SORSolver, "multigrid": MultigridSolver}
+
+
+def make_solver(name, shape):
+    if name not in SOLVERS:
+        raise ValueError(f"risolutore sconosciuto: {name!r} (validi: {', '.join(SOLVERS)})")
+    return SOLVERS[name](shape)
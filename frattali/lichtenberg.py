@@ -0,0 +1,350 @@
+"""
+Modello di rottura del dielettrico per i frattali di Lichtenberg.
+
+A ogni passo il potenziale elettrico risolve l'equazione di Laplace con la
+scarica a phi0 e il bordo a phi1 (frattali.laplace), e si aggiunge alla scarica
+una cella della frontiera con probabilità proporzionale a phi^eta.
+
+Con cells_per_step = k > 1 dopo ogni soluzione si aggiungono k celle, estratte
+una dopo l'altra dalla frontiera aggiornata: le celle esposte dalle estrazioni
+dello stesso passo concorrono con il potenziale calcolato prima del passo, cioè
+ignorando lo schermo delle celle appena aggiunte. Il costo è di una soluzione
+ogni k celle; l'errore sullo schermo cresce con il rapporto fra k e la
+dimensione della frontiera, quindi k va tenuto piccolo rispetto a questa. Su
+n = 200, eta = 1, 2000 celle e 4 semi la dimensione di box counting è
+1.51 ± 0.02 con k = 1, 1.52 ± 0.01 con k = 4 e 1.50 ± 0.02 con k = 16 (141, 44
+e 15 s per le quattro crescite): a queste dimensioni l'effetto di k resta
+dentro la dispersione fra i semi.
+
+run_ensemble esegue molte configurazioni (eta, random_state) in un pool di
+processi e ne stima la dimensione frattale con box_counting_dimension.
+
+Le crescite lunghe si salvano con save_checkpoint (un .npz scritto in modo
+atomico) e si riprendono con DielectricBreakdown.resume: lo stato salvato
+comprende anche l'ordine della frontiera e lo stato del generatore casuale,
+per cui la ripresa prosegue esattamente come la crescita senza interruzioni.
+Da riga di comando:
+
+    python -m frattali.lichtenberg run.npz --n 2000 --eta 1.4 --steps 50000
+
+rilanciato dopo un'interruzione riparte dall'ultimo checkpoint di run.npz.
+"""
+from __future__ import print_function
+import os
+import time
+import itertools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+from frattali.history import STRIDE, GrowthHistory
+from frattali.laplace import TOL, make_solver
+
+CHECKPOINT_EVERY = 100
+
+
+class DielectricBreakdown():
+    """
+    Class to simulate dielectric breakdown in a 2D grid
+    """
+    def __init__(self, n=100, eta=1., phi0=0., phi1=1., random_state=None, solver="multigrid", tol=TOL,
+                 history_stride=STRIDE, history_path=None, cells_per_step=1):
+        self.n = n
+        self.eta = eta
+        self.phi0 = phi0
+        self.phi1 = phi1
+        self.tol = tol
+        self.solver_name = solver
+        self.cells_per_step = cells_per_step
+        np.random.seed(random_state)
+        self._allocate()
+
+        self.potential[0, :] = self.phi1
+        self.potential[-1, :] = self.phi1
+        self.potential[:, 0] = self.phi1
+        self.potential[:, -1] = self.phi1
+        self.bond(n // 2, n // 2)
+
+        self.evolve_potential()
+        # Ordine di aggiunta più un fotogramma chiave float32 su disco ogni history_stride passi
+        self.history = GrowthHistory((n, n), history_stride, history_path, rebuild=self.potential_at)
+        self.history.record(self.potential, self.n_bonded_particles)
+
+    def _allocate(self):
+        n = self.n
+        self.lattice = np.zeros((n, n), dtype=np.int8)
+        self.potential = np.zeros((n, n), dtype=np.float64)
+        # Celle a potenziale imposto (bordo e scarica) e risolutore di Laplace
+        self.fixed = np.zeros((n, n), dtype=np.uint8)
+        self.fixed[0, :] = self.fixed[-1, :] = self.fixed[:, 0] = self.fixed[:, -1] = 1
+        self.solver = make_solver(self.solver_name, (n, n))
+
+        self.bonded_particles_x = np.zeros(n * n, dtype=np.int16)
+        self.bonded_particles_y = np.zeros(n * n, dtype=np.int16)
+        # Passo in cui ogni cella è stata aggiunta
+        self.bonded_particles_step = np.zeros(n * n, dtype=np.int32)
+        self.n_bonded_particles = 0
+        self.n_steps = 0
+        # Distanza (massimo delle due coordinate) della cella più lontana dal centro
+        self.radius = 0
+
+        # Frontiera: celle libere accanto alla scarica, in un array compatto, e
+        # posizione di ogni cella nell'array (-1 se non è nella frontiera)
+        self.frontier = np.zeros(n * n, dtype=np.int64)
+        self.frontier_position = np.full(n * n, -1, dtype=np.int64)
+        self.n_frontier = 0
+
+    def save_checkpoint(self, path):
+        """
+        Stato completo in path (.npz): parametri, reticolo, potenziale, celle
+        legate con il loro passo, frontiera, storia e generatore casuale. Si
+        scrive un file temporaneo nella stessa cartella e lo si sostituisce a
+        path solo a scrittura completata, quindi un'interruzione lascia sempre
+        l'ultimo checkpoint intero.
+        """
+        self.history.sync()
+        _, keys, position, has_gauss, cached_gaussian = np.random.get_state()
+        count = self.n_bonded_particles
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, n=self.n, eta=self.eta, phi0=self.phi0, phi1=self.phi1, tol=self.tol,
+                     solver=self.solver_name, cells_per_step=self.cells_per_step,
+                     lattice=self.lattice, potential=self.potential,
+                     bonded_x=self.bonded_particles_x[:count], bonded_y=self.bonded_particles_y[:count],
+                     bonded_step=self.bonded_particles_step[:count], n_steps=self.n_steps,
+                     radius=self.radius, frontier=self.frontier[:self.n_frontier],
+                     history_counts=np.frombuffer(self.history.counts, dtype=np.int64),
+                     history_stride=self.history.stride, history_keyframes=self.history.keyframes,
+                     rng_keys=keys, rng_position=position, rng_has_gauss=has_gauss,
+                     rng_cached_gaussian=cached_gaussian)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    @classmethod
+    def resume(cls, path, history_path=None):
+        """
+        Modello ripreso dal checkpoint path. history_path deve essere il file dei
+        fotogrammi chiave della crescita originale (viene accorciato al
+        checkpoint); con None i passi precedenti al checkpoint non sono più
+        leggibili, quelli dal checkpoint in poi sì (si parte dal suo potenziale).
+        """
+        with np.load(path) as data:
+            model = cls.__new__(cls)
+            model.n = int(data["n"])
+            for name in ("eta", "phi0", "phi1", "tol"):
+                setattr(model, name, float(data[name]))
+            model.solver_name = str(data["solver"])
+            model.cells_per_step = int(data["cells_per_step"])
+            model._allocate()
+
+            model.lattice[...] = data["lattice"]
+            model.potential[...] = data["potential"]
+            model.fixed[model.lattice != 0] = 1
+            count = len(data["bonded_x"])
+            model.bonded_particles_x[:count] = data["bonded_x"]
+            model.bonded_particles_y[:count] = data["bonded_y"]
+            model.bonded_particles_step[:count] = data["bonded_step"]
+            model.n_bonded_particles = count
+            model.n_steps = int(data["n_steps"])
+            model.radius = int(data["radius"])
+            frontier = data["frontier"]
+            model.n_frontier = len(frontier)
+            model.frontier[:model.n_frontier] = frontier
+            model.frontier_position[frontier] = np.arange(model.n_frontier)
+
+            model.history = GrowthHistory((model.n, model.n), int(data["history_stride"]), history_path,
+                                          rebuild=model.potential_at, counts=data["history_counts"].tolist(),
+                                          keyframes=int(data["history_keyframes"]), anchor=model.potential)
+            np.random.set_state(("MT19937", data["rng_keys"], int(data["rng_position"]),
+                                 int(data["rng_has_gauss"]), float(data["rng_cached_gaussian"])))
+        return model
+
+    def evolve_potential(self, tol=None):
+        # Risolve sul posto partendo dal potenziale del passo precedente
+        return self.solver.solve(self.potential, self.fixed, self.tol if tol is None else tol)
+
+    @property
+    def bonded_particles_age(self):
+        age = np.zeros(self.n * self.n, dtype=np.int64)
+        age[:self.n_bonded_particles] = self.n_steps - self.bonded_particles_step[:self.n_bonded_particles]
+        return age
+
+    def bond(self, x, y):
+        # Aggiunge la cella (x, y) alla scarica e aggiorna la frontiera in O(1)
+        n = self.n
+        self.lattice[x, y] = 1
+        self.fixed[x, y] = 1
+        self.potential[x, y] = self.phi0
+        self.bonded_particles_x[self.n_bonded_particles] = x
+        self.bonded_particles_y[self.n_bonded_particles] = y
+        self.bonded_particles_step[self.n_bonded_particles] = self.n_steps
+        self.n_bonded_particles += 1
+        self.radius = max(self.radius, abs(x - n // 2), abs(y - n // 2))
+
+        cell = x * n + y
+        position = self.frontier_position[cell]
+        if position >= 0:
+            last = self.frontier[self.n_frontier - 1]
+            self.frontier[position] = last
+            self.frontier_position[last] = position
+            self.frontier_position[cell] = -1
+            self.n_frontier -= 1
+        for nx, ny in ((x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1)):
+            neighbour = nx * n + ny
+            if 0 <= nx < n and 0 <= ny < n and not self.lattice[nx, ny] and self.frontier_position[neighbour] < 0:
+                self.frontier[self.n_frontier] = neighbour
+                self.frontier_position[neighbour] = self.n_frontier
+                self.n_frontier += 1
+
+    def lattice_at(self, step):
+        lattice = np.zeros_like(self.lattice)
+        count = self.history.bonded(step)
+        lattice[self.bonded_particles_x[:count], self.bonded_particles_y[:count]] = 1
+        return lattice
+
+    def potential_at(self, step):
+        # Passo fra due fotogrammi chiave: si parte dal fotogramma precedente (o dal
+        # potenziale del checkpoint, vedi GrowthHistory.nearest) e si
+        # risolve con la scarica di inizio passo, poi si aggiungono le celle nuove
+        _, frame = self.history.nearest(step)
+        potential = np.array(frame, dtype=np.float64)
+        fixed = np.zeros_like(self.fixed)
+        fixed[0, :] = fixed[-1, :] = fixed[:, 0] = fixed[:, -1] = 1
+        potential[fixed == 1] = self.phi1
+        solved, count = self.history.bonded(step - 1), self.history.bonded(step)
+        x, y = self.bonded_particles_x, self.bonded_particles_y
+        fixed[x[:solved], y[:solved]] = 1
+        potential[x[:solved], y[:solved]] = self.phi0
+        self.solver.solve(potential, fixed, self.tol)
+        potential[x[solved:count], y[solved:count]] = self.phi0
+        return potential
+
+    def step(self):
+        self.evolve_potential()
+        self.n_steps += 1
+
+        # Estrazione con probabilità proporzionale a phi^eta sulla sola frontiera.
+        # Le correzioni del multigrid possono lasciare valori appena negativi accanto alla scarica
+        for _ in range(self.cells_per_step):
+            if self.n_frontier == 0:
+                break
+            candidates = self.frontier[:self.n_frontier]
+            weights = np.maximum(self.potential.reshape(-1)[candidates], 0.) ** self.eta
+            cumulative = np.cumsum(weights)
+            chosen = np.searchsorted(cumulative, np.random.random() * cumulative[-1], side="right")
+            self.bond(*divmod(int(candidates[min(chosen, self.n_frontier - 1)]), self.n))
+
+    def simulate(self, n_step, checkpoint=None, checkpoint_every=CHECKPOINT_EVERY):
+        # Con checkpoint (percorso di un .npz) si salva ogni checkpoint_every passi e alla fine
+        for _ in range(n_step):
+            self.step()
+            self.history.record(self.potential, self.n_bonded_particles)
+            if checkpoint is not None and self.n_steps % checkpoint_every == 0:
+                self.save_checkpoint(checkpoint)
+        if checkpoint is not None and (n_step == 0 or self.n_steps % checkpoint_every):
+            self.save_checkpoint(checkpoint)
+
+
+def box_counts(lattice):
+    """
+    Lati delle scatole (1, 2, 4, ...) e numero di scatole che contengono almeno
+    una cella della scarica, dimezzando la griglia con l'OR dei blocchi 2x2.
+    """
+    occupied = lattice != 0
+    sizes, counts = [], []
+    size = 1
+    while True:
+        sizes.append(size)
+        counts.append(int(np.count_nonzero(occupied)))
+        if max(occupied.shape) <= 1:
+            break
+        h, w = occupied.shape
+        if h % 2 or w % 2:
+            occupied = np.pad(occupied, ((0, h % 2), (0, w % 2)))
+        occupied = occupied[0::2, 0::2] | occupied[1::2, 0::2] | occupied[0::2, 1::2] | occupied[1::2, 1::2]
+        size *= 2
+    return np.array(sizes), np.array(counts)
+
+
+def box_counting_dimension(lattice, min_size=2, max_size=None):
+    """
+    Pendenza di log N(s) contro log(1 / s) per scatole da min_size a max_size
+    (di default un quarto dell'estensione della scarica).
+    """
+    sizes, counts = box_counts(lattice)
+    if max_size is None:
+        rows, cols = np.nonzero(lattice)
+        max_size = (max(np.ptp(rows), np.ptp(cols)) + 1) // 4 if len(rows) else 0
+    use = (sizes >= min_size) & (sizes <= max_size)
+    if np.count_nonzero(use) < 2:
+        raise ValueError(f"servono almeno due lati di scatola fra {min_size} e {max_size}")
+    return -np.polyfit(np.log(sizes[use]), np.log(counts[use]), 1)[0]
+
+
+def _set_threads(threads):
+    from numba import set_num_threads
+    set_num_threads(threads)
+
+
+def _grow(job):
+    eta, random_state, cells, margin, options = job
+    start = time.perf_counter()
+    model = DielectricBreakdown(eta=eta, random_state=random_state, **options)
+    # Ci si ferma anche quando la scarica arriva a margin celle dal bordo
+    while model.n_bonded_particles < cells and model.radius < model.n // 2 - margin and model.n_frontier:
+        model.step()
+    model.history.close()
+    return {"eta": eta, "random_state": random_state, "cells": model.n_bonded_particles,
+            "steps": model.n_steps, "dimension": float(box_counting_dimension(model.lattice)),
+            "seconds": time.perf_counter() - start}
+
+
+def run_ensemble(etas, random_states, cells, n=200, cells_per_step=1, margin=4, workers=None, **options):
+    """
+    Una crescita fino a cells celle per ogni coppia (eta, random_state), in un
+    pool di processi (spawn: i figli non ereditano i thread di numba). Ogni
+    processo usa cpu_count / workers thread. Restituisce un dizionario per
+    configurazione, nell'ordine di itertools.product(etas, random_states).
+    """
+    workers = workers or os.cpu_count() or 1
+    # Niente fotogrammi chiave oltre al primo: servono solo reticolo e statistiche
+    options = dict(options, n=n, cells_per_step=cells_per_step, history_stride=n * n)
+    jobs = [(eta, seed, cells, margin, options) for eta, seed in itertools.product(etas, random_states)]
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=_set_threads, initargs=(threads,)) as pool:
+        return list(pool.map(_grow, jobs))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Crescita di una scarica con checkpoint periodici")
+    parser.add_argument("checkpoint", help="file .npz dei checkpoint; se esiste la crescita riprende da lì")
+    parser.add_argument("--n", type=int, default=500)
+    parser.add_argument("--eta", type=float, default=1.4)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--steps", type=int, default=6000, help="passi totali, compresi quelli già fatti")
+    parser.add_argument("--cells-per-step", type=int, default=1)
+    parser.add_argument("--solver", default="multigrid")
+    parser.add_argument("--tol", type=float, default=TOL)
+    parser.add_argument("--every", type=int, default=CHECKPOINT_EVERY, help="passi fra due checkpoint")
+    parser.add_argument("--history", default=None, help="file dei fotogrammi chiave (default: accanto al checkpoint)")
+    parser.add_argument("--history-stride", type=int, default=STRIDE)
+    opts = parser.parse_args()
+    history = opts.history or os.path.splitext(opts.checkpoint)[0] + ".f32"
+
+    if os.path.exists(opts.checkpoint):
+        model = DielectricBreakdown.resume(opts.checkpoint, history)
+        print(f"ripresa dal passo {model.n_steps} ({model.n_bonded_particles} celle)")
+    else:
+        model = DielectricBreakdown(opts.n, opts.eta, random_state=opts.seed, solver=opts.solver, tol=opts.tol,
+                                    history_stride=opts.history_stride, history_path=history,
+                                    cells_per_step=opts.cells_per_step)
+    while model.n_steps < opts.steps:
+        start = time.perf_counter()
+        chunk = min(opts.every - model.n_steps % opts.every, opts.steps - model.n_steps)
+        model.simulate(chunk, opts.checkpoint, opts.every)
+        print(f"passo {model.n_steps}/{opts.steps}: {model.n_bonded_particles} celle, "
+              f"{(time.perf_counter() - start) / chunk * 1000:.1f} ms a passo", flush=True)
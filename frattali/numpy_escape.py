@@ -0,0 +1,148 @@
+"""
+Mandelbrot vettorizzato in NumPy puro, per le macchine senza numba.
+
+Stesse coordinate dei pixel e stessa convenzione di frattali.escape (iterazione
+di fuga n, oppure iterations per i punti interni), e stesse operazioni in
+virgola mobile, per cui il risultato coincide con quello dei kernel numba.
+
+Invece di iterare tutta la matrice complessa per iterations volte si itera solo
+un insieme attivo di al più CHUNK pixel non ancora decisi (abbastanza piccolo da
+restare in cache), in float64 separati per parte reale e immaginaria e con ufunc
+che scrivono in buffer preallocati (out=). Ogni pixel ha il proprio contatore di
+iterazioni: quelli che escono vengono registrati e neutralizzati (orbita ferma
+in 0), e quando i pixel morti diventano una frazione apprezzabile l'insieme
+viene compattato e riempito con i pixel successivi dell'immagine. Così il
+numero di chiamate alle ufunc non dipende da quanti pixel restano indietro.
+Come nei kernel, cardioide e bulbo di periodo 2 si riconoscono in forma chiusa
+e un controllo di periodicità alla Brent toglie le orbite che tornano
+esattamente su un punto già visto.
+"""
+import numpy as np
+
+CHUNK = 1 << 14
+# Si compatta quando i pixel morti superano questa frazione di quelli attivi
+COMPACT_FRACTION = 0.125
+# Contatore dei pixel morti: mai uguale a un punto di salvataggio né >= iterations
+_DEAD = -(1 << 62)
+
+
+class _ActiveSet():
+    """
+    Buffer dell'insieme attivo: le prime m posizioni sono i pixel in corso.
+    """
+    def __init__(self, size):
+        self.m = 0
+        self.pixel = np.empty(size, dtype=np.int64)
+        self.n = np.empty(size, dtype=np.int64)
+        self.save = np.empty(size, dtype=np.int64)
+        self.real = {name: np.empty(size) for name in ("cx", "cy", "zx", "zy", "xx", "yy", "ox", "oy", "r")}
+        self.hit = np.empty(size, dtype=bool)
+
+    def arrays(self):
+        return (self.pixel, self.n, self.save) + tuple(self.real.values())
+
+    def kill(self, which):
+        self.n[which] = _DEAD
+        for name in ("cx", "cy", "zx", "zy", "xx", "yy"):
+            self.real[name][which] = 0.0
+
+    def compact(self):
+        keep = np.flatnonzero(self.n[:self.m] >= 0)
+        for a in self.arrays():
+            a[:len(keep)] = a[keep]
+        self.m = len(keep)
+
+
+def _refill(active, flat, pixels, cx, cy, iterations):
+    # Nuovi pixel in coda all'insieme attivo; quelli interni alla cardioide o al
+    # bulbo di periodo 2 si decidono subito
+    xq = cx - 0.25
+    q = xq * xq + cy * cy
+    interior = (q * (q + xq) <= 0.25 * cy * cy) | ((cx + 1.0) * (cx + 1.0) + cy * cy <= 0.0625)
+    flat[pixels[interior]] = iterations
+    todo = np.flatnonzero(~interior)
+    s = slice(active.m, active.m + len(todo))
+    active.pixel[s] = pixels[todo]
+    active.n[s] = 0
+    active.save[s] = 8
+    active.real["cx"][s] = cx[todo]
+    active.real["cy"][s] = cy[todo]
+    for name in ("zx", "zy", "xx", "yy", "ox", "oy"):
+        active.real[name][s] = 0.0
+    active.m += len(todo)
+
+
+def render_mandelbrot(xres, yres, iterations, x_min, x_max, y_min, y_max, out=None, rows=None, chunk=CHUNK):
+    """
+    Come frattali.escape.render_mandelbrot (compresi out e rows), senza numba.
+    """
+    y0, y1 = (0, yres) if rows is None else rows
+    if out is None:
+        out = np.zeros((y1 - y0, xres), dtype=np.int32)
+    elif out.shape != (y1 - y0, xres):
+        raise ValueError(f"out ha forma {out.shape}, attesa {(y1 - y0, xres)}")
+    flat = out.reshape(-1)
+
+    active = _ActiveSet(chunk)
+    pending = 0
+    dead = 0
+    while True:
+        if dead > COMPACT_FRACTION * active.m or (active.m < chunk // 2 and pending < flat.size):
+            active.compact()
+            dead = 0
+            while active.m < chunk // 2 and pending < flat.size:
+                pixels = np.arange(pending, min(pending + chunk - active.m, flat.size))
+                pending = pixels[-1] + 1
+                x = pixels % xres
+                y = y0 + pixels // xres
+                _refill(active, flat, pixels, x_min + x * (x_max - x_min) / xres,
+                        y_min + y * (y_max - y_min) / yres, iterations)
+        m = active.m
+        if m == 0:
+            return out
+
+        pixel, n, save, hit = active.pixel[:m], active.n[:m], active.save[:m], active.hit[:m]
+        cx, cy, zx, zy, xx, yy, ox, oy, r = (a[:m] for a in active.real.values())
+
+        # z = z^2 + c con le stesse operazioni dei kernel (2*zx*zy prima di cambiare zx)
+        np.multiply(zx, zy, out=zy)
+        np.multiply(zy, 2.0, out=zy)
+        np.add(zy, cy, out=zy)
+        np.subtract(xx, yy, out=zx)
+        np.add(zx, cx, out=zx)
+        np.multiply(zx, zx, out=xx)
+        np.multiply(zy, zy, out=yy)
+        np.add(xx, yy, out=r)
+
+        # Fuga all'iterazione n (i pixel neutralizzati hanno r = 0)
+        np.greater_equal(r, 4.0, out=hit)
+        if hit.any():
+            escaped = np.flatnonzero(hit)
+            flat[pixel[escaped]] = n[escaped]
+            active.kill(escaped)
+            dead += len(escaped)
+
+        # Periodicità: prima il confronto sulla sola parte reale, raramente vero
+        np.equal(zx, ox, out=hit)
+        if hit.any():
+            periodic = np.flatnonzero(hit)
+            periodic = periodic[(zy[periodic] == oy[periodic]) & (n[periodic] >= 0)]
+            flat[pixel[periodic]] = iterations
+            active.kill(periodic)
+            dead += len(periodic)
+
+        # Punto salvato aggiornato dopo 8, 24, 56, ... iterazioni (finestre 8, 16, 32, ...)
+        np.add(n, 1, out=n)
+        np.equal(n, save, out=hit)
+        if hit.any():
+            saved = np.flatnonzero(hit)
+            ox[saved] = zx[saved]
+            oy[saved] = zy[saved]
+            save[saved] = 2 * save[saved] + 8
+
+        np.greater_equal(n, iterations, out=hit)
+        if hit.any():
+            done = np.flatnonzero(hit)
+            flat[pixel[done]] = iterations
+            active.kill(done)
+            dead += len(done)
@@ -0,0 +1,254 @@
+"""
+Kernel per il frattale del doppio pendolo (DoublePendulum/double_pendulum.py).
+
+Ogni pixel è un doppio pendolo con angoli iniziali (theta1v[i], theta2v[j]) e
+velocità nulle; il colore è sin(theta1) * sin(theta2) dopo un certo tempo.
+Invece di salvare tutta la traiettoria in array locali lunghi NMAX, ogni pixel
+tiene solo quattro numeri (stato a memoria costante), per cui il numero di passi
+non ha limiti e i thread CUDA non usano memoria locale.
+
+Gli schemi di integrazione sono tre:
+  - "verlet": il passo originale, theta_{i+1} = 2 theta_i - theta_{i-1} + dt^2 eps
+    con la velocità stimata dalla differenza all'indietro; lo stato è
+    (theta1, theta2, theta1 precedente, theta2 precedente);
+  - "rk4": Runge-Kutta classico del quarto ordine su (theta, omega);
+  - "leapfrog": kick-drift-kick su (theta, omega). Le equazioni contengono
+    termini nelle velocità, quindi il secondo mezzo calcio usa la velocità di
+    fine passo estrapolata: è del secondo ordine ma solo approssimativamente
+    simplettico.
+Come per le formule di frattali.escape, il passo è una sola funzione scalare
+compilata sia per la CPU (prange sulle righe) sia come device function CUDA.
+I kernel sono a livello di modulo con cache=True e i parametri fisici sono
+argomenti: la compilazione avviene una volta sola (e poi viene letta dalla cache
+su disco), e una PendulumGrid tiene vivi stato, buffer e contesto CUDA per tutti
+i fotogrammi.
+"""
+import math
+import numpy as np
+from numba import cuda, njit, prange
+
+from frattali.escape import select_backend
+
+VERLET, RK4, LEAPFROG = 0, 1, 2
+SCHEMES = {"verlet": VERLET, "rk4": RK4, "leapfrog": LEAPFROG}
+
+
+def pendulum_params(m1=1.0, m2=2.0, l1=1.0, l2=2.0, g=9.8067):
+    """
+    Parametri adimensionali (miu, r, w1s, w2s) usati dai kernel.
+    """
+    return (m1 + m2) / m2, l1 / l2, g / l1, g / l2
+
+
+def _advance(t1, t2, u1, u2, steps, dt, miu, r, w1s, w2s, scheme):
+    # (u1, u2) sono gli angoli al passo precedente per VERLET, le velocità
+    # angolari per gli altri schemi
+    dts = dt * dt
+    a00 = miu * r
+    a11 = 1.0 / r
+    stages = 4 if scheme == RK4 else (2 if scheme == LEAPFROG else 1)
+    for _ in range(steps):
+        # Punto in cui valutare le accelerazioni e somme pesate di RK4
+        p1, p2, q1, q2 = t1, t2, u1, u2
+        s1, s2, v1, v2 = 0.0, 0.0, 0.0, 0.0
+        for stage in range(stages):
+            if scheme == VERLET:
+                w1 = (t1 - u1) / dt if dt != 0.0 else 0.0
+                w2 = (t2 - u2) / dt if dt != 0.0 else 0.0
+            elif scheme == LEAPFROG and stage == 1:
+                # Velocità a fine passo stimata da quella a metà passo (2 q - u),
+                # altrimenti i termini in omega^2 renderebbero lo schema del primo ordine
+                w1, w2 = 2.0 * q1 - u1, 2.0 * q2 - u2
+            else:
+                w1, w2 = q1, q2
+
+            # Accelerazioni angolari dal sistema lineare 2x2
+            delta = p2 - p1
+            a01 = math.cos(delta)
+            b0 = w2 * w2 * math.sin(delta) - miu * w2s * math.sin(p1)
+            b1 = -w1 * w1 * math.sin(delta) - w1s * math.sin(p2)
+            detA = a00 * a11 - a01 * a01
+            if abs(detA) < 1e-14:
+                e1, e2 = 0.0, 0.0
+            else:
+                invDetA = 1.0 / detA
+                e1 = (a11 * b0 - a01 * b1) * invDetA
+                e2 = (a00 * b1 - a01 * b0) * invDetA
+
+            if scheme == VERLET:
+                t1, u1 = 2.0 * t1 - u1 + dts * e1, t1
+                t2, u2 = 2.0 * t2 - u2 + dts * e2, t2
+            elif scheme == LEAPFROG:
+                if stage == 0:
+                    # Mezzo calcio e deriva, poi si valuta nel nuovo punto
+                    q1, q2 = u1 + 0.5 * dt * e1, u2 + 0.5 * dt * e2
+                    p1, p2 = t1 + dt * q1, t2 + dt * q2
+                else:
+                    t1, t2 = p1, p2
+                    u1, u2 = q1 + 0.5 * dt * e1, q2 + 0.5 * dt * e2
+            else:
+                weight = 1.0 if stage == 0 or stage == 3 else 2.0
+                s1 += weight * w1
+                s2 += weight * w2
+                v1 += weight * e1
+                v2 += weight * e2
+                if stage < 3:
+                    h = 0.5 * dt if stage < 2 else dt
+                    p1, p2 = t1 + h * w1, t2 + h * w2
+                    q1, q2 = u1 + h * e1, u2 + h * e2
+                else:
+                    t1, t2 = t1 + dt / 6.0 * s1, t2 + dt / 6.0 * s2
+                    u1, u2 = u1 + dt / 6.0 * v1, u2 + dt / 6.0 * v2
+    return t1, t2, u1, u2
+
+
+advance_cpu = njit(cache=True)(_advance)
+advance_gpu = cuda.jit(device=True)(_advance)
+
+
+# Kernel: lo stato è un array (4, n1, n2) aggiornato sul posto
+
+@njit(parallel=True, nogil=True, cache=True)
+def _init_cpu(theta1v, theta2v, state, scheme):
+    for j1 in prange(state.shape[1]):
+        for j2 in range(state.shape[2]):
+            state[0, j1, j2] = theta1v[j1]
+            state[1, j1, j2] = theta2v[j2]
+            state[2, j1, j2] = theta1v[j1] if scheme == VERLET else 0.0
+            state[3, j1, j2] = theta2v[j2] if scheme == VERLET else 0.0
+
+
+@njit(parallel=True, nogil=True, cache=True)
+def _advance_kernel_cpu(state, steps, dt, miu, r, w1s, w2s, scheme):
+    for j1 in prange(state.shape[1]):
+        for j2 in range(state.shape[2]):
+            state[0, j1, j2], state[1, j1, j2], state[2, j1, j2], state[3, j1, j2] = advance_cpu(
+                state[0, j1, j2], state[1, j1, j2], state[2, j1, j2], state[3, j1, j2],
+                steps, dt, miu, r, w1s, w2s, scheme)
+
+
+@njit(parallel=True, nogil=True, cache=True)
+def _snapshot_cpu(state, colore):
+    for j1 in prange(state.shape[1]):
+        for j2 in range(state.shape[2]):
+            colore[j1, j2] = math.sin(state[0, j1, j2]) * math.sin(state[1, j1, j2])
+
+
+@cuda.jit(cache=True)
+def _init_gpu(theta1v, theta2v, state, scheme):
+    j1, j2 = cuda.grid(2)
+    if j1 < state.shape[1] and j2 < state.shape[2]:
+        state[0, j1, j2] = theta1v[j1]
+        state[1, j1, j2] = theta2v[j2]
+        state[2, j1, j2] = theta1v[j1] if scheme == VERLET else 0.0
+        state[3, j1, j2] = theta2v[j2] if scheme == VERLET else 0.0
+
+
+@cuda.jit(cache=True)
+def _advance_kernel_gpu(state, steps, dt, miu, r, w1s, w2s, scheme):
+    j1, j2 = cuda.grid(2)
+    if j1 < state.shape[1] and j2 < state.shape[2]:
+        state[0, j1, j2], state[1, j1, j2], state[2, j1, j2], state[3, j1, j2] = advance_gpu(
+            state[0, j1, j2], state[1, j1, j2], state[2, j1, j2], state[3, j1, j2],
+            steps, dt, miu, r, w1s, w2s, scheme)
+
+
+@cuda.jit(cache=True)
+def _snapshot_gpu(state, colore):
+    j1, j2 = cuda.grid(2)
+    if j1 < state.shape[1] and j2 < state.shape[2]:
+        colore[j1, j2] = math.sin(state[0, j1, j2]) * math.sin(state[1, j1, j2])
+
+
+class PendulumGrid():
+    """
+    Griglia di doppi pendoli con stato residente (sul dispositivo per "cuda").
+    advance(steps, dt) integra sul posto, snapshot() restituisce
+    sin(theta1) * sin(theta2) come array (n1, n2) sull'host, reset() torna alle
+    condizioni iniziali senza allocare nulla e render(tmax, samples) calcola un
+    fotogramma da capo come render_pendulum.
+    """
+    def __init__(self, theta1v, theta2v, params=None, scheme="verlet", backend=None):
+        if scheme not in SCHEMES:
+            raise ValueError(f"schema sconosciuto: {scheme!r} (validi: {', '.join(SCHEMES)})")
+        self.params = pendulum_params() if params is None else tuple(params)
+        self.scheme = SCHEMES[scheme]
+        self.backend = select_backend(backend)
+        self.shape = (len(theta1v), len(theta2v))
+
+        self.theta1v = np.ascontiguousarray(theta1v, dtype=np.float64)
+        self.theta2v = np.ascontiguousarray(theta2v, dtype=np.float64)
+        if self.backend == "cpu":
+            self.state = np.empty((4,) + self.shape, dtype=np.float64)
+            self.colore = np.empty(self.shape, dtype=np.float64)
+        else:
+            # Configurazione CUDA
+            threadsperblock = (16, 16)
+            self._grid = ((self.shape[0] + threadsperblock[0] - 1) // threadsperblock[0],
+                          (self.shape[1] + threadsperblock[1] - 1) // threadsperblock[1]), threadsperblock
+            self.theta1v = cuda.to_device(self.theta1v)
+            self.theta2v = cuda.to_device(self.theta2v)
+            self.state = cuda.device_array((4,) + self.shape, dtype=np.float64)
+            self.colore = cuda.device_array(self.shape, dtype=np.float64)
+        self.reset()
+
+    def reset(self):
+        if self.backend == "cpu":
+            _init_cpu(self.theta1v, self.theta2v, self.state, self.scheme)
+        else:
+            _init_gpu[self._grid](self.theta1v, self.theta2v, self.state, self.scheme)
+        self.time = 0.0
+
+    def advance(self, steps, dt):
+        if steps <= 0:
+            return
+        if self.backend == "cpu":
+            _advance_kernel_cpu(self.state, steps, dt, *self.params, self.scheme)
+        else:
+            _advance_kernel_gpu[self._grid](self.state, steps, dt, *self.params, self.scheme)
+        self.time += steps * dt
+
+    def snapshot(self, out=None):
+        if self.backend == "cpu":
+            _snapshot_cpu(self.state, self.colore)
+            if out is None:
+                return self.colore.copy()
+            out[...] = self.colore
+            return out
+        _snapshot_gpu[self._grid](self.state, self.colore)
+        return self.colore.copy_to_host() if out is None else self.colore.copy_to_host(out)
+
+    def render(self, tmax, samples=1000, out=None):
+        self.reset()
+        dt = float(tmax) / (samples - 1) if samples > 1 else 0.0
+        self.advance(samples - 2 if self.scheme == VERLET else samples - 1, dt)
+        return self.snapshot(out)
+
+
+def render_pendulum(theta1v, theta2v, tmax, samples=1000, params=None, scheme="verlet", backend=None):
+    """
+    sin(theta1) * sin(theta2) al tempo tmax, con dt = tmax / (samples - 1) come
+    nello script originale. Con "verlet" si fanno samples - 2 passi (il primo
+    campione è ripetuto, cioè velocità iniziale nulla) e il risultato coincide
+    con quello del kernel a NMAX; con gli altri schemi samples - 1 passi.
+    """
+    return PendulumGrid(theta1v, theta2v, params, scheme, backend).render(tmax, samples)
+
+
+def iter_snapshots(grid, times, dt):
+    """
+    Integra grid una sola volta con passo dt e restituisce (t, snapshot) per
+    ogni tempo di times (crescenti) appena ci arriva, invece di ripartire da
+    t = 0 per ogni fotogramma. Con "verlet" il tempo t corrisponde, come in
+    render_pendulum, a round(t / dt) - 1 passi: l'ultimo fotogramma coincide
+    con render_pendulum(..., times[-1], samples) se dt = times[-1] / (samples - 1).
+    """
+    offset = 1 if grid.scheme == VERLET else 0
+    done = 0
+    for t in times:
+        target = max(0, int(round(t / dt)) - offset) if dt > 0 else 0
+        if target < done:
+            raise ValueError("i tempi dei fotogrammi devono essere crescenti")
+        grid.advance(target - done, dt)
+        done = target
+        yield t, grid.snapshot()
@@ -0,0 +1,311 @@
+"""
+Zoom profondo per perturbazione (Mandelbrot e Burning Ship).
+
+Con le coordinate in float64 oltre uno zoom di circa 1e-13 i pixel vicini
+diventano lo stesso numero e l'immagine si rompe in blocchi. Qui si calcola una
+sola orbita di riferimento Z_n in alta precisione (decimal) e per ogni pixel si
+itera in float64 solo la differenza delta_n = z_n - Z_n:
+
+    Mandelbrot:    delta' = (2 Z + delta) delta + dc
+    Burning Ship:  dx' = (2 X + dx) dx - (2 Y + dy) dy + dcx
+                   dy' = 2 diffabs(X Y, X dy + dx Y + dx dy) + dcy
+
+dove diffabs(c, d) = |c + d| - |c| calcolato senza cancellazione.
+
+Un pixel è "glitch" quando |z| diventa molto più piccolo di |Z| (criterio di
+Pauldelbrot, la delta perde tutta la precisione) oppure quando l'orbita di
+riferimento è fuggita prima di lui. I pixel glitch vengono ricalcolati con un
+nuovo riferimento scelto fra loro, finché non ne restano o si raggiunge
+max_references.
+
+Per Mandelbrot le prime iterazioni si saltano con l'approssimazione in serie
+delta_n = A_n dc + B_n dc^2 + C_n dc^3, valida finché il termine cubico resta
+trascurabile rispetto a quello lineare su tutta l'immagine. Per Burning Ship
+la piega abs() non è analitica e la serie non si applica.
+
+Il centro si passa come stringa (o Decimal) per non perdere cifre, la larghezza
+della vista come float. Il risultato ha la stessa convenzione di
+frattali.escape (iterazione di fuga, oppure iterations per i punti interni).
+"""
+from __future__ import print_function
+import math
+from decimal import Decimal, localcontext
+import numpy as np
+from numba import cuda, njit, prange
+
+from frattali.escape import select_backend
+
+GLITCH = -1
+GLITCH_TOLERANCE = 1e-6
+SERIES_TOLERANCE = 1e-12
+MAX_REFERENCES = 64
+
+
+# Orbita di riferimento in alta precisione
+
+def reference_orbit(formula, cx, cy, iterations, digits):
+    """
+    Orbita Z_0 .. Z_m del punto (cx, cy) come due array float64. Si ferma alla
+    prima fuga (|Z_m| >= 2) oppure dopo iterations passi.
+    """
+    orbit_x = np.zeros(iterations + 1, dtype=np.float64)
+    orbit_y = np.zeros(iterations + 1, dtype=np.float64)
+    with localcontext() as ctx:
+        ctx.prec = digits
+        cx, cy = Decimal(cx), Decimal(cy)
+        zx, zy = Decimal(0), Decimal(0)
+        four = Decimal(4)
+        for n in range(iterations):
+            if formula == "burningship":
+                zx, zy = zx * zx - zy * zy + cx, 2 * abs(zx * zy) + cy
+            else:
+                zx, zy = zx * zx - zy * zy + cx, 2 * zx * zy + cy
+            orbit_x[n + 1] = float(zx)
+            orbit_y[n + 1] = float(zy)
+            if zx * zx + zy * zy >= four:
+                return orbit_x[:n + 2], orbit_y[:n + 2]
+    return orbit_x, orbit_y
+
+
+@njit(cache=True)
+def series_approximation(orbit_x, orbit_y, dmax, iterations, tolerance):
+    """
+    Coefficienti (A, B, C) della serie e numero di iterazioni saltabili per
+    |dc| <= dmax. A_{n+1} = 2 Z_n A_n + 1, B_{n+1} = 2 Z_n B_n + A_n^2,
+    C_{n+1} = 2 Z_n C_n + 2 A_n B_n.
+    """
+    a = 0j
+    b = 0j
+    c = 0j
+    skip = 0
+    last = min(iterations, orbit_x.shape[0] - 1) - 1
+    for n in range(last):
+        z = complex(orbit_x[n], orbit_y[n])
+        a1 = 2.0 * z * a + 1.0
+        b1 = 2.0 * z * b + a * a
+        c1 = 2.0 * z * c + 2.0 * a * b
+        if abs(c1) * dmax * dmax > tolerance * abs(a1):
+            break
+        a, b, c = a1, b1, c1
+        skip = n + 1
+    coefficients = np.array([a.real, a.imag, b.real, b.imag, c.real, c.imag])
+    return coefficients, skip
+
+
+# Iterazione delle delta per un pixel (compilata per CPU e CUDA)
+
+def _diffabs(c, d):
+    # |c + d| - |c| senza cancellazione
+    if c >= 0.0:
+        if c + d >= 0.0:
+            return d
+        return -(2.0 * c + d)
+    if c + d > 0.0:
+        return 2.0 * c + d
+    return -d
+
+
+def _delta_functions(diffabs):
+    # Le due iterazioni delle delta; diffabs è la versione CPU o CUDA di _diffabs
+    def mandelbrot_delta(orbit_x, orbit_y, dcx, dcy, series, skip, iterations, glitch_tolerance):
+        # Punto di partenza dalla serie: delta_skip = A dc + B dc^2 + C dc^3
+        dc2x = dcx * dcx - dcy * dcy
+        dc2y = 2.0 * dcx * dcy
+        dc3x = dc2x * dcx - dc2y * dcy
+        dc3y = dc2x * dcy + dc2y * dcx
+        dx = series[0] * dcx - series[1] * dcy + series[2] * dc2x - series[3] * dc2y + series[4] * dc3x - series[5] * dc3y
+        dy = series[0] * dcy + series[1] * dcx + series[2] * dc2y + series[3] * dc2x + series[4] * dc3y + series[5] * dc3x
+
+        ref_len = orbit_x.shape[0]
+        for n in range(skip, iterations):
+            if n + 1 >= ref_len:
+                return GLITCH
+            tx = 2.0 * orbit_x[n] + dx
+            ty = 2.0 * orbit_y[n] + dy
+            dx, dy = tx * dx - ty * dy + dcx, tx * dy + ty * dx + dcy
+            zx = orbit_x[n + 1] + dx
+            zy = orbit_y[n + 1] + dy
+            r2 = zx * zx + zy * zy
+            if r2 >= 4.0:
+                return n
+            if r2 < glitch_tolerance * (orbit_x[n + 1] * orbit_x[n + 1] + orbit_y[n + 1] * orbit_y[n + 1]):
+                return GLITCH
+        return iterations
+
+    def burningship_delta(orbit_x, orbit_y, dcx, dcy, series, skip, iterations, glitch_tolerance):
+        dx, dy = 0.0, 0.0
+        ref_len = orbit_x.shape[0]
+        for n in range(iterations):
+            if n + 1 >= ref_len:
+                return GLITCH
+            X = orbit_x[n]
+            Y = orbit_y[n]
+            dx, dy = ((2.0 * X + dx) * dx - (2.0 * Y + dy) * dy + dcx,
+                      2.0 * diffabs(X * Y, X * dy + dx * Y + dx * dy) + dcy)
+            zx = orbit_x[n + 1] + dx
+            zy = orbit_y[n + 1] + dy
+            r2 = zx * zx + zy * zy
+            if r2 >= 4.0:
+                return n
+            if r2 < glitch_tolerance * (orbit_x[n + 1] * orbit_x[n + 1] + orbit_y[n + 1] * orbit_y[n + 1]):
+                return GLITCH
+        return iterations
+
+    return {"mandelbrot": mandelbrot_delta, "burningship": burningship_delta}
+
+
+_diffabs_cpu = njit(cache=True)(_diffabs)
+_diffabs_gpu = cuda.jit(device=True)(_diffabs)
+_kernels = {}
+
+
+def _build(formula, backend):
+    if backend == "cpu":
+        delta = njit(_delta_functions(_diffabs_cpu)[formula])
+
+        @njit(parallel=True)
+        def kernel(pixels, out, xres, yres, width, height, ref_dx, ref_dy, orbit_x, orbit_y,
+                   series, skip, iterations, glitch_tolerance):
+            for k in prange(pixels.shape[0]):
+                p = pixels[k]
+                x = p % xres
+                y = p // xres
+                dcx = (-0.5 * width + x * width / xres) - ref_dx
+                dcy = (-0.5 * height + y * height / yres) - ref_dy
+                out[p] = delta(orbit_x, orbit_y, dcx, dcy, series, skip, iterations, glitch_tolerance)
+        return kernel
+
+    delta = cuda.jit(device=True)(_delta_functions(_diffabs_gpu)[formula])
+
+    @cuda.jit
+    def kernel(pixels, out, xres, yres, width, height, ref_dx, ref_dy, orbit_x, orbit_y,
+               series, skip, iterations, glitch_tolerance):
+        k = cuda.grid(1)
+        if k < pixels.shape[0]:
+            p = pixels[k]
+            x = p % xres
+            y = p // xres
+            dcx = (-0.5 * width + x * width / xres) - ref_dx
+            dcy = (-0.5 * height + y * height / yres) - ref_dy
+            out[p] = delta(orbit_x, orbit_y, dcx, dcy, series, skip, iterations, glitch_tolerance)
+    return kernel
+
+
+def _kernel(formula, backend):
+    if (formula, backend) not in _kernels:
+        _kernels[formula, backend] = _build(formula, backend)
+    return _kernels[formula, backend]
+
+
+def _run(kernel, backend, pixels, out, args):
+    if backend == "cpu":
+        kernel(pixels, out, *args)
+        return
+    threads = 256
+    pixels_device = cuda.to_device(pixels)
+    out_device = cuda.to_device(out)
+    args = tuple(cuda.to_device(a) if isinstance(a, np.ndarray) else a for a in args)
+    kernel[(len(pixels) + threads - 1) // threads, threads](pixels_device, out_device, *args)
+    out_device.copy_to_host(out)
+
+
+def _render_deep(formula, xres, yres, iterations, center_x, center_y, width, height, backend, series,
+                 max_references, glitch_tolerance, series_tolerance, stats):
+    backend = select_backend(backend)
+    kernel = _kernel(formula, backend)
+    width = float(width)
+    height = width * yres / xres if height is None else float(height)
+    # Cifre decimali per l'orbita di riferimento: quelle del passo tra i pixel più un margine
+    digits = max(30, int(-math.log10(min(width / xres, abs(height) / yres))) + 20)
+    center_x, center_y = Decimal(center_x), Decimal(center_y)
+
+    out = np.empty(xres * yres, dtype=np.int32)
+    pending = np.arange(xres * yres, dtype=np.int64)
+    ref_dx, ref_dy = 0.0, 0.0
+    references = 0
+    skipped = []
+    while len(pending) and references < max_references:
+        with localcontext() as ctx:
+            ctx.prec = digits
+            ref_x = center_x + Decimal(ref_dx)
+            ref_y = center_y + Decimal(ref_dy)
+        orbit_x, orbit_y = reference_orbit(formula, ref_x, ref_y, iterations, digits)
+        references += 1
+
+        if series and formula == "mandelbrot":
+            # |dc| massimo fra i pixel ancora da calcolare, rispetto al riferimento
+            px = -0.5 * width + (pending % xres) * width / xres - ref_dx
+            py = -0.5 * height + (pending // xres) * height / yres - ref_dy
+            dmax = float(np.sqrt(np.max(px * px + py * py)))
+            coefficients, skip = series_approximation(orbit_x, orbit_y, dmax, iterations, series_tolerance)
+        else:
+            # Nessuna iterazione saltata: delta_0 = 0 come z_0 = 0
+            coefficients, skip = np.zeros(6), 0
+        skipped.append(skip)
+
+        _run(kernel, backend, pending, out, (xres, yres, width, height, ref_dx, ref_dy, orbit_x, orbit_y,
+                                              coefficients, skip, iterations, glitch_tolerance))
+
+        pending = pending[out[pending] == GLITCH]
+        if len(pending):
+            # Nuovo riferimento: un pixel glitch (il suo delta è zero, quindi si risolve di sicuro)
+            pick = pending[len(pending) // 2]
+            ref_dx = -0.5 * width + (pick % xres) * width / xres
+            ref_dy = -0.5 * height + (pick // xres) * height / yres
+
+    # I pixel rimasti glitch dopo max_references si considerano interni
+    out[pending] = iterations
+    if stats is not None:
+        stats["references"] = references
+        stats["series_skip"] = skipped
+        stats["glitched"] = len(pending)
+    return out.reshape(yres, xres)
+
+
+def render_deep_mandelbrot(xres, yres, iterations, center_x, center_y, width, height=None, backend=None,
+                           series=True, max_references=MAX_REFERENCES, glitch_tolerance=GLITCH_TOLERANCE,
+                           series_tolerance=SERIES_TOLERANCE, stats=None):
+    """
+    Mandelbrot per perturbazione sulla vista di centro (center_x, center_y) e
+    larghezza width; l'altezza, se non data, segue il rapporto yres/xres (può
+    essere negativa per avere le y decrescenti lungo le righe). Se stats è un
+    dizionario vi si scrivono i riferimenti usati, le iterazioni saltate con la
+    serie e i pixel rimasti glitch.
+    """
+    return _render_deep("mandelbrot", xres, yres, iterations, center_x, center_y, width, height, backend, series,
+                        max_references, glitch_tolerance, series_tolerance, stats)
+
+
+def render_deep_burningship(xres, yres, iterations, center_x, center_y, width, height=None, backend=None,
+                            max_references=MAX_REFERENCES, glitch_tolerance=GLITCH_TOLERANCE, stats=None):
+    """Burning Ship per perturbazione (vedi render_deep_mandelbrot, senza serie)."""
+    return _render_deep("burningship", xres, yres, iterations, center_x, center_y, width, height, backend, False,
+                        max_references, glitch_tolerance, SERIES_TOLERANCE, stats)
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+    from PIL import Image as im
+    from frattali.colors import log_colorize
+
+    parser = argparse.ArgumentParser(description="Zoom profondo per perturbazione")
+    parser.add_argument("formula", choices=["mandelbrot", "burningship"])
+    parser.add_argument("filename")
+    parser.add_argument("--center-x", default="-0.743643887037158704752191506114774")
+    parser.add_argument("--center-y", default="0.131825904205311970493132056385139")
+    parser.add_argument("--width", type=float, default=1e-20)
+    parser.add_argument("--xres", type=int, default=800)
+    parser.add_argument("--yres", type=int, default=600)
+    parser.add_argument("--iterations", type=int, default=5000)
+    parser.add_argument("--cmap", default="inferno")
+    opts = parser.parse_args()
+
+    render = render_deep_mandelbrot if opts.formula == "mandelbrot" else render_deep_burningship
+    stats = {}
+    start = time.perf_counter()
+    counts = render(opts.xres, opts.yres, opts.iterations, opts.center_x, opts.center_y, opts.width, stats=stats)
+    elapsed = time.perf_counter() - start
+    im.fromarray(log_colorize(counts, opts.iterations, opts.cmap)).save(opts.filename)
+    print(f"{opts.filename}: {elapsed:.2f} s, riferimenti {stats['references']}, "
+          f"iterazioni saltate {stats['series_skip']}, glitch rimasti {stats['glitched']}")
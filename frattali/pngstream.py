@@ -0,0 +1,96 @@
+"""
+Scrittura di PNG a bande di righe, senza tenere in memoria l'immagine intera.
+
+PIL vuole tutto l'array prima di salvare; qui invece ogni banda viene compressa
+con uno zlib incrementale e scritta subito come chunk IDAT.
+"""
+import struct
+import zlib
+import numpy as np
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+# Tipo di colore PNG in base al numero di canali (L, RGB, RGBA)
+COLOR_TYPES = {1: 0, 3: 2, 4: 6}
+
+
+class PNGWriter():
+    """
+    Scrive un PNG a 8 bit per canale una banda di righe alla volta.
+
+    Le bande sono array uint8 di forma (righe, width) o (righe, width, canali)
+    e vanno scritte dall'alto verso il basso; alla chiusura il numero totale di
+    righe dev'essere pari a height.
+    """
+    def __init__(self, filename, width, height, channels=3, compress_level=6, chunk_size=1 << 20):
+        if channels not in COLOR_TYPES:
+            raise ValueError(f"numero di canali non supportato: {channels}")
+        self.width = width
+        self.height = height
+        self.channels = channels
+        self.chunk_size = chunk_size
+        self.rows_written = 0
+        self._compressor = zlib.compressobj(compress_level)
+        self._pending = []
+        self._pending_size = 0
+        self._file = open(filename, "wb")
+        self._file.write(PNG_SIGNATURE)
+        self._write_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, COLOR_TYPES[channels], 0, 0, 0))
+
+    def _write_chunk(self, tag, data):
+        self._file.write(struct.pack(">I", len(data)))
+        self._file.write(tag)
+        self._file.write(data)
+        self._file.write(struct.pack(">I", zlib.crc32(data, zlib.crc32(tag)) & 0xFFFFFFFF))
+
+    def _flush_idat(self, force=False):
+        if self._pending_size >= self.chunk_size or (force and self._pending_size):
+            self._write_chunk(b"IDAT", b"".join(self._pending))
+            self._pending = []
+            self._pending_size = 0
+
+    def write_rows(self, band):
+        band = np.asarray(band, dtype=np.uint8)
+        if band.ndim == 2:
+            band = band[:, :, np.newaxis]
+        if band.shape[1:] != (self.width, self.channels):
+            raise ValueError(f"banda di forma {band.shape}, attesa (righe, {self.width}, {self.channels})")
+        if self.rows_written + band.shape[0] > self.height:
+            raise ValueError("troppe righe per l'altezza dichiarata")
+
+        # Ogni riga del PNG inizia con il byte del filtro (0 = nessun filtro)
+        rows = np.empty((band.shape[0], 1 + self.width * self.channels), dtype=np.uint8)
+        rows[:, 0] = 0
+        rows[:, 1:] = band.reshape(band.shape[0], -1)
+
+        data = self._compressor.compress(rows.tobytes())
+        if data:
+            self._pending.append(data)
+            self._pending_size += len(data)
+        self.rows_written += band.shape[0]
+        self._flush_idat()
+
+    def close(self):
+        if self._file is None:
+            return
+        try:
+            if self.rows_written != self.height:
+                raise ValueError(f"scritte {self.rows_written} righe su {self.height}")
+            self._pending.append(self._compressor.flush())
+            self._pending_size += len(self._pending[-1])
+            self._flush_idat(force=True)
+            self._write_chunk(b"IEND", b"")
+        finally:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            # In caso di errore si chiude il file senza completare il PNG
+            self._file.close()
+            self._file = None
@@ -0,0 +1,396 @@
+"""
+Livelli di precisione per i kernel a tempo di fuga.
+
+I kernel di frattali.escape calcolano in float64. Nelle viste larghe basta il
+float32, che sulla CPU si vettorizza con il doppio dei canali SIMD e sulle GPU
+consumer va decine di volte più veloce. Nelle viste profonde il float64 non
+distingue più i pixel vicini. I livelli sono:
+  - "float32": sulla CPU ogni riga è iterata su LANES canali (array locali)
+    con CHUNK passi alla volta di un ciclo senza salti che LLVM vettorizza; un
+    canale fuggito o periodico resta fermo fino alla fine del blocco, poi
+    scrive il suo pixel e prende il prossimo della riga. Il controllo di
+    periodicità di Brent è tenuto per canale. Su CUDA le stesse formule
+    scalari di frattali.escape con costanti float32;
+  - "float64": i kernel di frattali.escape, invariati;
+  - "double-double": ogni numero è una coppia (hi, lo) di float64 con
+    hi + lo esatto, circa 106 bit di mantissa. Somme e prodotti usano le
+    trasformazioni esatte di Knuth (two_sum) e Dekker (two_prod con split),
+    senza fma.
+
+In automatico il livello è il più economico fra float64 e double-double per
+cui il passo fra due pixel, min((x_max - x_min) / xres, (y_max - y_min) /
+yres), vale almeno PIXEL_ULPS unità di arrotondamento della coordinata più
+grande (almeno 2, il raggio di fuga). Oltre il double-double serve
+frattali.perturbation. Il float32 si usa solo se richiesto: il passo dei
+pixel non basta a deciderlo, perché l'errore di arrotondamento cresce lungo
+l'orbita, e con 1000 iterazioni a 800x600 cambia il conteggio del 9-17% dei
+pixel delle viste intere (contro il 4% del float64 rispetto al double-double),
+per cui le immagini non sarebbero più quelle dei kernel float64. Le coordinate si
+possono passare come stringhe o Decimal per non perdere cifre nelle viste
+double-double; il passo si calcola in Decimal.
+
+Le coordinate dei pixel sono calcolate in float64 come in frattali.escape (in
+double-double per l'ultimo livello) e poi convertite, per cui il float32 vede
+gli stessi punti arrotondati.
+"""
+import os
+from decimal import Decimal, localcontext
+import numpy as np
+from numba import cuda, njit, prange, float32
+
+PRECISIONS = ("float32", "float64", "double-double")
+# Livelli fra cui sceglie "auto" (il float32 va chiesto esplicitamente)
+AUTOMATIC = ("float64", "double-double")
+# Unità di arrotondamento di ogni livello
+UNIT_ROUNDOFF = {"float32": 2.0 ** -24, "float64": 2.0 ** -53, "double-double": 2.0 ** -106}
+PIXEL_ULPS = 1024
+# Pixel iterati insieme dal kernel float32 per CPU
+LANES = 16
+# Passi fra due ricariche dei canali
+CHUNK = 16
+# 2^27 + 1, per dividere un float64 in due metà di 26 bit
+SPLITTER = 134217729.0
+DIGITS = 40
+
+
+def _decimal(value):
+    return value if isinstance(value, Decimal) else Decimal(value if isinstance(value, str) else float(value))
+
+
+def pixel_spacing(xres, yres, x_min, x_max, y_min, y_max):
+    """Passo fra due pixel (il minore dei due assi) e coordinata più grande in valore assoluto."""
+    with localcontext() as ctx:
+        ctx.prec = DIGITS
+        x_min, x_max, y_min, y_max = (_decimal(v) for v in (x_min, x_max, y_min, y_max))
+        spacing = min(abs(x_max - x_min) / xres, abs(y_max - y_min) / yres)
+        scale = max(abs(x_min), abs(x_max), abs(y_min), abs(y_max), Decimal(2))
+    return spacing, scale
+
+
+def select_precision(xres, yres, x_min, x_max, y_min, y_max, precision=None):
+    """
+    Livello di precisione per la vista: quello dato, oppure con "auto" (o la
+    variabile FRATTALI_PRECISION) il più economico fra float64 e
+    double-double che risolve il passo dei pixel.
+    """
+    if precision is None:
+        precision = os.environ.get("FRATTALI_PRECISION", "auto")
+    if precision != "auto":
+        if precision not in PRECISIONS:
+            raise ValueError(f"precisione sconosciuta: {precision!r} (validi: auto, {', '.join(PRECISIONS)})")
+        return precision
+    spacing, scale = pixel_spacing(xres, yres, x_min, x_max, y_min, y_max)
+    for name in AUTOMATIC:
+        if spacing >= scale * Decimal(UNIT_ROUNDOFF[name] * PIXEL_ULPS):
+            return name
+    raise ValueError(f"passo dei pixel {float(spacing):.3g} oltre il double-double: usare frattali.perturbation")
+
+
+def _split_decimal(value):
+    # Coppia (hi, lo) di float64 più vicina al valore
+    with localcontext() as ctx:
+        ctx.prec = DIGITS
+        value = _decimal(value)
+        hi = float(value)
+        return hi, float(value - Decimal(hi))
+
+
+def kernel_args(precision, xres, yres, iterations, a, b, x_min, x_max, y_min, y_max):
+    """
+    Argomenti dei kernel di kernel() dopo out (a, b: il parametro c di Julia).
+    """
+    if precision != "double-double":
+        return tuple([iterations] + [float(v) for v in (a, b, x_min, x_max, y_min, y_max)])
+    with localcontext() as ctx:
+        ctx.prec = DIGITS
+        dx = (_decimal(x_max) - _decimal(x_min)) / xres
+        dy = (_decimal(y_max) - _decimal(y_min)) / yres
+    args = [iterations]
+    for value in (a, b, x_min, dx, y_min, dy):
+        args += _split_decimal(value)
+    return tuple(args)
+
+
+# float32: formule scalari per CUDA e kernel a canali per la CPU
+
+_zero, _quarter, _sixteenth, _one, _two, _four = (np.float32(v) for v in (0.0, 0.25, 0.0625, 1.0, 2.0, 4.0))
+
+
+def _float32_point(formula):
+    # Come le formule di frattali.escape, con firma comune (px, py, a, b, iterations)
+    julia = formula == "julia"
+    burning = formula == "burningship"
+    periodic = not burning
+
+    def point(px, py, a, b, iterations):
+        if julia:
+            zx, zy, cx, cy = px, py, a, b
+        else:
+            zx, zy, cx, cy = _zero, _zero, px, py
+        if formula == "mandelbrot":
+            xq = cx - _quarter
+            q = xq * xq + cy * cy
+            if q * (q + xq) <= _quarter * cy * cy:
+                return iterations
+            if (cx + _one) * (cx + _one) + cy * cy <= _sixteenth:
+                return iterations
+        ox, oy = zx, zy
+        steps, window = 0, 8
+        for n in range(iterations):
+            if burning:
+                zx, zy = abs(zx), abs(zy)
+            zx, zy = zx * zx - zy * zy + cx, _two * zx * zy + cy
+            if zx * zx + zy * zy >= _four:
+                return n
+            if periodic:
+                if zx == ox and zy == oy:
+                    return iterations
+                steps += 1
+                if steps == window:
+                    steps = 0
+                    window *= 2
+                    ox, oy = zx, zy
+        return iterations
+    return point
+
+
+def _float32_cpu(formula):
+    julia = formula == "julia"
+    burning = formula == "burningship"
+    periodic = not burning
+    mandelbrot = formula == "mandelbrot"
+
+    @njit(parallel=True, nogil=True, cache=True)
+    def kernel(xres, yres, iterations, out, a, b, x_min, x_max, y_min, y_max, y_start):
+        for row in prange(out.shape[0]):
+            zx = np.zeros(LANES, np.float32)
+            zy = np.zeros(LANES, np.float32)
+            cx = np.zeros(LANES, np.float32)
+            cy = np.zeros(LANES, np.float32)
+            ox = np.zeros(LANES, np.float32)
+            oy = np.zeros(LANES, np.float32)
+            count = np.zeros(LANES, np.int32)
+            steps = np.zeros(LANES, np.int32)
+            window = np.zeros(LANES, np.int32)
+            live = np.zeros(LANES, np.int32)
+            pixel = np.full(LANES, -1, np.int64)
+            py = float32(y_min + (y_start + row) * (y_max - y_min) / yres)
+            x = 0
+            busy = True
+            while busy:
+                # Un canale finito scrive il suo pixel e prende il prossimo della riga
+                busy = False
+                for l in range(LANES):
+                    if live[l]:
+                        busy = True
+                        continue
+                    if pixel[l] >= 0:
+                        out[row, pixel[l]] = count[l]
+                        pixel[l] = -1
+                    while x < xres:
+                        px = float32(x_min + x * (x_max - x_min) / xres)
+                        pixel[l] = x
+                        x += 1
+                        if julia:
+                            zx[l], zy[l], cx[l], cy[l] = px, py, float32(a), float32(b)
+                        else:
+                            zx[l], zy[l], cx[l], cy[l] = _zero, _zero, px, py
+                        ox[l], oy[l] = zx[l], zy[l]
+                        count[l], steps[l], window[l], live[l] = 0, 0, 8, 1 if iterations > 0 else 0
+                        if mandelbrot:
+                            xq = px - _quarter
+                            q = xq * xq + py * py
+                            if (q * (q + xq) <= _quarter * py * py
+                                    or (px + _one) * (px + _one) + py * py <= _sixteenth):
+                                count[l], live[l] = iterations, 0
+                        if live[l]:
+                            break
+                        out[row, x - 1] = count[l]
+                        pixel[l] = -1
+                    busy = busy or live[l] != 0
+
+                # CHUNK passi su tutti i canali senza salti; quelli finiti restano fermi
+                for _ in range(CHUNK):
+                    for l in range(LANES):
+                        sx, sy = zx[l], zy[l]
+                        if burning:
+                            sx, sy = abs(sx), abs(sy)
+                        nx = sx * sx - sy * sy + cx[l]
+                        ny = _two * sx * sy + cy[l]
+                        go = live[l] != 0
+                        running = go & (nx * nx + ny * ny < _four)
+                        cycle = running & periodic & (nx == ox[l]) & (ny == oy[l])
+                        zx[l] = nx if go else zx[l]
+                        zy[l] = ny if go else zy[l]
+                        n = count[l] + 1 if running else count[l]
+                        count[l] = iterations if cycle else n
+                        live[l] = 1 if running and not cycle and n < iterations else 0
+                        if periodic:
+                            # Brent per canale: si salva il punto a ogni potenza di due
+                            save = go & (steps[l] + 1 == window[l])
+                            steps[l] = 0 if save else steps[l] + 1
+                            window[l] = 2 * window[l] if save else window[l]
+                            ox[l] = zx[l] if save else ox[l]
+                            oy[l] = zy[l] if save else oy[l]
+    return kernel
+
+
+def _float32_gpu(formula):
+    point = cuda.jit(device=True)(_float32_point(formula))
+
+    @cuda.jit
+    def kernel(xres, yres, iterations, out, a, b, x_min, x_max, y_min, y_max, y_start):
+        x, row = cuda.grid(2)
+        if x < xres and row < out.shape[0]:
+            y = y_start + row
+            px = float32(x_min + x * (x_max - x_min) / xres)
+            py = float32(y_min + y * (y_max - y_min) / yres)
+            out[row, x] = point(px, py, float32(a), float32(b), iterations)
+    return kernel
+
+
+# double-double
+
+def _dd_ops(jit):
+    # Somma e prodotto di coppie (hi, lo), compilate con jit (njit o device CUDA)
+    @jit
+    def quick_two_sum(a, b):
+        s = a + b
+        return s, b - (s - a)
+
+    @jit
+    def two_sum(a, b):
+        s = a + b
+        v = s - a
+        return s, (a - (s - v)) + (b - v)
+
+    @jit
+    def split(a):
+        t = SPLITTER * a
+        hi = t - (t - a)
+        return hi, a - hi
+
+    @jit
+    def add(ah, al, bh, bl):
+        s, e = two_sum(ah, bh)
+        t, f = two_sum(al, bl)
+        s, e = quick_two_sum(s, e + t)
+        return quick_two_sum(s, e + f)
+
+    @jit
+    def mul(ah, al, bh, bl):
+        p = ah * bh
+        a1, a2 = split(ah)
+        b1, b2 = split(bh)
+        e = ((a1 * b1 - p) + a1 * b2 + a2 * b1) + a2 * b2
+        return quick_two_sum(p, e + (ah * bl + al * bh))
+
+    return add, mul
+
+
+def _dd_point(formula, add, mul):
+    julia = formula == "julia"
+    burning = formula == "burningship"
+    periodic = not burning
+
+    def point(pxh, pxl, pyh, pyl, ah, al, bh, bl, iterations):
+        if julia:
+            zxh, zxl, zyh, zyl, cxh, cxl, cyh, cyl = pxh, pxl, pyh, pyl, ah, al, bh, bl
+        else:
+            zxh, zxl, zyh, zyl, cxh, cxl, cyh, cyl = 0.0, 0.0, 0.0, 0.0, pxh, pxl, pyh, pyl
+        if formula == "mandelbrot":
+            # Cardioide e bulbo di periodo 2, anche questi in double-double
+            y2h, y2l = mul(cyh, cyl, cyh, cyl)
+            xqh, xql = add(cxh, cxl, -0.25, 0.0)
+            qh, ql = mul(xqh, xql, xqh, xql)
+            qh, ql = add(qh, ql, y2h, y2l)
+            sh, sl = add(qh, ql, xqh, xql)
+            sh, sl = mul(qh, ql, sh, sl)
+            if add(sh, sl, -0.25 * y2h, -0.25 * y2l)[0] <= 0.0:
+                return iterations
+            xqh, xql = add(cxh, cxl, 1.0, 0.0)
+            qh, ql = mul(xqh, xql, xqh, xql)
+            qh, ql = add(qh, ql, y2h, y2l)
+            if add(qh, ql, -0.0625, 0.0)[0] <= 0.0:
+                return iterations
+
+        x2h, x2l = mul(zxh, zxl, zxh, zxl)
+        y2h, y2l = mul(zyh, zyl, zyh, zyl)
+        oxh, oxl, oyh, oyl = zxh, zxl, zyh, zyl
+        steps, window = 0, 8
+        for n in range(iterations):
+            if burning:
+                if zxh < 0.0:
+                    zxh, zxl = -zxh, -zxl
+                if zyh < 0.0:
+                    zyh, zyl = -zyh, -zyl
+            xyh, xyl = mul(zxh, zxl, zyh, zyl)
+            zxh, zxl = add(x2h, x2l, -y2h, -y2l)
+            zxh, zxl = add(zxh, zxl, cxh, cxl)
+            zyh, zyl = add(2.0 * xyh, 2.0 * xyl, cyh, cyl)
+            x2h, x2l = mul(zxh, zxl, zxh, zxl)
+            y2h, y2l = mul(zyh, zyl, zyh, zyl)
+            if x2h + y2h >= 4.0:
+                return n
+            if periodic:
+                if zxh == oxh and zxl == oxl and zyh == oyh and zyl == oyl:
+                    return iterations
+                steps += 1
+                if steps == window:
+                    steps = 0
+                    window *= 2
+                    oxh, oxl, oyh, oyl = zxh, zxl, zyh, zyl
+        return iterations
+    return point
+
+
+def _dd_cpu(formula):
+    add, mul = _dd_ops(njit(cache=True))
+    point = njit(cache=True)(_dd_point(formula, add, mul))
+
+    @njit(parallel=True, nogil=True, cache=True)
+    def kernel(xres, yres, iterations, out, ah, al, bh, bl, x0h, x0l, dxh, dxl, y0h, y0l, dyh, dyl, y_start):
+        for row in prange(out.shape[0]):
+            pyh, pyl = mul(1.0 * (y_start + row), 0.0, dyh, dyl)
+            pyh, pyl = add(y0h, y0l, pyh, pyl)
+            for x in range(xres):
+                pxh, pxl = mul(1.0 * x, 0.0, dxh, dxl)
+                pxh, pxl = add(x0h, x0l, pxh, pxl)
+                out[row, x] = point(pxh, pxl, pyh, pyl, ah, al, bh, bl, iterations)
+    return kernel
+
+
+def _dd_gpu(formula):
+    add, mul = _dd_ops(cuda.jit(device=True))
+    point = cuda.jit(device=True)(_dd_point(formula, add, mul))
+
+    @cuda.jit
+    def kernel(xres, yres, iterations, out, ah, al, bh, bl, x0h, x0l, dxh, dxl, y0h, y0l, dyh, dyl, y_start):
+        x, row = cuda.grid(2)
+        if x < xres and row < out.shape[0]:
+            pyh, pyl = mul(1.0 * (y_start + row), 0.0, dyh, dyl)
+            pyh, pyl = add(y0h, y0l, pyh, pyl)
+            pxh, pxl = mul(1.0 * x, 0.0, dxh, dxl)
+            pxh, pxl = add(x0h, x0l, pxh, pxl)
+            out[row, x] = point(pxh, pxl, pyh, pyl, ah, al, bh, bl, iterations)
+    return kernel
+
+
+_BUILDERS = {
+    ("float32", "cpu"): _float32_cpu,
+    ("float32", "cuda"): _float32_gpu,
+    ("double-double", "cpu"): _dd_cpu,
+    ("double-double", "cuda"): _dd_gpu,
+}
+_kernels = {}
+
+
+def kernel(formula, precision, backend):
+    """
+    Kernel float32 o double-double (compilato alla prima richiesta), con la
+    firma (xres, yres, iterations, out, *kernel_args[1:], y_start).
+    """
+    key = (formula, precision, backend)
+    if key not in _kernels:
+        _kernels[key] = _BUILDERS[precision, backend](formula)
+    return _kernels[key]
@@ -0,0 +1,347 @@
+"""
+Rendering per suddivisione (Mariani-Silver).
+
+Le regioni con lo stesso numero di iterazioni sono semplicemente connesse: se
+tutto il bordo di un rettangolo ha lo stesso valore, l'interno ha quel valore e
+non serve calcolarlo. Il rettangolo viene quindi riempito, altrimenti diviso in
+quattro e si ricomincia dai bordi dei figli (le linee di taglio sono gli unici
+pixel nuovi da calcolare). Sotto min_size pixel di lato si calcola tutto.
+
+Su CPU l'immagine è divisa in tile indipendenti (prange sui tile) e ogni tile
+viene suddiviso con uno stack esplicito. Su CUDA la suddivisione procede per
+livelli pilotati dall'host: un kernel calcola i bordi di tutti i rettangoli,
+uno li classifica e uno riempie quelli uniformi (o piccoli), i restanti vengono
+divisi per il livello successivo.
+
+Le coordinate dei pixel e i livelli di precisione (float32, float64 o
+double-double, scelti con precision) sono quelli di frattali.escape e
+frattali.precision. Il risultato coincide con il rendering completo tranne dove
+un dettaglio più piccolo di un rettangolo non tocca il suo bordo (caso raro, più
+probabile con tile grandi).
+"""
+import numpy as np
+from numba import cuda, njit, prange, float32
+
+from frattali.escape import (
+    select_backend,
+    mandelbrot_cpu, julia_cpu, burningship_cpu,
+    mandelbrot_gpu, julia_gpu, burningship_gpu,
+)
+from frattali.precision import select_precision, kernel_args, _float32_point, _dd_ops, _dd_point
+
+# Lato dei tile iniziali e lato sotto il quale non si suddivide più
+TILE = 128
+MIN_SIZE = 4
+STACK_SIZE = 64
+THREADS = 128
+
+_cpu_kernels = {}
+_gpu_kernels = {}
+
+
+def _point_functions(formula, precision):
+    # Firma comune (x, y, params, iterations): x, y sono gli indici del pixel
+    # nell'immagine intera, params la tupla di _params per il livello di precisione
+    if precision == "double-double":
+        return _dd_point_functions(formula)
+    if precision == "float32":
+        f_cpu = njit(_float32_point(formula))
+        f_gpu = cuda.jit(device=True)(_float32_point(formula))
+
+        def point_cpu(x, y, params, iterations):
+            a, b, x_min, x_max, y_min, y_max, xres, yres = params
+            return f_cpu(float32(x_min + x * (x_max - x_min) / xres), float32(y_min + y * (y_max - y_min) / yres),
+                         float32(a), float32(b), iterations)
+
+        def point_gpu(x, y, params, iterations):
+            a, b, x_min, x_max, y_min, y_max, xres, yres = params
+            return f_gpu(float32(x_min + x * (x_max - x_min) / xres), float32(y_min + y * (y_max - y_min) / yres),
+                         float32(a), float32(b), iterations)
+    elif formula == "julia":
+        f_cpu, f_gpu = julia_cpu, julia_gpu
+
+        def point_cpu(x, y, params, iterations):
+            a, b, x_min, x_max, y_min, y_max, xres, yres = params
+            return f_cpu(x_min + x * (x_max - x_min) / xres, y_min + y * (y_max - y_min) / yres, a, b, iterations)
+
+        def point_gpu(x, y, params, iterations):
+            a, b, x_min, x_max, y_min, y_max, xres, yres = params
+            return f_gpu(x_min + x * (x_max - x_min) / xres, y_min + y * (y_max - y_min) / yres, a, b, iterations)
+    else:
+        f_cpu, f_gpu = {
+            "mandelbrot": (mandelbrot_cpu, mandelbrot_gpu),
+            "burningship": (burningship_cpu, burningship_gpu),
+        }[formula]
+
+        def point_cpu(x, y, params, iterations):
+            a, b, x_min, x_max, y_min, y_max, xres, yres = params
+            return f_cpu(x_min + x * (x_max - x_min) / xres, y_min + y * (y_max - y_min) / yres, iterations)
+
+        def point_gpu(x, y, params, iterations):
+            a, b, x_min, x_max, y_min, y_max, xres, yres = params
+            return f_gpu(x_min + x * (x_max - x_min) / xres, y_min + y * (y_max - y_min) / yres, iterations)
+
+    return njit(point_cpu), cuda.jit(device=True)(point_gpu)
+
+
+def _dd_point_functions(formula):
+    # Coordinate e iterazione in double-double, come i kernel di frattali.precision
+    add_cpu, mul_cpu = _dd_ops(njit)
+    add_gpu, mul_gpu = _dd_ops(cuda.jit(device=True))
+    f_cpu = njit(_dd_point(formula, add_cpu, mul_cpu))
+    f_gpu = cuda.jit(device=True)(_dd_point(formula, add_gpu, mul_gpu))
+
+    def build(f, add, mul):
+        def point(x, y, params, iterations):
+            ah, al, bh, bl, x0h, x0l, dxh, dxl, y0h, y0l, dyh, dyl = params
+            pxh, pxl = mul(1.0 * x, 0.0, dxh, dxl)
+            pxh, pxl = add(x0h, x0l, pxh, pxl)
+            pyh, pyl = mul(1.0 * y, 0.0, dyh, dyl)
+            pyh, pyl = add(y0h, y0l, pyh, pyl)
+            return f(pxh, pxl, pyh, pyl, ah, al, bh, bl, iterations)
+        return point
+
+    return njit(build(f_cpu, add_cpu, mul_cpu)), cuda.jit(device=True)(build(f_gpu, add_gpu, mul_gpu))
+
+
+def _params(precision, xres, yres, a, b, view):
+    # Tupla di float64 passata ai kernel: parametro di Julia e vista nel formato del livello
+    if precision == "double-double":
+        return kernel_args(precision, xres, yres, 0, a, b, *view)[1:]
+    return tuple(float(v) for v in (a, b, *view, xres, yres))
+
+
+def _build_cpu(point):
+    @njit
+    def pixel(out, x, row, y_start, iterations, params):
+        if out[row, x] >= 0:
+            return 0
+        out[row, x] = point(x, y_start + row, params, iterations)
+        return 1
+
+    @njit(parallel=True)
+    def subdivide(y_start, iterations, out, params, tiles, min_size):
+        iterated = np.zeros(tiles.shape[0], dtype=np.int64)
+        for t in prange(tiles.shape[0]):
+            stack = np.empty((STACK_SIZE, 4), dtype=np.int64)
+            stack[0, :] = tiles[t]
+            top = 1
+            done = 0
+            while top > 0:
+                top -= 1
+                x0, r0, x1, r1 = stack[top, 0], stack[top, 1], stack[top, 2], stack[top, 3]
+
+                # Bordo del rettangolo (estremi inclusi)
+                for x in range(x0, x1 + 1):
+                    done += pixel(out, x, r0, y_start, iterations, params)
+                    done += pixel(out, x, r1, y_start, iterations, params)
+                for r in range(r0 + 1, r1):
+                    done += pixel(out, x0, r, y_start, iterations, params)
+                    done += pixel(out, x1, r, y_start, iterations, params)
+
+                if x1 - x0 < 2 or r1 - r0 < 2:
+                    continue
+
+                value = out[r0, x0]
+                uniform = True
+                for x in range(x0, x1 + 1):
+                    if out[r0, x] != value or out[r1, x] != value:
+                        uniform = False
+                        break
+                if uniform:
+                    for r in range(r0 + 1, r1):
+                        if out[r, x0] != value or out[r, x1] != value:
+                            uniform = False
+                            break
+
+                if uniform:
+                    for r in range(r0 + 1, r1):
+                        for x in range(x0 + 1, x1):
+                            out[r, x] = value
+                elif x1 - x0 <= min_size or r1 - r0 <= min_size:
+                    for r in range(r0 + 1, r1):
+                        for x in range(x0 + 1, x1):
+                            done += pixel(out, x, r, y_start, iterations, params)
+                else:
+                    xm = (x0 + x1) // 2
+                    rm = (r0 + r1) // 2
+                    stack[top, 0], stack[top, 1], stack[top, 2], stack[top, 3] = x0, r0, xm, rm
+                    stack[top + 1, 0], stack[top + 1, 1], stack[top + 1, 2], stack[top + 1, 3] = xm, r0, x1, rm
+                    stack[top + 2, 0], stack[top + 2, 1], stack[top + 2, 2], stack[top + 2, 3] = x0, rm, xm, r1
+                    stack[top + 3, 0], stack[top + 3, 1], stack[top + 3, 2], stack[top + 3, 3] = xm, rm, x1, r1
+                    top += 4
+            iterated[t] = done
+        return iterated.sum()
+
+    return subdivide
+
+
+def _build_gpu(point):
+    @cuda.jit(device=True)
+    def pixel(out, x, row, y_start, iterations, params, counter):
+        # I rettangoli vicini condividono i lati: il pixel si prende con un
+        # compare-and-swap (-1 -> -2), così lo calcola e lo conta un solo thread
+        if cuda.atomic.cas(out, (row, x), -1, -2) == -1:
+            out[row, x] = point(x, y_start + row, params, iterations)
+            cuda.atomic.add(counter, 0, 1)
+
+    @cuda.jit
+    def border_kernel(rects, out, y_start, iterations, params, counter):
+        # Un blocco per rettangolo, i thread si dividono i pixel del bordo
+        i = cuda.blockIdx.x
+        x0, r0, x1, r1 = rects[i, 0], rects[i, 1], rects[i, 2], rects[i, 3]
+        w = x1 - x0 + 1
+        h = r1 - r0 + 1
+        n = 2 * w + 2 * max(h - 2, 0)
+        for k in range(cuda.threadIdx.x, n, cuda.blockDim.x):
+            if k < w:
+                x, r = x0 + k, r0
+            elif k < 2 * w:
+                x, r = x0 + k - w, r1
+            elif k < 2 * w + h - 2:
+                x, r = x0, r0 + 1 + k - 2 * w
+            else:
+                x, r = x1, r0 + 1 + k - 2 * w - (h - 2)
+            pixel(out, x, r, y_start, iterations, params, counter)
+
+    @cuda.jit
+    def classify_kernel(rects, out, values):
+        # values[i] = valore comune del bordo, oppure -1 se non è uniforme
+        i = cuda.grid(1)
+        if i < rects.shape[0]:
+            x0, r0, x1, r1 = rects[i, 0], rects[i, 1], rects[i, 2], rects[i, 3]
+            value = out[r0, x0]
+            for x in range(x0, x1 + 1):
+                if out[r0, x] != value or out[r1, x] != value:
+                    value = -1
+            for r in range(r0 + 1, r1):
+                if out[r, x0] != value or out[r, x1] != value:
+                    value = -1
+            values[i] = value
+
+    @cuda.jit
+    def fill_kernel(rects, values, out, y_start, iterations, params, counter):
+        # Riempie l'interno dei rettangoli uniformi, calcola quello degli altri
+        i = cuda.blockIdx.x
+        x0, r0, x1, r1 = rects[i, 0], rects[i, 1], rects[i, 2], rects[i, 3]
+        w = x1 - x0 - 1
+        h = r1 - r0 - 1
+        for k in range(cuda.threadIdx.x, max(w, 0) * max(h, 0), cuda.blockDim.x):
+            x = x0 + 1 + k % w
+            r = r0 + 1 + k // w
+            if values[i] >= 0:
+                out[r, x] = values[i]
+            else:
+                pixel(out, x, r, y_start, iterations, params, counter)
+
+    return border_kernel, classify_kernel, fill_kernel
+
+
+def _kernels(formula, precision, backend):
+    cache = _cpu_kernels if backend == "cpu" else _gpu_kernels
+    if (formula, precision) not in cache:
+        point_cpu, point_gpu = _point_functions(formula, precision)
+        cache[formula, precision] = _build_cpu(point_cpu) if backend == "cpu" else _build_gpu(point_gpu)
+    return cache[formula, precision]
+
+
+def _tiles(xres, rows, tile):
+    # Tile disgiunti (estremi inclusi) che coprono xres x rows
+    xs = np.arange(0, xres, tile)
+    rs = np.arange(0, rows, tile)
+    x0, r0 = np.meshgrid(xs, rs)
+    x0, r0 = x0.ravel(), r0.ravel()
+    x1 = np.minimum(x0 + tile, xres) - 1
+    r1 = np.minimum(r0 + tile, rows) - 1
+    return np.stack([x0, r0, x1, r1], axis=1).astype(np.int64)
+
+
+def _subdivide_gpu(kernels, y_start, iterations, out, params, rects, min_size):
+    border_kernel, classify_kernel, fill_kernel = kernels
+    out_device = cuda.to_device(out)
+    counter = cuda.to_device(np.zeros(1, dtype=np.int64))
+    while len(rects):
+        rects_device = cuda.to_device(rects)
+        values_device = cuda.device_array(len(rects), dtype=np.int32)
+        border_kernel[len(rects), THREADS](rects_device, out_device, y_start, iterations, params, counter)
+        classify_kernel[(len(rects) + THREADS - 1) // THREADS, THREADS](rects_device, out_device, values_device)
+        values = values_device.copy_to_host()
+
+        # Uniformi o troppo piccoli: si chiudono qui, gli altri si dividono
+        w = rects[:, 2] - rects[:, 0]
+        h = rects[:, 3] - rects[:, 1]
+        final = (values >= 0) | (w <= min_size) | (h <= min_size)
+        if final.any():
+            fill_kernel[int(final.sum()), THREADS](cuda.to_device(rects[final]), cuda.to_device(values[final]),
+                                                   out_device, y_start, iterations, params, counter)
+
+        x0, r0, x1, r1 = rects[~final].T
+        xm = (x0 + x1) // 2
+        rm = (r0 + r1) // 2
+        rects = np.concatenate([
+            np.stack([x0, r0, xm, rm], axis=1),
+            np.stack([xm, r0, x1, rm], axis=1),
+            np.stack([x0, rm, xm, r1], axis=1),
+            np.stack([xm, rm, x1, r1], axis=1),
+        ]).astype(np.int64)
+    out_device.copy_to_host(out)
+    return int(counter.copy_to_host()[0])
+
+
+def _render(formula, xres, yres, iterations, a, b, view, backend, out, rows, precision, stats, tile, min_size):
+    y0, y1 = (0, yres) if rows is None else rows
+    if out is None:
+        out = np.empty((y1 - y0, xres), dtype=np.int32)
+    elif out.shape != (y1 - y0, xres):
+        raise ValueError(f"out ha forma {out.shape}, attesa {(y1 - y0, xres)}")
+    # -1 = pixel non ancora calcolato
+    out[:] = -1
+
+    precision = select_precision(xres, yres, *view, precision)
+    params = _params(precision, xres, yres, a, b, view)
+    backend = select_backend(backend)
+    kernels = _kernels(formula, precision, backend)
+    tiles = _tiles(xres, y1 - y0, tile)
+    if backend == "cpu":
+        iterated = kernels(y0, iterations, out, params, tiles, min_size)
+    else:
+        iterated = _subdivide_gpu(kernels, y0, iterations, out, params, tiles, min_size)
+
+    if stats is not None:
+        stats["precision"] = precision
+        stats["iterated"] = stats.get("iterated", 0) + int(iterated)
+        stats["pixels"] = stats.get("pixels", 0) + out.size
+    return out
+
+
+def render_mandelbrot_subdivided(xres, yres, iterations, x_min, x_max, y_min, y_max, backend=None, out=None,
+                                 rows=None, precision=None, stats=None, tile=TILE, min_size=MIN_SIZE):
+    """
+    Come render_mandelbrot, ma per suddivisione; precision come in
+    render_mandelbrot. Se stats è un dizionario vi si scrive il livello in
+    "precision" e vi si accumulano "iterated" (pixel effettivamente iterati) e
+    "pixels" (totali).
+    """
+    return _render("mandelbrot", xres, yres, iterations, 0.0, 0.0, (x_min, x_max, y_min, y_max),
+                   backend, out, rows, precision, stats, tile, min_size)
+
+
+def render_julia_subdivided(xres, yres, iterations, cx, cy, x_min, x_max, y_min, y_max, backend=None, out=None,
+                            rows=None, precision=None, stats=None, tile=TILE, min_size=MIN_SIZE):
+    """Come render_julia, ma per suddivisione (vedi render_mandelbrot_subdivided)."""
+    return _render("julia", xres, yres, iterations, cx, cy, (x_min, x_max, y_min, y_max),
+                   backend, out, rows, precision, stats, tile, min_size)
+
+
+def render_burningship_subdivided(xres, yres, iterations, x_min, x_max, y_min, y_max, backend=None, out=None,
+                                  rows=None, precision=None, stats=None, tile=TILE, min_size=MIN_SIZE):
+    """Come render_burningship, ma per suddivisione (vedi render_mandelbrot_subdivided)."""
+    return _render("burningship", xres, yres, iterations, 0.0, 0.0, (x_min, x_max, y_min, y_max),
+                   backend, out, rows, precision, stats, tile, min_size)
+
+
+SUBDIVIDED_RENDERERS = {
+    "mandelbrot": render_mandelbrot_subdivided,
+    "julia": render_julia_subdivided,
+    "burningship": render_burningship_subdivided,
+}
@@ -0,0 +1,116 @@
+"""
+Cache dei tile di iterazioni per i visualizzatori con zoom.
+
+Il piano è diviso in una griglia fissa a quad-tree: al livello L la radice
+(un quadrato di lato root_size con vertice in basso a sinistra root_origin) è
+divisa in 2^L x 2^L tile, ognuno calcolato a tile_size x tile_size pixel. Per
+una vista si sceglie il livello il cui passo tra i pixel è il più vicino a
+quello dello schermo, si prendono i tile che la coprono (dalla cache, oppure
+calcolandoli) e si ricampiona il mosaico alla risoluzione richiesta.
+
+I tile sono array grezzi di iterazioni, indicizzati per (formula, parametri,
+livello, i, j); la cache ha un budget in byte e scarta i meno usati di recente.
+"""
+import math
+from collections import OrderedDict
+import numpy as np
+
+from frattali.escape import RENDERERS
+
+TILE_SIZE = 128
+MAX_BYTES = 256 << 20
+
+
+class TileCache():
+    """
+    Cache LRU di tile di iterazioni. hits, misses ed evictions contano gli
+    accessi dall'inizio (o dall'ultimo reset_stats).
+    """
+    def __init__(self, max_bytes=MAX_BYTES, tile_size=TILE_SIZE, root_origin=(-4.0, -4.0), root_size=8.0,
+                 renderers=RENDERERS, backend=None):
+        self.max_bytes = max_bytes
+        self.tile_size = tile_size
+        self.root_origin = root_origin
+        self.root_size = root_size
+        self.renderers = renderers
+        self.backend = backend
+        self.tiles = OrderedDict()
+        self.nbytes = 0
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def report(self):
+        return (f"cache: {self.hits} hit, {self.misses} miss, {self.evictions} scartati, "
+                f"{len(self.tiles)} tile ({self.nbytes / 2**20:.0f} MB)")
+
+    def level_for(self, pixel):
+        # Livello con il passo dei tile più vicino (in scala logaritmica) a pixel
+        return max(0, int(round(math.log2(self.root_size / (self.tile_size * pixel)))))
+
+    def tile(self, formula, params, level, i, j):
+        key = (formula, params, level, i, j)
+        counts = self.tiles.get(key)
+        if counts is not None:
+            self.hits += 1
+            self.tiles.move_to_end(key)
+            return counts
+
+        self.misses += 1
+        side = self.root_size / 2 ** level
+        x0 = self.root_origin[0] + i * side
+        y0 = self.root_origin[1] + j * side
+        counts = self.renderers[formula](self.tile_size, self.tile_size, *params, x0, x0 + side, y0, y0 + side,
+                                         backend=self.backend)
+        self.tiles[key] = counts
+        self.nbytes += counts.nbytes
+        while self.nbytes > self.max_bytes and len(self.tiles) > 1:
+            _, old = self.tiles.popitem(last=False)
+            self.nbytes -= old.nbytes
+            self.evictions += 1
+        return counts
+
+    def viewport(self, formula, params, xres, yres, x_min, x_max, y_min, y_max, check=None):
+        """
+        Iterazioni della vista xres x yres (y_min può essere maggiore di
+        y_max): per ogni pixel, il campione al pixel più vicino dei tile del
+        livello scelto, che hanno un altro passo. Non sono quindi i valori
+        esatti di render_* sulla griglia della vista e non vanno riusati come
+        tali (vedi IncrementalView). params sono gli argomenti
+        del renderer fra iterations compreso e l'estensione esclusa, ad esempio
+        (iterations,) oppure (iterations, cx, cy) per Julia. Se dato, check()
+        viene chiamato fra un tile e l'altro e può sollevare un'eccezione per
+        interrompere il calcolo.
+        """
+        params = tuple(params)
+        pixel = min(abs(x_max - x_min) / xres, abs(y_max - y_min) / yres)
+        level = self.level_for(pixel)
+        side = self.root_size / 2 ** level
+        step = side / self.tile_size
+
+        # Coordinate dei pixel della vista e tile che le contengono
+        px = x_min + np.arange(xres) * (x_max - x_min) / xres
+        py = y_min + np.arange(yres) * (y_max - y_min) / yres
+        ix = np.floor((px - self.root_origin[0]) / side).astype(np.int64)
+        iy = np.floor((py - self.root_origin[1]) / side).astype(np.int64)
+        i0, i1 = int(ix.min()), int(ix.max())
+        j0, j1 = int(iy.min()), int(iy.max())
+
+        mosaic = np.empty(((j1 - j0 + 1) * self.tile_size, (i1 - i0 + 1) * self.tile_size), dtype=np.int32)
+        for j in range(j0, j1 + 1):
+            for i in range(i0, i1 + 1):
+                if check is not None:
+                    check()
+                r = (j - j0) * self.tile_size
+                c = (i - i0) * self.tile_size
+                mosaic[r:r + self.tile_size, c:c + self.tile_size] = self.tile(formula, params, level, i, j)
+
+        # Ricampionamento al pixel più vicino del mosaico
+        cols = np.floor((px - (self.root_origin[0] + i0 * side)) / step).astype(np.int64)
+        rows = np.floor((py - (self.root_origin[1] + j0 * side)) / step).astype(np.int64)
+        np.clip(cols, 0, mosaic.shape[1] - 1, out=cols)
+        np.clip(rows, 0, mosaic.shape[0] - 1, out=rows)
+        return mosaic[rows[:, np.newaxis], cols[np.newaxis, :]]
@@ -0,0 +1,76 @@
+"""
+Rendering a bande di righe per immagini più grandi della memoria disponibile.
+
+L'immagine viene calcolata una banda alla volta nello stesso buffer int32,
+colorata e accodata al PNG con PNGWriter: la memoria usata dipende dalla
+dimensione della banda (tile_pixels) e non dalla risoluzione finale. Le
+coordinate di ogni pixel sono le stesse del rendering in un colpo solo.
+"""
+from __future__ import print_function
+import numpy as np
+
+from frattali.pngstream import PNGWriter
+
+# Pixel per banda: 1M pixel int32 sono 4 MB, più i temporanei della colorazione
+TILE_PIXELS = 1 << 20
+
+
+def band_rows_for(xres, yres, tile_pixels=TILE_PIXELS):
+    return max(1, min(yres, tile_pixels // xres))
+
+
+def iter_bands(render, xres, yres, args, tile_pixels=TILE_PIXELS, backend=None):
+    """
+    Genera (y0, banda) per tutte le bande dell'immagine. render è una delle
+    funzioni render_* di frattali.escape, args i suoi argomenti dopo xres, yres.
+    Il buffer della banda viene riusato: va consumato prima del passo seguente.
+    """
+    band_rows = band_rows_for(xres, yres, tile_pixels)
+    buffer = np.empty((band_rows, xres), dtype=np.int32)
+    for y0 in range(0, yres, band_rows):
+        y1 = min(y0 + band_rows, yres)
+        band = buffer[:y1 - y0]
+        render(xres, yres, *args, backend=backend, out=band, rows=(y0, y1))
+        yield y0, band
+
+
+def render_png(filename, render, xres, yres, args, colorize, tile_pixels=TILE_PIXELS,
+               backend=None, channels=3, compress_level=6):
+    """
+    Calcola l'immagine a bande e la scrive in filename. colorize trasforma una
+    banda di iterazioni in un array uint8 (righe, xres[, canali]).
+    """
+    with PNGWriter(filename, xres, yres, channels=channels, compress_level=compress_level) as png:
+        for _, band in iter_bands(render, xres, yres, args, tile_pixels, backend):
+            png.write_rows(colorize(band))
+
+
+if __name__ == "__main__":
+    # Prova: rendering a bande con il picco di memoria del processo
+    import argparse
+    import resource
+    import time
+    from frattali.escape import RENDERERS
+    from frattali.colors import log_colorize
+
+    parser = argparse.ArgumentParser(description="Rendering a bande su PNG")
+    parser.add_argument("formula", choices=sorted(RENDERERS))
+    parser.add_argument("filename")
+    parser.add_argument("--xres", type=int, default=12800)
+    parser.add_argument("--yres", type=int, default=9600)
+    parser.add_argument("--iterations", type=int, default=1000)
+    parser.add_argument("--tile-pixels", type=int, default=TILE_PIXELS)
+    parser.add_argument("--cmap", default="inferno")
+    opts = parser.parse_args()
+
+    views = {
+        "mandelbrot": (opts.iterations, -2.0, 1.0, -1.0, 1.0),
+        "julia": (opts.iterations, 0.285, 0.013, -2.0, 1.0, -1.0, 1.0),
+        "burningship": (opts.iterations, -1.8, -1.7, -0.08, 0.025),
+    }
+    start = time.perf_counter()
+    render_png(opts.filename, RENDERERS[opts.formula], opts.xres, opts.yres, views[opts.formula],
+               lambda band: log_colorize(band, opts.iterations, opts.cmap), opts.tile_pixels)
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{opts.filename}: {opts.xres}x{opts.yres} in {elapsed:.1f} s, picco RSS {peak:.0f} MB")
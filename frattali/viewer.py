@@ -0,0 +1,131 @@
+"""
+Rendering progressivo e annullabile per i visualizzatori matplotlib con zoom.
+
+Ogni nuova vista diventa un lavoro per un thread separato, che la calcola in
+più passate sempre più fini (1/8, 1/4, 1/2 e piena risoluzione). La prima
+passata usa anche meno iterazioni, così arriva in pochi millisecondi qualunque
+sia il numero di iterazioni. Quando arriva una vista nuova il lavoro in corso
+viene annullato alla prima occasione (fra una passata e l'altra, o fra un tile
+e l'altro se la funzione di calcolo chiama check). Le passate finite vengono
+consegnate al thread della GUI da un timer della figura, che chiama
+img.set_data: matplotlib non va mai toccato dal thread di lavoro.
+"""
+from __future__ import print_function
+import queue
+import threading
+import time
+
+# Fattori di riduzione della risoluzione delle passate e iterazioni della prima
+PASSES = (8, 4, 2, 1)
+PREVIEW_ITERATIONS = 200
+POLL_INTERVAL = 15
+
+
+class RenderCancelled(Exception):
+    pass
+
+
+def _shifted(extent, view, computed):
+    # Estensione (imshow, origin="upper") della vista computed, nota quella
+    # della vista richiesta: gli spostamenti si misurano in frazioni della
+    # vista, quindi non importa il verso degli assi usato negli argomenti
+    def edges(first, last, start, end, new_start, new_end):
+        scale = (last - first) / (end - start)
+        return first + (new_start - start) * scale, first + (new_end - start) * scale
+    left, right = edges(extent[0], extent[1], view[0], view[1], computed[0], computed[1])
+    top, bottom = edges(extent[3], extent[2], view[2], view[3], computed[2], computed[3])
+    return (left, right, bottom, top)
+
+
+class ProgressiveRenderer():
+    """
+    generate(xres, yres, iterations, *view, check=...) è la funzione generate_*
+    dello script (restituisce l'immagine colorata). Dopo attach(fig, img) ogni
+    submit(view, extent) mostra le passate nell'immagine man mano che finiscono.
+    computed_view(), se data, restituisce la vista (x_min, x_max, y_min, y_max)
+    effettivamente calcolata dall'ultima chiamata di generate (per esempio
+    allineata alla griglia dei pixel riusati), None se è quella richiesta:
+    l'estensione mostrata viene spostata di conseguenza. A vista completata
+    stampa il tempo della prima passata e, se c'è, report().
+    """
+    def __init__(self, generate, xres, yres, iterations, passes=PASSES, preview_iterations=PREVIEW_ITERATIONS,
+                 report=None, computed_view=None):
+        self.generate = generate
+        self.xres = xres
+        self.yres = yres
+        self.iterations = iterations
+        self.passes = passes
+        self.preview_iterations = preview_iterations
+        self.report = report
+        self.computed_view = computed_view
+        self.generation = 0
+        self.current = None
+        self.first_pass_ms = None
+        self._jobs = queue.Queue()
+        self._results = queue.Queue()
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    def submit(self, view, extent):
+        """
+        Nuova vista: view sono gli argomenti di generate dopo iterations,
+        extent quella da passare a img.set_extent. Una vista uguale a quella in
+        corso (o appena mostrata) viene ignorata.
+        """
+        job = (tuple(view), tuple(extent))
+        if job == self.current:
+            return
+        self.current = job
+        self.generation += 1
+        self._jobs.put((self.generation, time.perf_counter()) + job)
+
+    def attach(self, fig, img):
+        # Il timer gira nel thread della GUI e consegna le passate finite
+        self._img = img
+        self._timer = fig.canvas.new_timer(interval=POLL_INTERVAL)
+        self._timer.add_callback(self._poll, fig)
+        self._timer.start()
+
+    def _poll(self, fig):
+        latest = None
+        while True:
+            try:
+                latest = self._results.get_nowait()
+            except queue.Empty:
+                break
+        if latest is None:
+            return
+        generation, image, extent = latest
+        if generation != self.generation:
+            return
+        self._img.set_data(image)
+        self._img.set_extent(extent)
+        fig.canvas.draw_idle()
+
+    def _check(self, generation):
+        if generation != self.generation:
+            raise RenderCancelled()
+
+    def _run(self):
+        while True:
+            generation, submitted, view, extent = self._jobs.get()
+            # Fra i lavori in coda conta solo l'ultimo
+            if generation != self.generation:
+                continue
+            check = lambda: self._check(generation)
+            try:
+                for k, factor in enumerate(self.passes):
+                    iterations = min(self.iterations, self.preview_iterations) if k == 0 else self.iterations
+                    image = self.generate(max(1, self.xres // factor), max(1, self.yres // factor), iterations,
+                                          *view, check=check)
+                    check()
+                    computed = self.computed_view() if self.computed_view is not None else None
+                    shown = extent if computed is None else _shifted(extent, view[-4:], computed)
+                    self._results.put((generation, image, shown))
+                    if k == 0:
+                        self.first_pass_ms = (time.perf_counter() - submitted) * 1000
+            except RenderCancelled:
+                continue
+            total_ms = (time.perf_counter() - submitted) * 1000
+            print(f"prima passata in {self.first_pass_ms:.1f} ms, completa in {total_ms:.0f} ms"
+                  + (f"; {self.report()}" if self.report is not None else ""))
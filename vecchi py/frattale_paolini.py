@@ -1,34 +1,36 @@
 # per funzionare anche con python2
 from __future__ import print_function
+import os
+import sys
 
 # la libreria numerica numpy ci permette di fare velocemente
-# operazioni su matrici di numeri complessi
+# operazioni su matrici di numeri
 import numpy as np
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from frattali.numpy_escape import render_mandelbrot
+
 xres, yres = 12800, 9600 
 iterations = 10000
 
-# cx e' una suddivisione dell'intervallo [-2,1] in xres punti
-cx = np.linspace(-2,1,xres)
-
+# cx e' una suddivisione dell'intervallo [-2,1] in xres punti,
 # cy e' una suddivisione dell'intervallo [-1,1] in yres punti
-cy = np.linspace(-1,1,yres)
-
-# c e' una matrice yres x xres contenente i numeri complessi
-# con parte reale cx e parte immaginaria cy.
-c = cx[np.newaxis,:] + 1j * cy[:,np.newaxis]
-
-# z e' una matrice di numeri complessi, inizialmente nulli, su cui
-# faremo l'iterazione con ognuno dei dati iniziali
-# presi dalla matrice c
-z = np.zeros((yres, xres), dtype=complex)
-for n in range(iterations):
-  print("{}% completed".format(n*100//iterations))
-  z = z*z + c
+# (gli estremi destri sono spostati di un passo come in np.linspace)
+x_min, x_max = -2.0, 1.0 + 3.0 / (xres - 1)
+y_min, y_max = -1.0, 1.0 + 2.0 / (yres - 1)
+
+# Invece di iterare z = z*z + c su tutta la matrice, si iterano solo i punti
+# non ancora usciti dal disco di raggio 2, a bande per mostrare l'avanzamento
+counts = np.empty((yres, xres), dtype=np.int32)
+band = 480
+for y0 in range(0, yres, band):
+  print("{}% completed".format(y0*100//yres))
+  render_mandelbrot(xres, yres, iterations, x_min, x_max, y_min, y_max,
+                    out=counts[y0:y0 + band], rows=(y0, min(y0 + band, yres)))
 
 # consideriamo l'insieme dei punti che dopo iterations iterazioni
-# non sono usciti dal disco di raggio 2.
-mandelbrot = np.logical_not(np.abs(z) < 2.0)
+# sono usciti dal disco di raggio 2.
+mandelbrot = counts < iterations
 
 filename = 'mandelbrot.png'
 print("saving image to", filename)
@@ -40,4 +42,4 @@ img = im.fromarray(mandelbrot)
   
 # saving the final output 
 # as a PNG file
-img.save(filename)
\ No newline at end of file
+img.save(filename)